@@ -0,0 +1,79 @@
+"""Benchmark `GraphBatch.from_graphs` against the previous implementation that offsets the indexes graph by graph.
+
+Usage:
+    python benchmarks/collation.py --graphs 4096 --nodes 30 --edges 60
+"""
+import argparse
+import timeit
+
+import torch
+import networkx as nx
+
+from torchgraphs import Graph, GraphBatch
+from torchgraphs.data.features import add_random_features
+
+
+def legacy_from_graphs(graphs):
+    node_features = []
+    edge_features = []
+    global_features = []
+    num_nodes_by_graph = []
+    num_edges_by_graph = []
+    senders = []
+    receivers = []
+    node_offset = 0
+    for g in graphs:
+        if g.node_features is not None:
+            node_features.append(g.node_features)
+        if g.edge_features is not None:
+            edge_features.append(g.edge_features)
+        if g.global_features is not None:
+            global_features.append(g.global_features)
+        num_nodes_by_graph.append(g.num_nodes)
+        num_edges_by_graph.append(g.num_edges)
+        senders.append(g.senders + node_offset)
+        receivers.append(g.receivers + node_offset)
+        node_offset += g.num_nodes
+
+    senders = torch.cat(senders)
+    return GraphBatch(
+        num_nodes=node_offset,
+        num_edges=len(senders),
+        num_nodes_by_graph=senders.new_tensor(num_nodes_by_graph),
+        num_edges_by_graph=senders.new_tensor(num_edges_by_graph),
+        node_features=torch.cat(node_features),
+        edge_features=torch.cat(edge_features),
+        global_features=torch.stack(global_features),
+        senders=senders,
+        receivers=torch.cat(receivers),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graphs', type=int, default=4096)
+    parser.add_argument('--nodes', type=int, default=30)
+    parser.add_argument('--edges', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    graphs = [
+        Graph.from_networkx(add_random_features(
+            nx.gnm_random_graph(args.nodes, args.edges, seed=i, directed=True),
+            node_features_shape=16, edge_features_shape=8, global_features_shape=4))
+        for i in range(args.graphs)
+    ]
+
+    def run(name, fn):
+        seconds = min(timeit.repeat(lambda: fn(graphs), number=1, repeat=args.repeat))
+        print(f'{name:<24} {seconds * 1000:10.1f} ms {seconds / len(graphs) * 1e6:10.2f} us/graph')
+        return seconds
+
+    print(f'{args.graphs} graphs, {args.nodes} nodes, {args.edges} edges')
+    legacy = run('legacy from_graphs', legacy_from_graphs)
+    single_pass = run('from_graphs', GraphBatch.from_graphs)
+    print(f'{"speedup":<24} {legacy / single_pass:10.2f} x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark the forward and backward pass of `EdgeLinear` against the previous implementation,
+that projects and gathers every term separately, for several ratios of edges per node and feature sizes.
+
+Usage:
+    python benchmarks/edge_linear.py --nodes 100000 --device cuda
+"""
+import argparse
+import timeit
+
+import torch
+
+from torchgraphs import GraphBatch
+from torchgraphs.network import EdgeLinear
+from torchgraphs.network.linear import _edge_linear_strategy
+
+
+def legacy_forward(module: EdgeLinear, graphs: GraphBatch) -> torch.Tensor:
+    new_edges = 0
+    if module.W_edge is not None:
+        new_edges += graphs.edge_features @ module.W_edge.t()
+    if module.W_sender is not None:
+        new_edges += torch.index_select(graphs.node_features @ module.W_sender.t(), dim=0, index=graphs.senders)
+    if module.W_receiver is not None:
+        new_edges += torch.index_select(graphs.node_features @ module.W_receiver.t(), dim=0, index=graphs.receivers)
+    if module.W_global is not None:
+        new_edges += torch.repeat_interleave(
+            graphs.global_features @ module.W_global.t(), dim=0, repeats=graphs.num_edges_by_graph)
+    if module.bias is not None:
+        new_edges = new_edges + module.bias.expand(graphs.num_edges, -1)
+    return new_edges
+
+
+def random_batch(num_nodes, num_edges, num_graphs, node_features, edge_features, global_features, device):
+    num_nodes_by_graph = torch.full((num_graphs,), num_nodes // num_graphs)
+    num_edges_by_graph = torch.full((num_graphs,), num_edges // num_graphs)
+    offsets = torch.repeat_interleave(torch.cumsum(num_nodes_by_graph, 0) - num_nodes_by_graph, num_edges_by_graph)
+    return GraphBatch(
+        num_nodes=int(num_nodes_by_graph.sum()),
+        num_edges=int(num_edges_by_graph.sum()),
+        num_nodes_by_graph=num_nodes_by_graph,
+        num_edges_by_graph=num_edges_by_graph,
+        node_features=torch.rand(int(num_nodes_by_graph.sum()), node_features),
+        edge_features=torch.rand(int(num_edges_by_graph.sum()), edge_features),
+        global_features=torch.rand(num_graphs, global_features),
+        senders=torch.randint(num_nodes // num_graphs, size=offsets.shape) + offsets,
+        receivers=torch.randint(num_nodes // num_graphs, size=offsets.shape) + offsets,
+    ).to(device)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=50_000)
+    parser.add_argument('--graphs', type=int, default=500)
+    parser.add_argument('--edges-per-node', type=float, nargs='+', default=[0.5, 2, 8, 32])
+    parser.add_argument('--features', type=int, nargs='+', default=[8, 64, 256],
+                        help='node, edge, global and output feature sizes')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    def run(fn):
+        def step():
+            fn().sum().backward()
+            if args.device.startswith('cuda'):
+                torch.cuda.synchronize()
+        step()
+        return min(timeit.repeat(step, number=1, repeat=args.repeat))
+
+    print(f'{"E/N":>6} {"in":>5} {"out":>5} {"legacy":>10} {"project":>10} {"gather":>10} {"auto":>10} {"speedup":>8}')
+    for edges_per_node in args.edges_per_node:
+        for in_features in args.features:
+            for out_features in args.features:
+                graphs = random_batch(args.nodes, int(args.nodes * edges_per_node), args.graphs,
+                                      in_features, in_features, in_features, args.device)
+                module = EdgeLinear(out_features, edge_features=in_features, sender_features=in_features,
+                                    receiver_features=in_features, global_features=in_features).to(args.device)
+
+                legacy = run(lambda: legacy_forward(module, graphs))
+                times = {}
+                for strategy in ('project', 'gather'):
+                    module.strategy = strategy
+                    times[strategy] = run(lambda: module(graphs).edge_features)
+                auto = _edge_linear_strategy(graphs.num_nodes, graphs.num_edges, in_features, 2, out_features)
+                print(f'{edges_per_node:6.1f} {in_features:5d} {out_features:5d} {legacy * 1000:8.1f}ms '
+                      f'{times["project"] * 1000:8.1f}ms {times["gather"] * 1000:8.1f}ms {auto:>10} '
+                      f'{legacy / times[auto]:7.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Benchmark `Graph.from_networkx` and `Graph.to_networkx` against the previous edge-by-edge implementation.
+
+Usage:
+    python benchmarks/networkx_conversion.py --graphs 1000 --nodes 30 --edges 60
+"""
+import argparse
+import timeit
+
+import torch
+import networkx as nx
+
+from torchgraphs import Graph
+from torchgraphs.data.features import add_random_features
+
+
+def legacy_from_networkx(graph_nx: nx.Graph) -> Graph:
+    if graph_nx.number_of_nodes() > 0 and 'features' in graph_nx.nodes[0]:
+        node_features = torch.stack([features for node_id, features in graph_nx.nodes(data='features')])
+    else:
+        node_features = None
+
+    if graph_nx.number_of_edges() > 0:
+        senders, receivers, edge_features = zip(*graph_nx.edges(data='features'))
+        senders = torch.tensor(senders, dtype=torch.long)
+        receivers = torch.tensor(receivers, dtype=torch.long)
+        if edge_features[0] is not None:
+            edge_features = torch.stack(edge_features)
+        else:
+            edge_features = None
+    else:
+        senders = torch.tensor([], dtype=torch.long)
+        receivers = torch.tensor([], dtype=torch.long)
+        edge_features = None
+
+    return Graph(
+        num_nodes=graph_nx.number_of_nodes(),
+        num_edges=graph_nx.number_of_edges(),
+        node_features=node_features,
+        edge_features=edge_features,
+        senders=senders,
+        receivers=receivers,
+        global_features=graph_nx.graph.get('features', None),
+    )
+
+
+def legacy_to_networkx(graph: Graph, cls=nx.MultiDiGraph) -> nx.Graph:
+    g = cls()
+    if graph.node_features is not None:
+        g.add_nodes_from([(i, {'features': f}) for i, f in enumerate(graph.node_features)])
+    else:
+        g.add_nodes_from(range(graph.num_nodes))
+
+    if graph.edge_features is None:
+        g.add_edges_from([(s.item(), r.item()) for s, r in zip(graph.senders, graph.receivers)])
+    else:
+        g.add_edges_from([(s.item(), r.item(), {'features': f})
+                          for s, r, f in zip(graph.senders, graph.receivers, graph.edge_features)])
+    if graph.global_features is not None:
+        g.graph['features'] = graph.global_features
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graphs', type=int, default=1000)
+    parser.add_argument('--nodes', type=int, default=30)
+    parser.add_argument('--edges', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    graphs_nx = [
+        add_random_features(nx.gnm_random_graph(args.nodes, args.edges, seed=i, directed=True),
+                            node_features_shape=16, edge_features_shape=8, global_features_shape=4)
+        for i in range(args.graphs)
+    ]
+    graphs = [Graph.from_networkx(g) for g in graphs_nx]
+
+    def run(name, fn, inputs):
+        seconds = min(timeit.repeat(lambda: [fn(x) for x in inputs], number=1, repeat=args.repeat))
+        print(f'{name:<24} {seconds * 1000:10.1f} ms {seconds / len(inputs) * 1e6:10.1f} us/graph')
+        return seconds
+
+    print(f'{args.graphs} graphs, {args.nodes} nodes, {args.edges} edges')
+    legacy = run('legacy from_networkx', legacy_from_networkx, graphs_nx)
+    bulk = run('from_networkx', Graph.from_networkx, graphs_nx)
+    print(f'{"speedup":<24} {legacy / bulk:10.2f} x')
+    legacy = run('legacy to_networkx', legacy_to_networkx, graphs)
+    bulk = run('to_networkx', Graph.to_networkx, graphs)
+    print(f'{"speedup":<24} {legacy / bulk:10.2f} x')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,8 @@
 from . import utils
-from .data import Graph, GraphBatch
-from .network import GraphNetwork, \
+from .data import Graph, GraphBatch, GraphStore, GraphTensors
+from .network import GraphNetwork, GraphLayer, GraphSequential, \
     EdgeLinear, NodeLinear, GlobalLinear, \
-    EdgesToSender, EdgesToReceiver, EdgesToGlobal, NodesToGlobal, \
+    EdgesToSender, EdgesToReceiver, EdgesToGlobal, NodesToGlobal, PredecessorsToNode, SuccessorsToNode, \
     EdgeFunction, NodeFunction, GlobalFunction, \
     EdgeReLU, NodeReLU, GlobalReLU, \
     EdgeSigmoid, NodeSigmoid, GlobalSigmoid, \
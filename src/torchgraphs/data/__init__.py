@@ -1,2 +1,8 @@
+from .base import GraphStructure
 from .graph import Graph
 from .graphbatch import GraphBatch
+from .tensors import GraphTensors
+from .store import GraphStore
+from .sampler import BudgetBatchSampler
+from .loader import PrefetchLoader
+from .validation import Validation, get_validation, set_validation, validation
@@ -1,9 +1,77 @@
+import copy
+import types
+import operator
 import dataclasses
-from typing import Optional, Iterator
+from typing import Callable, Dict, Optional, Iterator, NamedTuple, Sequence, Tuple
 
 import torch
 import torch_scatter
 
+from ..scatter import gather_csr, scatter_many
+from .validation import Validation, get_validation, _trusted_indexes
+
+
+class CompressedEdgeIndex(NamedTuple):
+    """Edges of a graph grouped by node, as in the CSR/CSC representation of the adjacency matrix.
+
+    The edges adjacent to node `i` are `permutation[pointers[i]:pointers[i + 1]]`,
+    listed in the same relative order as they appear in the graph.
+    """
+    pointers: torch.LongTensor
+    permutation: torch.LongTensor
+
+    @classmethod
+    def from_index(cls, index: torch.LongTensor, num_nodes: int, is_sorted=False,
+                   degree: Optional[torch.LongTensor] = None) -> 'CompressedEdgeIndex':
+        if is_sorted:
+            permutation = torch.arange(len(index), device=index.device)
+        else:
+            permutation = torch.sort(index, stable=True)[1]
+        if degree is None:
+            degree = torch.bincount(index, minlength=num_nodes)
+        pointers = index.new_zeros(num_nodes + 1, dtype=torch.long)
+        torch.cumsum(degree, dim=0, out=pointers[1:])
+        return cls(pointers, permutation.to(index.dtype))
+
+    def edges_of(self, node_index) -> torch.LongTensor:
+        """The indexes of the edges adjacent to node `node_index`, in O(degree)."""
+        node_index = int(node_index)
+        num_nodes = len(self.pointers) - 1
+        if not -num_nodes <= node_index < num_nodes:
+            raise IndexError(f'Node index {node_index} out of range for a graph with {num_nodes} nodes')
+        if node_index < 0:
+            node_index += num_nodes
+        start, end = self.pointers[node_index:node_index + 2].tolist()
+        return self.permutation[start:end]
+
+
+@dataclasses.dataclass(frozen=True, eq=False)
+class GraphStructure(object):
+    """The topology of a graph or a batch: sizes, edge indexes and all values derived from them.
+
+    The structure is the only owner of these fields: `graph.senders` reads `graph.structure.senders` and assigning
+    `graph.senders` gives the graph a new structure. Graphs that only differ in their features share the same
+    structure object by reference, so that derived values such as `edges_by_sender` or `node_index_by_graph`
+    are computed at most once for all of them.
+    The structure can not be modified, derived values are computed on first access and memoized in `cache`.
+    """
+    num_nodes: int
+    num_edges: int
+    senders: torch.LongTensor
+    receivers: torch.LongTensor
+    edge_order: Optional[str] = None
+    num_graphs: Optional[int] = None
+    num_nodes_by_graph: Optional[torch.LongTensor] = None
+    num_edges_by_graph: Optional[torch.LongTensor] = None
+    cache: dict = dataclasses.field(default_factory=dict, repr=False)
+
+    def cached(self, key, fn):
+        try:
+            return self.cache[key]
+        except KeyError:
+            value = self.cache[key] = fn()
+            return value
+
 
 @dataclasses.dataclass
 class _BaseGraph(object):
@@ -13,9 +81,18 @@ class _BaseGraph(object):
     edge_features: Optional[torch.Tensor] = None
     senders: torch.LongTensor = None
     receivers: torch.LongTensor = None
+    edge_order: Optional[str] = None
+
+    # The owner of the topology fields, which are read from it and replace it when assigned. Built at the end of
+    # the construction and shared by `evolve()` if only features change, see `_topology_property`.
+    _structure: Optional[GraphStructure] = dataclasses.field(init=False, repr=False, compare=False, default=None)
 
     _feature_fields = ('node_features', 'edge_features')
     _index_fields = ('senders', 'receivers')
+    _structure_fields = ('num_nodes', 'num_edges')
+    _topology_fields = ('num_nodes', 'num_edges', 'senders', 'receivers', 'edge_order')
+    _edge_orders = ('sender', 'receiver')
+    _index_dtypes = (torch.int32, torch.int64)
 
     def __post_init__(self):
         # Try filling in missing info
@@ -28,14 +105,31 @@ class _BaseGraph(object):
                 self.receivers = torch.LongTensor()
             self.num_edges = len(self.senders)
         self._validate()
+        self._build_structure()
 
-    def _validate(self):
-        # Check nodes
-        if self.num_nodes is None or self.num_nodes < 0:
-            raise ValueError(f"`num_nodes` cannot be None or negative, got {self.num_nodes}")
+    def _build_structure(self):
+        self._structure = GraphStructure(**vars(self._structure))
+
+    def _validate(self, level: Optional[Validation] = None):
+        level = get_validation() if level is None else Validation(level)
+        if level is Validation.OFF:
+            return
+        self._validate_shapes()
+        if level is Validation.FULL:
+            self._validate_indexes()
+
+    def _validate_features(self):
         if self.node_features is not None and len(self.node_features) != self.num_nodes:
             raise ValueError(f"`num_nodes`, `len(node_features)` must match, "
                              f"got {self.num_nodes}, {len(self.node_features)}")
+        if self.edge_features is not None and len(self.edge_features) != self.num_edges:
+            raise ValueError(f"`num_edges`, `len(edge_features)` must match, "
+                             f"got {self.num_edges}, {len(self.edge_features)}")
+
+    def _validate_shapes(self):
+        # Check nodes
+        if self.num_nodes is None or self.num_nodes < 0:
+            raise ValueError(f"`num_nodes` cannot be None or negative, got {self.num_nodes}")
 
         # Check edges
         if self.num_edges is None or self.num_nodes < 0:
@@ -45,11 +139,16 @@ class _BaseGraph(object):
         if not (self.num_edges == len(self.senders) == len(self.receivers)):
             raise ValueError(f"`num_edges`, `len(senders)`, `len(receivers)` must match, "
                              f"got {self.num_edges}, {len(self.senders)}, {len(self.receivers)}")
-        if self.edge_features is not None and len(self.edge_features) != self.num_edges:
-            raise ValueError(f"`num_edges`, `len(edge_features)` must match, "
-                             f"got {self.num_edges}, {len(self.edge_features)}")
+        if self.senders.dtype not in self._index_dtypes or self.receivers.dtype != self.senders.dtype:
+            raise ValueError(f"`senders`, `receivers` must have the same dtype, one of {self._index_dtypes}, "
+                             f"got {self.senders.dtype}, {self.receivers.dtype}")
+        if self.edge_order is not None and self.edge_order not in self._edge_orders:
+            raise ValueError(f"`edge_order` must be None or one of {self._edge_orders}, got {self.edge_order}")
+
+        self._validate_features()
 
-        # Check out-of-bounds edge indexes
+    def _validate_indexes(self):
+        # Check out-of-bounds edge indexes, this requires a device synchronization
         send_oob = (self.senders < 0) | (self.senders >= self.num_nodes)
         recv_oob = (self.receivers < 0) | (self.receivers >= self.num_nodes)
         if send_oob.any():
@@ -59,6 +158,78 @@ class _BaseGraph(object):
             wrongs = [f'{s.item()} -> {r.item()}' for s, r in zip(self.senders[recv_oob], self.receivers[recv_oob])]
             raise ValueError(f"Edge receiver out of bounds for: {wrongs}")
 
+        # Check edge ordering
+        if self.edge_order is not None:
+            index = self.senders if self.edge_order == 'sender' else self.receivers
+            if (index[1:] < index[:-1]).any():
+                raise ValueError(f"Edges are not sorted by {self.edge_order}")
+
+    @property
+    def structure(self) -> GraphStructure:
+        """The topology of the graph, shared with all graphs obtained from this one by replacing only features."""
+        if not isinstance(self._structure, GraphStructure):
+            self._build_structure()
+        return self._structure
+
+    def _cached(self, key, fn):
+        return self.structure.cached(key, fn)
+
+    @property
+    def edges_by_sender(self) -> CompressedEdgeIndex:
+        """The edges of the graph grouped by sender (CSR), built on first access and cached.
+
+        Examples:
+            * Get the indexes of the edges that have `node_index` as sender in O(out_degree)
+
+              >>> graph.edges_by_sender.edges_of(node_index)
+        """
+        return self._cached('edges_by_sender', lambda: CompressedEdgeIndex.from_index(
+            self.senders, self.num_nodes, is_sorted=self.edge_order == 'sender', degree=self.out_degree))
+
+    @property
+    def edges_by_receiver(self) -> CompressedEdgeIndex:
+        """The edges of the graph grouped by receiver (CSC), built on first access and cached.
+
+        Examples:
+            * Get the indexes of the edges that have `node_index` as receiver in O(in_degree)
+
+              >>> graph.edges_by_receiver.edges_of(node_index)
+        """
+        return self._cached('edges_by_receiver', lambda: CompressedEdgeIndex.from_index(
+            self.receivers, self.num_nodes, is_sorted=self.edge_order == 'receiver', degree=self.in_degree))
+
+    def sort_edges(self, by='receiver'):
+        """Sort the edges lexicographically by (receiver, sender) or (sender, receiver), ties keep their order.
+
+        The returned graph records the ordering in `edge_order`, so that aggregations over the edges grouped by
+        that node can use segment reductions, which are faster and deterministic.
+
+        Args:
+            by: either `'receiver'` or `'sender'`
+
+        Returns:
+            A tuple `(graph, permutation)` where `permutation` is the new order of the original edges,
+            i.e. `graph.senders == self.senders[permutation]`
+        """
+        if by == 'receiver':
+            primary, secondary = self.receivers, self.senders
+        elif by == 'sender':
+            primary, secondary = self.senders, self.receivers
+        else:
+            raise ValueError(f"`by` must be one of {self._edge_orders}, got {by}")
+
+        permutation = torch.sort(secondary, stable=True)[1]
+        permutation = permutation[torch.sort(primary[permutation], stable=True)[1]]
+        # Permuting the edges does not change their validity, only the ordering needs no further check
+        with _trusted_indexes():
+            graph = self.evolve(
+                senders=self.senders[permutation],
+                receivers=self.receivers[permutation],
+                edge_features=self.edge_features[permutation] if self.edge_features is not None else None,
+                edge_order=by,
+            )
+        return graph, permutation
+
     @property
     def sender_features(self):
         """For every edge, the features of the sender node.
@@ -114,6 +285,10 @@ class _BaseGraph(object):
             * Get a tensor of aggregated edge features with shape (num_nodes, *edge_features_shape)
 
               >>> graph.out_edge_features(aggregation='sum')
+
+            * Get several aggregations at once, as a tuple or concatenated along the last dimension
+
+              >>> graph.out_edge_features(aggregation=['mean', 'max', 'std'], concat=True)
         """
         return _OutEdgeView(self)
 
@@ -136,6 +311,10 @@ class _BaseGraph(object):
             * Get a tensor of aggregated edge features with shape (num_nodes, *edge_features_shape)
 
               >>> graph.in_edge_features(aggregation='sum')
+
+            * Get several aggregations at once, as a tuple or concatenated along the last dimension
+
+              >>> graph.in_edge_features(aggregation=['mean', 'max', 'std'], concat=True)
         """
         return _InEdgeView(self)
 
@@ -184,7 +363,7 @@ class _BaseGraph(object):
     def neighbors(self, node_index):
         """The indexes of the nodes that are directly reachable from the node `node_index`.
         """
-        return self.receivers[self.senders == node_index]
+        return self.receivers[self.edges_by_sender.edges_of(node_index)]
 
     def neighbors_features(self, node_index):
         """The features of the nodes that are directly reachable from the node `node_index`.
@@ -196,27 +375,98 @@ class _BaseGraph(object):
         """For every node, the number of edges adjacent to that node.
 
         If an edge is a self connection it is counted twice, both as outgoing and as incoming.
+        Computed on first access and cached, the returned tensor should not be modified in place.
         """
-        return self.in_degree + self.out_degree
+        return self._cached('degree', lambda: self.in_degree + self.out_degree)
 
     @property
     def out_degree(self) -> torch.LongTensor:
         """For every node, the number edges pointing out from that node.
 
         I.e. the number of edges that have that node as a sender.
+        Computed on first access and cached, the returned tensor should not be modified in place.
         """
-        # TODO still buggy
-        return self.senders.new_zeros(self.num_nodes).index_add_(
-            dim=0, index=self.senders, source=self.senders.new_ones(self.num_edges))
+        return self._cached('out_degree', lambda: torch.bincount(self.senders, minlength=self.num_nodes))
 
     @property
     def in_degree(self) -> torch.LongTensor:
         """For every node, the number edges pointing in to that node.
 
         I.e. the number of edges that have that node as a receiver.
+        Computed on first access and cached, the returned tensor should not be modified in place.
         """
-        return self.receivers.new_zeros(self.num_nodes).index_add_(
-            dim=0, index=self.receivers, source=self.receivers.new_ones(self.num_edges))
+        return self._cached('in_degree', lambda: torch.bincount(self.receivers, minlength=self.num_nodes))
+
+    def _adjacency_values(self, values) -> torch.Tensor:
+        if values is None:
+            return self.senders.new_ones(self.num_edges, dtype=torch.float)
+        if isinstance(values, str):
+            values = getattr(self, values)
+        if len(values) != self.num_edges:
+            raise ValueError(f"`num_edges`, `len(values)` must match, got {self.num_edges}, {len(values)}")
+        return values
+
+    def to_sparse_coo(self, values=None) -> torch.Tensor:
+        """The adjacency matrix of the graph as a sparse COO tensor, the entry `[s, r]` corresponds to the edge `s -> r`.
+
+        Multiple edges between the same nodes are kept as separate entries, call `.coalesce()` to sum them.
+
+        Args:
+            values: the values of the non-zero entries, either a tensor of shape `(num_edges, *)`,
+                the name of a field such as `'edge_features'`, or None to use ones
+
+        Returns:
+            A sparse tensor of shape `(num_nodes, num_nodes, *)`, where `*` is the shape of the values of each edge
+        """
+        values = self._adjacency_values(values)
+        return torch.sparse_coo_tensor(
+            torch.stack((self.senders, self.receivers)).long(), values,
+            size=(self.num_nodes, self.num_nodes, *values.shape[1:]))
+
+    def to_sparse_csr(self, values=None) -> torch.Tensor:
+        """The adjacency matrix of the graph as a sparse CSR tensor, the entry `[s, r]` corresponds to the edge `s -> r`.
+
+        Args:
+            values: the values of the non-zero entries, either a tensor of shape `(num_edges, *)`,
+                the name of a field such as `'edge_features'`, or None to use ones
+
+        Returns:
+            A sparse tensor of shape `(num_nodes, num_nodes, *)`, where `*` is the shape of the values of each edge
+        """
+        values = self._adjacency_values(values)
+        pointers, permutation = self.edges_by_sender
+        return torch.sparse_csr_tensor(
+            pointers.to(self.index_dtype), self.receivers[permutation], values[permutation],
+            size=(self.num_nodes, self.num_nodes, *values.shape[1:]))
+
+    def to_scipy_sparse(self, values=None, format='coo'):
+        """The adjacency matrix of the graph as a SciPy sparse matrix, the entry `[s, r]` corresponds to the edge `s -> r`.
+
+        Args:
+            values: the values of the non-zero entries, either a tensor of shape `(num_edges,)`,
+                the name of a field such as `'edge_features'`, or None to use ones
+            format: the SciPy sparse format, e.g. `'coo'`, `'csr'` or `'csc'`
+
+        Returns:
+            A sparse matrix of shape `(num_nodes, num_nodes)`
+        """
+        import scipy.sparse
+
+        values = self._adjacency_values(values)
+        if values.dim() != 1:
+            raise ValueError(f'SciPy sparse matrices only support scalar values, got shape {tuple(values.shape)}')
+        matrix = scipy.sparse.coo_matrix(
+            (values.detach().cpu().numpy(), (self.senders.cpu().numpy(), self.receivers.cpu().numpy())),
+            shape=(self.num_nodes, self.num_nodes))
+        return matrix.asformat(format)
+
+    @property
+    def index_dtype(self) -> torch.dtype:
+        """The dtype of the index tensors, either `torch.int64` or `torch.int32` to halve their memory footprint.
+
+        Indexes are converted to `torch.int64` only when passed to kernels that require it, see `to()`.
+        """
+        return self.senders.dtype
 
     @property
     def node_features_shape(self):
@@ -234,22 +484,84 @@ class _BaseGraph(object):
             device = torch.cuda.current_device()
         return self.to(device, non_blocking)
 
-    def to(self, device, non_blocking=False):
-        feature_fields = {
-            field_name: getattr(self, field_name).to(device=device, non_blocking=non_blocking)
-            for field_name in self._feature_fields if getattr(self, field_name) is not None
-        }
-        index_fields = {
-            field_name: getattr(self, field_name).to(device=device, non_blocking=non_blocking)
-            for field_name in self._index_fields
-        }
-        return self.evolve(**index_fields, **feature_fields)
+    def to(self, device=None, non_blocking=False, index_dtype=None, dtype=None):
+        """Move the graph to another device and/or change the dtype of the index tensors or of the features.
+
+        All tensors are copied into one staging buffer, which is moved with a single copy, and the fields of
+        the returned graph are views of the moved buffer. Derived index tensors and cached values are moved along
+        instead of being recomputed and the graph is not validated again. If some features require grad,
+        the tensors are moved one by one so that gradients flow back to the original features.
+
+        Args:
+            device: the target device, None to keep the current one
+            non_blocking: see `torch.Tensor.to`, from CPU to CUDA the staging buffer is then in pinned memory
+            index_dtype: `torch.int32` or `torch.int64`, None to keep the current one
+            dtype: a floating point dtype for the floating point features, None to keep the current one
+        """
+        return self._to(device, non_blocking, index_dtype, dtype)
+
+    def _to(self, device, non_blocking, index_dtype, dtype, staging: Optional[Callable[[int], torch.Tensor]] = None):
+        """`to()` with an optional allocator of the pinned staging buffer, see `_move_tensors`."""
+        if index_dtype is not None and index_dtype not in self._index_dtypes:
+            raise ValueError(f"`index_dtype` must be one of {self._index_dtypes}, got {index_dtype}")
+        if dtype is not None and not dtype.is_floating_point:
+            raise ValueError(f"`dtype` must be a floating point dtype, got {dtype}")
+        device = self.senders.device if device is None else torch.device(device)
+        if device.type == 'cuda' and device.index is None:
+            device = torch.device('cuda', torch.cuda.current_device())
+        if index_dtype is None:
+            index_dtype = self.index_dtype
+
+        tensors = {}
+        dtypes = {}
+        for field_name in self._index_fields:
+            tensors[field_name] = getattr(self, field_name)
+            dtypes[field_name] = index_dtype
+        for field_name in self._feature_fields:
+            tensor = getattr(self, field_name)
+            if tensor is not None:
+                tensors[field_name] = tensor
+                dtypes[field_name] = dtype if dtype is not None and tensor.is_floating_point() else tensor.dtype
+
+        # Cached tensors are moved too, but only valid for the same index dtype. Other cached values are kept.
+        cache = {}
+        if index_dtype == self.index_dtype:
+            for key, value in self.structure.cache.items():
+                if isinstance(value, torch.Tensor):
+                    tensors['_cache', key] = value
+                    dtypes['_cache', key] = value.dtype
+                elif isinstance(value, tuple) and len(value) > 0 and all(isinstance(v, torch.Tensor) for v in value):
+                    for i, v in enumerate(value):
+                        tensors['_cache', key, i] = v
+                        dtypes['_cache', key, i] = v.dtype
+                else:
+                    cache[key] = value
+
+        moved = _move_tensors(tensors, dtypes, device, non_blocking, staging)
+
+        for key, value in self.structure.cache.items():
+            if ('_cache', key) in moved:
+                cache[key] = moved['_cache', key]
+            elif ('_cache', key, 0) in moved:
+                cache[key] = type(value)(*(moved['_cache', key, i] for i in range(len(value))))
+
+        new = copy.copy(self)
+        new._structure = dataclasses.replace(
+            self.structure, **{name: moved[name] for name in self._index_fields}, cache=cache)
+        for name in self._feature_fields:
+            if name in moved:
+                setattr(new, name, moved[name])
+        return new
 
     def pin_memory(self):
-        for field_name in self._index_fields + self._feature_fields:
-            if getattr(self, field_name) is not None:
-                setattr(self, field_name, getattr(self, field_name).pin_memory())
-        return self
+        """Return a copy of the graph whose tensors are in page-locked memory, this graph is not modified."""
+        fields = {
+            field_name: getattr(self, field_name).pin_memory()
+            for field_name in self._index_fields + self._feature_fields if getattr(self, field_name) is not None
+        }
+        # Copying the tensors does not change their validity
+        with _trusted_indexes():
+            return self.evolve(**fields, edge_order=self.edge_order)
 
     def requires_grad_(self, requires_grad=True):
         for field_name in self._feature_fields:
@@ -264,7 +576,46 @@ class _BaseGraph(object):
         return self
 
     def evolve(self, **updates):
-        return dataclasses.replace(self, **updates)
+        """Return a copy of this graph with some fields replaced.
+
+        Replacing `senders` or `receivers` resets `edge_order`, unless it is also given.
+        If only feature fields are replaced, the `structure` of the graph is trusted to be valid and is shared
+        by reference with the new graph, along with all derived values. Only the new features are validated.
+        """
+        if not all(field_name in self._feature_fields for field_name in updates):
+            if 'edge_order' not in updates and ('senders' in updates or 'receivers' in updates):
+                updates['edge_order'] = None
+            return dataclasses.replace(self, **updates)
+
+        new = copy.copy(self)
+        for field_name, value in updates.items():
+            setattr(new, field_name, value)
+        if get_validation() is not Validation.OFF:
+            new._validate_features()
+        return new
+
+
+def _topology_property(name):
+    """A field of `_BaseGraph` that is stored in its `GraphStructure`.
+
+    While the graph is constructed the values are collected in a namespace, then the structure is built once.
+    Afterwards, assigning a value replaces the structure with a new one, with the same fields except for `name`
+    and without the values derived from the old one. Graphs that shared the old structure are not affected.
+    """
+    def set(self, value):
+        structure = self._structure
+        if isinstance(structure, GraphStructure):
+            self._structure = dataclasses.replace(structure, **{name: value, 'cache': {}})
+        else:
+            if structure is None:
+                structure = self._structure = types.SimpleNamespace()
+            setattr(structure, name, value)
+
+    return property(operator.attrgetter(f'_structure.{name}'), set)
+
+
+for _name in _BaseGraph._topology_fields:
+    setattr(_BaseGraph, _name, _topology_property(_name))
 
 
 class _InOutEdgeView(object):
@@ -287,25 +638,41 @@ class _InOutEdgeView(object):
         for node_index in range(self._graph.num_nodes):
             yield self[node_index]
 
+    def _aggregate_many(self, aggregations, index, pointers, concat=False):
+        results = scatter_many(self._graph.edge_features, index, self._graph.num_nodes, aggregations, pointers)
+        return torch.cat(results, dim=-1) if concat else tuple(results)
+
 
 class _InEdgeView(_InOutEdgeView):
     def __call__(self, aggregation, *args, **kwargs) -> torch.Tensor:
+        if isinstance(aggregation, (list, tuple)):
+            pointers = self._graph.edges_by_receiver.pointers if self._graph.edge_order == 'receiver' else None
+            return self._aggregate_many(aggregation, self._graph.receivers, pointers, *args, **kwargs)
+        if isinstance(aggregation, str) and self._graph.edge_order == 'receiver':
+            return torch_scatter.segment_csr(
+                self._graph.edge_features, self._graph.edges_by_receiver.pointers, reduce=aggregation)
         if isinstance(aggregation, str):
             aggregation = self._pooling_functions[aggregation]
-        return aggregation(self._graph.edge_features, self._graph.receivers, *args, **kwargs)
+        return aggregation(self._graph.edge_features, self._graph.receivers.long(), *args, **kwargs)
 
     def __getitem__(self, node_index) -> torch.Tensor:
-        return self._graph.edge_features[self._graph.receivers == node_index]
+        return self._graph.edge_features[self._graph.edges_by_receiver.edges_of(node_index)]
 
 
 class _OutEdgeView(_InOutEdgeView):
     def __call__(self, aggregation, *args, **kwargs) -> torch.Tensor:
+        if isinstance(aggregation, (list, tuple)):
+            pointers = self._graph.edges_by_sender.pointers if self._graph.edge_order == 'sender' else None
+            return self._aggregate_many(aggregation, self._graph.senders, pointers, *args, **kwargs)
+        if isinstance(aggregation, str) and self._graph.edge_order == 'sender':
+            return torch_scatter.segment_csr(
+                self._graph.edge_features, self._graph.edges_by_sender.pointers, reduce=aggregation)
         if isinstance(aggregation, str):
             aggregation = self._pooling_functions[aggregation]
-        return aggregation(self._graph.edge_features, self._graph.senders, *args, **kwargs)
+        return aggregation(self._graph.edge_features, self._graph.senders.long(), *args, **kwargs)
 
     def __getitem__(self, node_index) -> torch.Tensor:
-        return self._graph.edge_features[self._graph.senders == node_index]
+        return self._graph.edge_features[self._graph.edges_by_sender.edges_of(node_index)]
 
 
 class _NodeView(object):
@@ -340,6 +707,9 @@ class _SenderNodeView(_NodeView):
 
 
 class _SuccessorPredecessorView(object):
+    # Aggregations that are computed directly from the node features, see `torchgraphs.scatter.gather_csr`
+    _fused_aggregations = ('sum', 'mean', 'max')
+
     def __init__(self, graph: _BaseGraph):
         self._graph = graph
         # TODO move these to the class definition or somewhere else
@@ -362,25 +732,112 @@ class _SuccessorPredecessorView(object):
 
 class _SuccessorView(_SuccessorPredecessorView):
     def __call__(self, aggregation, *args, **kwargs) -> torch.Tensor:
+        if aggregation in self._fused_aggregations:
+            # Aggregate the features of the receiving nodes grouped by sender, without a copy for every edge
+            pointers, permutation = self._graph.edges_by_sender
+            successors = self._graph._cached('receivers_by_sender', lambda: self._graph.receivers[permutation])
+            return gather_csr(self._graph.node_features, pointers, successors, reduce=aggregation)
+
         # For every edge get the features of the receiving node
         successors = self._graph.node_features.index_select(index=self._graph.receivers, dim=0)
         # Aggregate the features of the receiving nodes according to the sender
         fn = self._pooling_functions.get(aggregation, aggregation)
-        return fn(successors, self._graph.senders)
+        return fn(successors, self._graph.senders.long())
 
     def __getitem__(self, node_index) -> torch.Tensor:
-        successors = self._graph.receivers[self._graph.senders == node_index]
+        successors = self._graph.receivers[self._graph.edges_by_sender.edges_of(node_index)]
         return self._graph.node_features.index_select(index=successors, dim=0)
 
 
 class _PredecessorView(_SuccessorPredecessorView):
     def __call__(self, aggregation, *args, **kwargs) -> torch.Tensor:
+        if aggregation in self._fused_aggregations:
+            # Aggregate the features of the sender nodes grouped by receiver, without a copy for every edge
+            pointers, permutation = self._graph.edges_by_receiver
+            predecessors = self._graph._cached('senders_by_receiver', lambda: self._graph.senders[permutation])
+            return gather_csr(self._graph.node_features, pointers, predecessors, reduce=aggregation)
+
         # For every edge get the features of the sender node
         predecessors = self._graph.node_features.index_select(index=self._graph.senders, dim=0)
         # Aggregate the features of the sender nodes according to the receiver
         fn = self._pooling_functions.get(aggregation, aggregation)
-        return fn(predecessors, self._graph.receivers)
+        return fn(predecessors, self._graph.receivers.long())
 
     def __getitem__(self, node_index) -> torch.Tensor:
-        predecessors = self._graph.receivers[self._graph.senders == node_index]
+        predecessors = self._graph.senders[self._graph.edges_by_receiver.edges_of(node_index)]
         return self._graph.node_features.index_select(index=predecessors, dim=0)
+
+
+def _move_tensors(tensors: dict, dtypes: dict, device: torch.device, non_blocking: bool,
+                  staging: Optional[Callable[[int], torch.Tensor]] = None) -> dict:
+    """Move and cast several tensors with a single copy, the moved tensors are views of the same buffer.
+
+    From CPU to CUDA with `non_blocking`, the tensors are first copied into a pinned staging buffer,
+    which is allocated for this call or, if given, returned by `staging(num_bytes)` as a pinned `uint8` tensor
+    of at least `num_bytes` elements, e.g. to reuse the same buffer once the previous transfer is complete.
+    """
+    if all(t.device == device and t.dtype == dtypes[k] for k, t in tensors.items()):
+        return dict(tensors)
+
+    source = next(iter(tensors.values())).device
+    if any(t.device != source for t in tensors.values()) or \
+            (torch.is_grad_enabled() and any(t.requires_grad for t in tensors.values())):
+        return {k: t.to(device=device, dtype=dtypes[k], non_blocking=non_blocking) for k, t in tensors.items()}
+
+    shapes = {k: (t.shape, dtypes[k]) for k, t in tensors.items()}
+    pin_memory = non_blocking and source.type == 'cpu' and device.type == 'cuda'
+    num_bytes = _views_layout(shapes)[1]
+    if pin_memory and staging is not None:
+        buffer = staging(num_bytes)[:num_bytes]
+        views = _views_of(buffer.untyped_storage(), shapes)
+    else:
+        views = _allocate_views(shapes, source, pin_memory=pin_memory)
+        buffer = torch.empty(0, dtype=torch.uint8, device=source).set_(next(iter(views.values())).untyped_storage())
+    for k, t in tensors.items():
+        views[k].copy_(t)
+    if device == source:
+        return views
+
+    return _views_of(buffer.to(device, non_blocking=non_blocking).untyped_storage(), shapes)
+
+
+def _allocate_views(shapes: Dict[str, Tuple[Sequence[int], torch.dtype]], device: torch.device,
+                    shared: bool = False, pin_memory: bool = False) -> Dict[str, torch.Tensor]:
+    """Allocate one storage for several tensors and return a view for each tensor.
+
+    Args:
+        shapes: a shape and a dtype for every tensor
+        device: where to allocate the storage
+        shared: whether to allocate the storage in shared memory, only on CPU
+        pin_memory: whether to allocate the storage in page-locked memory, only on CPU
+
+    Returns:
+        A dict of tensors with the same keys as `shapes`, whose content is not initialized
+    """
+    total = _views_layout(shapes)[1]
+    if shared:
+        storage = torch.UntypedStorage._new_shared(total)
+    else:
+        storage = torch.empty(total, dtype=torch.uint8, device=device, pin_memory=pin_memory).untyped_storage()
+    return _views_of(storage, shapes)
+
+
+def _views_of(storage: torch.UntypedStorage, shapes: Dict[str, Tuple[Sequence[int], torch.dtype]]):
+    """Views of a storage laid out as in `_allocate_views()`."""
+    offsets, _ = _views_layout(shapes)
+    views = {}
+    for name, (shape, dtype) in shapes.items():
+        view = torch.empty(0, dtype=dtype, device=storage.device)
+        views[name] = view.set_(storage, offsets[name] // view.element_size(), shape)
+    return views
+
+
+def _views_layout(shapes: Dict[str, Tuple[Sequence[int], torch.dtype]], alignment: int = 64):
+    # Every view starts at a multiple of `alignment` bytes
+    offsets = {}
+    total = 0
+    for name, (shape, dtype) in shapes.items():
+        total = -(-total // alignment) * alignment
+        offsets[name] = total
+        total += torch.Size(shape).numel() * torch.empty((), dtype=dtype).element_size()
+    return offsets, total
@@ -3,9 +3,11 @@ from typing import Optional
 import dataclasses
 
 import torch
+import numpy as np
 import networkx as nx
 
 from .base import _BaseGraph
+from .validation import _trusted_indexes
 
 
 @dataclasses.dataclass
@@ -43,37 +45,53 @@ class Graph(_BaseGraph):
     def to_networkx(self, cls=nx.MultiDiGraph):
         g = cls()
         if self.node_features is not None:
-            g.add_nodes_from([(i, {'features': f}) for i, f in enumerate(self.node_features)])
+            g.add_nodes_from(zip(range(self.num_nodes), ({'features': f} for f in self.node_features.unbind(0))))
         else:
             g.add_nodes_from(range(self.num_nodes))
 
+        # A single transfer of the whole index tensors instead of one `.item()` per edge
+        senders = self.senders.tolist()
+        receivers = self.receivers.tolist()
         if self.edge_features is None:
-            g.add_edges_from([(s.item(), r.item()) for s, r in zip(self.senders, self.receivers)])
+            g.add_edges_from(zip(senders, receivers))
         else:
-            g.add_edges_from([(s.item(), r.item(), {'features': f})
-                              for s, r, f in zip(self.senders, self.receivers, self.edge_features)])
+            g.add_edges_from(zip(senders, receivers, ({'features': f} for f in self.edge_features.unbind(0))))
         if self.global_features is not None:
             g.graph['features'] = self.global_features
         return g
 
     @classmethod
     def from_networkx(cls, graph_nx: nx.Graph) -> Graph:
+        """Convert a networkx graph, nodes are relabeled to `0..num_nodes-1` following the order of `graph_nx.nodes`.
+
+        Features are read from the `features` attribute of nodes, edges and of the graph itself.
+        """
+        num_nodes = graph_nx.number_of_nodes()
+
         # Handle node features
-        if graph_nx.number_of_nodes() > 0 and 'features' in graph_nx.nodes[0]:
-            node_features = torch.stack([features for node_id, features in graph_nx.nodes(data='features')])
+        nodes, node_features = zip(*graph_nx.nodes(data='features')) if num_nodes > 0 else ((), ())
+        if num_nodes > 0 and node_features[0] is not None:
+            node_features = torch.stack(node_features)
         else:
             node_features = None
 
-        # Handle edge features
-        if graph_nx.number_of_edges() > 0:
-            senders, receivers, edge_features = zip(*graph_nx.edges(data='features'))
-            senders = torch.tensor(senders, dtype=torch.long)
-            receivers = torch.tensor(receivers, dtype=torch.long)
+        # Handle edge features, `graph_nx.number_of_edges()` is not used because it iterates over all nodes
+        edges = tuple(zip(*graph_nx.edges(data='features')))
+        if len(edges) > 0:
+            senders, receivers, edge_features = edges
+            num_edges = len(senders)
+            if any(node != i for i, node in enumerate(nodes)):
+                node_ids = {node: i for i, node in enumerate(nodes)}
+                senders = map(node_ids.__getitem__, senders)
+                receivers = map(node_ids.__getitem__, receivers)
+            senders = torch.from_numpy(np.fromiter(senders, dtype=np.int64, count=num_edges))
+            receivers = torch.from_numpy(np.fromiter(receivers, dtype=np.int64, count=num_edges))
             if edge_features[0] is not None:
                 edge_features = torch.stack(edge_features)
             else:
                 edge_features = None
         else:
+            num_edges = 0
             senders = torch.tensor([], dtype=torch.long)
             receivers = torch.tensor([], dtype=torch.long)
             edge_features = None
@@ -81,12 +99,67 @@ class Graph(_BaseGraph):
         # Handle global features
         global_features = graph_nx.graph.get('features', None)
 
-        return cls(
-            num_nodes=graph_nx.number_of_nodes(),
-            num_edges=graph_nx.number_of_edges(),
-            node_features=node_features,
-            edge_features=edge_features,
-            senders=senders,
-            receivers=receivers,
-            global_features=global_features,
-        )
+        # Edge indexes are in bounds since they come from the relabeling of the nodes
+        with _trusted_indexes():
+            return cls(
+                num_nodes=num_nodes,
+                num_edges=num_edges,
+                node_features=node_features,
+                edge_features=edge_features,
+                senders=senders,
+                receivers=receivers,
+                global_features=global_features,
+            )
+
+    @classmethod
+    def from_scipy_sparse(cls, matrix, edge_features=True) -> Graph:
+        """Create a graph from the adjacency matrix in any SciPy sparse format,
+        every stored entry `[s, r]` becomes an edge `s -> r`.
+
+        Args:
+            matrix: a square sparse matrix
+            edge_features: if True, the stored values become edge features of shape `(num_edges,)`
+        """
+        if len(matrix.shape) != 2 or matrix.shape[0] != matrix.shape[1]:
+            raise ValueError(f'The adjacency matrix must be square, got shape {matrix.shape}')
+        matrix = matrix.tocoo()
+        # Edge indexes are in bounds since they are the coordinates of a matrix of shape (num_nodes, num_nodes)
+        with _trusted_indexes():
+            return cls(
+                num_nodes=matrix.shape[0],
+                num_edges=matrix.nnz,
+                senders=torch.from_numpy(matrix.row.astype(np.int64)),
+                receivers=torch.from_numpy(matrix.col.astype(np.int64)),
+                edge_features=torch.from_numpy(matrix.data) if edge_features else None,
+            )
+
+    @classmethod
+    def from_torch_sparse(cls, tensor: torch.Tensor, edge_features=True) -> Graph:
+        """Create a graph from the adjacency matrix as a sparse tensor in COO or CSR layout,
+        every stored entry `[s, r]` becomes an edge `s -> r`. Uncoalesced duplicate entries become multiple edges.
+
+        Args:
+            tensor: a sparse tensor of shape `(num_nodes, num_nodes, *)`
+            edge_features: if True, the stored values become edge features of shape `(num_edges, *)`
+        """
+        if tensor.sparse_dim() != 2 or tensor.shape[0] != tensor.shape[1]:
+            raise ValueError(f'The adjacency matrix must be square, got shape {tuple(tensor.shape)}')
+        if tensor.layout == torch.sparse_csr:
+            senders = torch.repeat_interleave(
+                torch.arange(tensor.shape[0], device=tensor.device), tensor.crow_indices().diff())
+            receivers = tensor.col_indices()
+            values = tensor.values()
+        elif tensor.layout == torch.sparse_coo:
+            senders, receivers = tensor._indices()
+            values = tensor._values()
+        else:
+            raise ValueError(f'Unsupported sparse layout {tensor.layout}')
+        # Edge indexes are in bounds since they are the coordinates of a matrix of shape (num_nodes, num_nodes)
+        with _trusted_indexes():
+            return cls(
+                num_nodes=tensor.shape[0],
+                num_edges=len(senders),
+                senders=senders,
+                receivers=receivers,
+                edge_features=values if edge_features else None,
+            )
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
+import bisect
+import operator
+import itertools
 import dataclasses
 import collections.abc
-from typing import Iterator, Sequence, Iterable, Optional, Tuple
+from typing import Iterator, Sequence, Iterable, List, Optional, Tuple, Union
 
 import networkx as nx
 import torch
 import torch_scatter
+from torch.utils.data import get_worker_info
 from torch.utils.data._utils.collate import default_collate
 
-from .base import _BaseGraph
+from .base import _BaseGraph, _allocate_views, _topology_property
 from .graph import Graph
-from ..utils import segment_lengths_to_slices, segment_lengths_to_ids
+from .tensors import GraphTensors
+from .validation import Validation, validation, _trusted_indexes
+from ..scatter import Broadcast, scatter_many
+from ..utils import segment_lengths_to_ids, segment_lengths_to_offsets, segments_to_index
 
 
 @dataclasses.dataclass
@@ -20,11 +27,11 @@ class GraphBatch(_BaseGraph):
     global_features: Optional[torch.Tensor] = None
     num_nodes_by_graph: torch.LongTensor = None
     num_edges_by_graph: torch.LongTensor = None
-    node_index_by_graph: torch.LongTensor = dataclasses.field(init=False)
-    edge_index_by_graph: torch.LongTensor = dataclasses.field(init=False)
 
     _feature_fields = _BaseGraph._feature_fields + ('global_features',)
     _index_fields = _BaseGraph._index_fields + ('num_nodes_by_graph', 'num_edges_by_graph')
+    _structure_fields = _BaseGraph._structure_fields + ('num_graphs',)
+    _topology_fields = _BaseGraph._topology_fields + ('num_graphs', 'num_nodes_by_graph', 'num_edges_by_graph')
 
     def __post_init__(self):
         # super().__post_init__() will also validate the instance using the _validate methods,
@@ -39,23 +46,25 @@ class GraphBatch(_BaseGraph):
             else:
                 raise ValueError('Could not infer number of graphs from batch fields')
 
+        index_dtype = self.senders.dtype if self.senders is not None else torch.long
         if self.num_nodes_by_graph is None and self.num_nodes == 0:
-            self.num_nodes_by_graph = torch.zeros(self.num_graphs, dtype=torch.long)
+            self.num_nodes_by_graph = torch.zeros(self.num_graphs, dtype=index_dtype)
         if self.num_edges_by_graph is None and self.num_edges == 0:
-            self.num_edges_by_graph = torch.zeros(self.num_graphs, dtype=torch.long)
-
-        self.node_index_by_graph = segment_lengths_to_ids(self.num_nodes_by_graph)
-        self.edge_index_by_graph = segment_lengths_to_ids(self.num_edges_by_graph)
+            self.num_edges_by_graph = torch.zeros(self.num_graphs, dtype=index_dtype)
 
         super(GraphBatch, self).__post_init__()
 
-    def _validate(self):
-        super(GraphBatch, self)._validate()
+    def _validate_features(self):
+        super(GraphBatch, self)._validate_features()
 
         if self.global_features is not None and self.num_graphs != len(self.global_features):
             raise ValueError(f'Total number of graphs and length of global features must correspond: '
                              f'`num_graphs`={self.num_graphs} '
                              f'`len(self.global_features)`={len(self.global_features)}')
+
+    def _validate_shapes(self):
+        super(GraphBatch, self)._validate_shapes()
+
         if self.num_graphs != len(self.num_nodes_by_graph):
             raise ValueError(f'Total number of graphs and length of nodes by graph must correspond: '
                              f'`num_graphs`={self.num_graphs} '
@@ -65,6 +74,9 @@ class GraphBatch(_BaseGraph):
                              f'`num_graphs`={self.num_graphs} '
                              f'`len(self.num_edges_by_graph)`={len(self.num_edges_by_graph)}')
 
+    def _validate_indexes(self):
+        super(GraphBatch, self)._validate_indexes()
+
         if self.num_nodes != self.num_nodes_by_graph.sum():
             raise ValueError(f'Total number of nodes and number of nodes by graph must correspond: '
                              f'`num_nodes`={self.num_nodes} '
@@ -77,6 +89,37 @@ class GraphBatch(_BaseGraph):
     def __len__(self):
         return self.num_graphs
 
+    @property
+    def node_index_by_graph(self) -> torch.LongTensor:
+        """For every node, the index of the graph it belongs to, computed on first access and cached."""
+        return self._cached('node_index_by_graph', lambda: segment_lengths_to_ids(self.num_nodes_by_graph))
+
+    @property
+    def edge_index_by_graph(self) -> torch.LongTensor:
+        """For every edge, the index of the graph it belongs to, computed on first access and cached."""
+        return self._cached('edge_index_by_graph', lambda: segment_lengths_to_ids(self.num_edges_by_graph))
+
+    @property
+    def node_offsets(self) -> torch.LongTensor:
+        """For every graph, the index of its first node in the batch, followed by the total number of nodes.
+
+        A tensor of shape `(num_graphs + 1,)`, computed on first access and cached.
+        """
+        return self._cached('node_offsets', lambda: segment_lengths_to_offsets(self.num_nodes_by_graph))
+
+    @property
+    def edge_offsets(self) -> torch.LongTensor:
+        """For every graph, the index of its first edge in the batch, followed by the total number of edges.
+
+        A tensor of shape `(num_graphs + 1,)`, computed on first access and cached.
+        """
+        return self._cached('edge_offsets', lambda: segment_lengths_to_offsets(self.num_edges_by_graph))
+
+    @property
+    def _host_offsets(self) -> Tuple[Sequence[int], Sequence[int]]:
+        # Python copies of `node_offsets` and `edge_offsets`, so that accessing a graph requires no device sync
+        return self._cached('host_offsets', lambda: (self.node_offsets.tolist(), self.edge_offsets.tolist()))
+
     @property
     def node_features_by_graph(self):
         """For every graph in the batch, the features of their nodes
@@ -98,6 +141,10 @@ class GraphBatch(_BaseGraph):
             * Get a tensor of aggregated node features with shape (num_graphs, *node_features_shape)
 
               >>> batch.node_features_by_graph(aggregation='sum')
+
+            * Get several aggregations at once, as a tuple or concatenated along the last dimension
+
+              >>> batch.node_features_by_graph(aggregation=['mean', 'max', 'std'], concat=True)
         """
         return _BatchNodeView(self)
 
@@ -122,64 +169,164 @@ class GraphBatch(_BaseGraph):
             * Get a tensor of aggregated edge features with shape (num_graphs, *edge_features_shape)
 
               >>> batch.edge_features_by_graph(aggregation='sum')
+
+            * Get several aggregations at once, as a tuple or concatenated along the last dimension
+
+              >>> batch.edge_features_by_graph(aggregation=['mean', 'max', 'std'], concat=True)
         """
         return _BatchEdgeView(self)
 
+    def degree_by_graph(self, aggregation='max', direction=None) -> torch.Tensor:
+        """For every graph in the batch, a statistic of the degree of its nodes, computed once and cached.
+
+        Graphs without nodes have zero degree.
+
+        Args:
+            aggregation: one of `'max'`, `'min'`, `'mean'`, `'sum'`
+            direction: `'in'` for `in_degree`, `'out'` for `out_degree` or None for `degree`
+
+        Returns:
+            A tensor of shape `(num_graphs,)`, floating point for `'mean'` and integer otherwise
+        """
+        if direction not in ('in', 'out', None):
+            raise ValueError(f'`direction` must be one of `in`, `out` or None, got {direction}')
+        if aggregation not in ('max', 'min', 'mean', 'sum'):
+            raise ValueError(f'`aggregation` must be one of `max`, `min`, `mean` or `sum`, got {aggregation}')
+
+        def compute():
+            if aggregation in ('mean', 'sum'):
+                # Every edge counts once towards the in-degree of a node and once towards the out-degree of a node
+                total = self.num_edges_by_graph if direction is not None else 2 * self.num_edges_by_graph
+                if aggregation == 'sum':
+                    return total
+                return total.float() / self.num_nodes_by_graph.clamp(min=1).float()
+            degree = {'in': self.in_degree, 'out': self.out_degree, None: self.degree}[direction]
+            return torch_scatter.segment_csr(degree, self.node_offsets, reduce=aggregation)
+
+        return self._cached(('degree_by_graph', aggregation, direction), compute)
+
     @property
     def global_features_shape(self):
         return self.global_features.shape[1:] if self.global_features is not None else None
 
-    def global_features_as_edges(self) -> torch.Tensor:
+    def global_features_as_edges(self, lazy: bool = False) -> Union[torch.Tensor, Broadcast]:
         """Broadcast `global_features` along the the first dimension to match `edge_features`,
         respecting the edge-to-graph assignment
 
+        Args:
+            lazy: return a `Broadcast` that gathers the global features only where it is consumed,
+                e.g. after a projection with `broadcast @ weight.t()` or with `broadcast.add_to(edge_features)`
+
         Returns:
-            a tensor of shape `(num_edges, *global_features_shape)`
+            a tensor of shape `(num_edges, *global_features_shape)`, or a `Broadcast` of that shape if `lazy`
         """
-        return torch.repeat_interleave(self.global_features, self.num_edges_by_graph)
+        broadcast = Broadcast(self.global_features, self.edge_index_by_graph)
+        return broadcast if lazy else broadcast.materialize()
 
-    def global_features_as_nodes(self) -> torch.Tensor:
+    def global_features_as_nodes(self, lazy: bool = False) -> Union[torch.Tensor, Broadcast]:
         """Broadcast `global_features` along the the first dimension to match `node_features`,
         respecting the node-to-graph assignment
 
+        Args:
+            lazy: return a `Broadcast` that gathers the global features only where it is consumed,
+                e.g. after a projection with `broadcast @ weight.t()` or with `broadcast.add_to(node_features)`
+
         Returns:
-            a tensor of shape `(num_nodes, *global_features_shape)`
+            a tensor of shape `(num_nodes, *global_features_shape)`, or a `Broadcast` of that shape if `lazy`
         """
-        return torch.repeat_interleave(self.global_features, self.num_nodes_by_graph)
+        broadcast = Broadcast(self.global_features, self.node_index_by_graph)
+        return broadcast if lazy else broadcast.materialize()
+
+    def __getitem__(self, graph_index: Union[int, slice, Sequence[int], torch.Tensor]):
+        """Random access to the graphs in the batch, for sequential access use `iter(batch)` or `for g in batch`.
 
-    def __getitem__(self, graph_index):
-        """Use for random access, as in `batch[i]`. For sequential access use `iter(batch)` or `for g in batch`
+        - `batch[i]` returns the i-th `Graph` in O(1), once the offsets of the graphs are cached on first access
+        - `batch[i:j]` returns a `GraphBatch` whose tensors are views of this batch, except for the edge indexes
+        - `batch[indexes]` with a sequence or a tensor of indexes, or a boolean mask, returns a `GraphBatch`
+          of the selected graphs, gathered with one `index_select` per tensor
         """
-        node_offset = self.num_nodes_by_graph[:graph_index].sum()
-        edge_offset = self.num_edges_by_graph[:graph_index].sum()
-        n_nodes = self.num_nodes_by_graph[graph_index]
-        n_edges = self.num_edges_by_graph[graph_index]
-        return Graph(
-            num_nodes=n_nodes.item(),
-            num_edges=n_edges.item(),
-            node_features=None if self.node_features is None else self.node_features[node_offset:node_offset + n_nodes],
-            edge_features=None if self.edge_features is None else self.edge_features[edge_offset:edge_offset + n_edges],
-            global_features=self.global_features[graph_index] if self.global_features is not None else None,
-            senders=self.senders[edge_offset:edge_offset + n_edges] - node_offset,
-            receivers=self.receivers[edge_offset:edge_offset + n_edges] - node_offset
-        )
+        index = _as_int_index(graph_index)
+        if index is not None:
+            return self._graph(index)
+        if isinstance(graph_index, slice):
+            start, stop, step = graph_index.indices(self.num_graphs)
+            if step == 1:
+                return self._slice(start, max(start, stop))
+            graph_index = range(start, stop, step)
+        return self._select(_as_graph_indexes(graph_index, self.num_graphs, self.num_nodes_by_graph.device))
+
+    def _graph(self, graph_index: int) -> Graph:
+        if not -self.num_graphs <= graph_index < self.num_graphs:
+            raise IndexError(f'Graph index {graph_index} out of range for a batch of {self.num_graphs} graphs')
+        if graph_index < 0:
+            graph_index += self.num_graphs
+
+        node_offsets, edge_offsets = self._host_offsets
+        node_start, node_end = node_offsets[graph_index], node_offsets[graph_index + 1]
+        edge_start, edge_end = edge_offsets[graph_index], edge_offsets[graph_index + 1]
+        with _trusted_indexes():
+            return Graph(
+                num_nodes=node_end - node_start,
+                num_edges=edge_end - edge_start,
+                node_features=self.node_features[node_start:node_end] if self.node_features is not None else None,
+                edge_features=self.edge_features[edge_start:edge_end] if self.edge_features is not None else None,
+                global_features=self.global_features[graph_index] if self.global_features is not None else None,
+                senders=self.senders[edge_start:edge_end] - node_start,
+                receivers=self.receivers[edge_start:edge_end] - node_start,
+                edge_order=self.edge_order
+            )
+
+    def _slice(self, start: int, stop: int) -> GraphBatch:
+        node_offsets, edge_offsets = self._host_offsets
+        node_start, node_end = node_offsets[start], node_offsets[stop]
+        edge_start, edge_end = edge_offsets[start], edge_offsets[stop]
+        with _trusted_indexes():
+            return GraphBatch(
+                num_nodes=node_end - node_start,
+                num_edges=edge_end - edge_start,
+                num_graphs=stop - start,
+                num_nodes_by_graph=self.num_nodes_by_graph[start:stop],
+                num_edges_by_graph=self.num_edges_by_graph[start:stop],
+                node_features=self.node_features[node_start:node_end] if self.node_features is not None else None,
+                edge_features=self.edge_features[edge_start:edge_end] if self.edge_features is not None else None,
+                global_features=self.global_features[start:stop] if self.global_features is not None else None,
+                senders=self.senders[edge_start:edge_end] - node_start,
+                receivers=self.receivers[edge_start:edge_end] - node_start,
+                edge_order=self.edge_order
+            )
+
+    def _select(self, graph_indexes: torch.LongTensor) -> GraphBatch:
+        num_nodes_by_graph = self.num_nodes_by_graph[graph_indexes]
+        num_edges_by_graph = self.num_edges_by_graph[graph_indexes]
+        node_index = segments_to_index(self.node_offsets[graph_indexes], num_nodes_by_graph)
+        edge_index = segments_to_index(self.edge_offsets[graph_indexes], num_edges_by_graph)
+
+        # Every edge moves by the difference between the new and the old offset of the nodes of its graph
+        node_shift = segment_lengths_to_offsets(num_nodes_by_graph)[:-1] - self.node_offsets[graph_indexes]
+        node_shift = torch.repeat_interleave(node_shift, num_edges_by_graph, output_size=len(edge_index))
+        node_shift = node_shift.to(self.senders.dtype)
+
+        with _trusted_indexes():
+            return GraphBatch(
+                num_nodes=len(node_index),
+                num_edges=len(edge_index),
+                num_graphs=len(graph_indexes),
+                num_nodes_by_graph=num_nodes_by_graph,
+                num_edges_by_graph=num_edges_by_graph,
+                node_features=self.node_features[node_index] if self.node_features is not None else None,
+                edge_features=self.edge_features[edge_index] if self.edge_features is not None else None,
+                global_features=self.global_features[graph_indexes] if self.global_features is not None else None,
+                senders=self.senders[edge_index] + node_shift,
+                receivers=self.receivers[edge_index] + node_shift,
+                edge_order=self.edge_order
+            )
 
     def __iter__(self):
         """Use for sequential access, as in `iter(batch)` or `for g in batch`. For random access use `batch[i].`
         """
-        node_slices = segment_lengths_to_slices(self.num_nodes_by_graph)
-        edge_slices = segment_lengths_to_slices(self.num_edges_by_graph)
-        for graph_index, node_slice, edge_slice in zip(range(self.num_graphs), node_slices, edge_slices):
-            yield Graph(
-                num_nodes=self.num_nodes_by_graph[graph_index].item(),
-                num_edges=self.num_edges_by_graph[graph_index].item(),
-                node_features=self.node_features[node_slice] if self.node_features is not None else None,
-                edge_features=self.edge_features[edge_slice] if self.edge_features is not None else None,
-                global_features=self.global_features[graph_index] if self.global_features is not None else None,
-                senders=self.senders[edge_slice] - node_slice.start,
-                receivers=self.receivers[edge_slice] - node_slice.start
-            )
-    
+        for graph_index in range(self.num_graphs):
+            yield self._graph(graph_index)
+
     def __repr__(self):
         return (f"{self.__class__.__name__}("
                 f"#{self.num_graphs}, "
@@ -190,13 +337,83 @@ class GraphBatch(_BaseGraph):
                 f"g_shape={self.global_features_shape})")
 
     def to_networkxs(self):
-        return [g.to_networkx() for g in self]
+        return [g.to_networkx() for g in self.to_graphs()]
+
+    def to_graphs(self) -> List[Graph]:
+        """Split the batch into all of its graphs at once, faster than `list(batch)` for large batches.
+
+        The sizes of the graphs are read with a single device synchronization, every field is split with
+        `split_with_sizes` and the edge indexes are re-based in one operation. The graphs are not validated again.
+        """
+        num_nodes_by_graph, num_edges_by_graph = \
+            torch.stack((self.num_nodes_by_graph, self.num_edges_by_graph)).tolist()
+        node_shift = torch.repeat_interleave(
+            self.node_offsets[:-1], self.num_edges_by_graph, output_size=self.num_edges).to(self.senders.dtype)
+        senders = torch.split_with_sizes(self.senders - node_shift, num_edges_by_graph)
+        receivers = torch.split_with_sizes(self.receivers - node_shift, num_edges_by_graph)
+
+        no_features = (None,) * self.num_graphs
+        node_features = no_features if self.node_features is None \
+            else torch.split_with_sizes(self.node_features, num_nodes_by_graph)
+        edge_features = no_features if self.edge_features is None \
+            else torch.split_with_sizes(self.edge_features, num_edges_by_graph)
+        global_features = no_features if self.global_features is None else self.global_features.unbind(0)
+
+        with validation(Validation.OFF):
+            return [
+                Graph(num_nodes=n, num_edges=e, node_features=nf, edge_features=ef, global_features=gf,
+                      senders=s, receivers=r, edge_order=self.edge_order)
+                for n, e, nf, ef, gf, s, r in zip(num_nodes_by_graph, num_edges_by_graph, node_features,
+                                                  edge_features, global_features, senders, receivers)
+            ]
+
+    def split(self, sections: Union[int, Sequence[int]], balance: Optional[str] = None) -> List[GraphBatch]:
+        """Split the batch into contiguous sub-batches, e.g. to distribute it across devices or processes.
+
+        The sub-batches are slices of this batch, their tensors are views of its tensors except for
+        the edge indexes that are re-based to the first node of the sub-batch.
+
+        Args:
+            sections: the number of sub-batches, or a sequence with the number of graphs of every sub-batch
+            balance: if `sections` is a number, how the sub-batches are balanced, with `None` they contain about
+                the same number of graphs, with `'nodes'` or `'edges'` about the same number of nodes or edges
 
-    def to_graphs(self):
-        return list(self)
+        Returns:
+            A list of `GraphBatch`, some may have no graphs if there are fewer graphs than sub-batches
+
+        Examples:
+            >>> batch.split([2, 3, 1])
+            >>> batch.split(4, balance='edges')
+        """
+        if balance not in (None, 'nodes', 'edges'):
+            raise ValueError(f'`balance` must be one of None, `nodes`, `edges`, got {balance}')
+
+        if isinstance(sections, int):
+            if sections < 1:
+                raise ValueError(f'The number of sub-batches must be positive, got {sections}')
+            node_offsets, edge_offsets = self._host_offsets
+            offsets = {None: range(self.num_graphs + 1), 'nodes': node_offsets, 'edges': edge_offsets}[balance]
+            # Cut at the graph boundary closest to every multiple of `total / sections`
+            bounds = [0]
+            for k in range(1, sections):
+                target = offsets[-1] * k / sections
+                i = bisect.bisect_left(offsets, target)
+                if i > 0 and target - offsets[i - 1] <= offsets[i] - target:
+                    i -= 1
+                bounds.append(max(i, bounds[-1]))
+            bounds.append(self.num_graphs)
+        else:
+            if balance is not None:
+                raise ValueError('`balance` can only be used together with a number of sub-batches')
+            sections = list(sections)
+            if any(size < 0 for size in sections) or sum(sections) != self.num_graphs:
+                raise ValueError(f'Sizes {sections} do not add up to the {self.num_graphs} graphs of the batch')
+            bounds = [0] + list(itertools.accumulate(sections))
+
+        return [self._slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
 
     @classmethod
-    def from_graphs(cls, graphs: Sequence[Graph]) -> GraphBatch:
+    def from_graphs(cls, graphs: Sequence[Graph], index_dtype: Optional[torch.dtype] = None) -> GraphBatch:
         """Merges multiple graphs in a batch. All node, edge and graph features must have the same shape if present.
 
         If some graph of the sequence have values for `node_features`, `edge_features`, but some of the others
@@ -205,92 +422,216 @@ class GraphBatch(_BaseGraph):
         values on those graphs with empty tensors of shape `(0, *node_features_shape)` and `(0, *edge_features_shape)`.
           
         The field `global_features` is instead required to be either present on all graphs or absent from all graphs.
+
+        If all graphs have their edges sorted in the same way, the batch retains that `edge_order`.
+
+        The index tensors of the batch have dtype `index_dtype` if given, otherwise the common `index_dtype` of
+        the graphs or `torch.int64` if they differ.
         """
         # TODO if the graphs in `graphs` require grad the resulting batch should require grad too
         if len(graphs) == 0:
             raise ValueError('Graphs list can not be empty')
 
-        node_features = []
-        edge_features = []
-        global_features = []
-        num_nodes_by_graph = []
-        num_edges_by_graph = []
-        senders = []
-        receivers = []
-        node_offset = 0
-        for i, g in enumerate(graphs):
-            if g.node_features is not None:
-                node_features.append(g.node_features)
-            if g.edge_features is not None:
-                edge_features.append(g.edge_features)
-            if g.global_features is not None:
-                global_features.append(g.global_features)
-            num_nodes_by_graph.append(g.num_nodes)
-            num_edges_by_graph.append(g.num_edges)
-            senders.append(g.senders + node_offset)
-            receivers.append(g.receivers + node_offset)
-            node_offset += g.num_nodes
-
-        from torch.utils.data._utils.collate import _use_shared_memory
-
-        if len(node_features) > 0:
-            out = None
-            if _use_shared_memory:
-                numel = sum([x.numel() for x in node_features])
-                storage = node_features[0].storage()._new_shared(numel)
-                out = node_features[0].new(storage)
-            node_features = torch.cat(node_features, out=out)
-        else:
-            node_features = None
-
-        if len(edge_features) > 0:
-            out = None
-            if _use_shared_memory:
-                numel = sum([x.numel() for x in edge_features])
-                storage = edge_features[0].storage()._new_shared(numel)
-                out = edge_features[0].new(storage)
-            edge_features = torch.cat(edge_features, out=out)
-        else:
-            edge_features = None
-
-        if len(global_features) == len(graphs):
-            out = None
-            if _use_shared_memory:
-                numel = sum([x.numel() for x in global_features])
-                storage = global_features[0].storage()._new_shared(numel)
-                out = global_features[0].new(storage)
-            global_features = torch.stack(global_features, out=out)
-        elif len(global_features) == 0:
-            global_features = None
-        else:
+        if index_dtype is None:
+            index_dtype = graphs[0].senders.dtype
+            if any(g.senders.dtype != index_dtype for g in graphs):
+                index_dtype = torch.long
+
+        num_nodes_by_graph = [g.num_nodes for g in graphs]
+        num_edges_by_graph = [g.num_edges for g in graphs]
+        num_nodes = sum(num_nodes_by_graph)
+        num_edges = sum(num_edges_by_graph)
+
+        node_graphs = [g for g in graphs if g.node_features is not None]
+        edge_graphs = [g for g in graphs if g.edge_features is not None]
+        global_graphs = [g for g in graphs if g.global_features is not None]
+        if 0 < len(global_graphs) < len(graphs):
             raise ValueError('The field `global_features` must either be None on all graphs or present on all graphs')
 
-        out = None
-        if _use_shared_memory:
-            numel = sum([x.numel() for x in senders])
-            storage = graphs[0].senders.storage()._new_shared(numel)
-            out = senders[0].new(storage)
-        senders = torch.cat(senders, out=out)
-
-        out = None
-        if _use_shared_memory:
-            numel = sum([x.numel() for x in receivers])
-            storage = graphs[0].receivers.storage()._new_shared(numel)
-            out = receivers[0].new(storage)
-        receivers = torch.cat(receivers, out=out)
-
-        return cls(
-            num_nodes=node_offset,
-            num_edges=len(senders),
-            num_nodes_by_graph=senders.new_tensor(num_nodes_by_graph),
-            num_edges_by_graph=senders.new_tensor(num_edges_by_graph),
-            node_features=node_features,
-            edge_features=edge_features,
-            global_features=global_features,
-            senders=senders,
-            receivers=receivers
+        # All outputs are views of a single buffer, allocated in shared memory when collating in a DataLoader worker
+        device = graphs[0].senders.device
+        shapes = {
+            'indexes': ((2, num_edges), index_dtype),
+            'num_by_graph': ((2, len(graphs)), index_dtype),
+            'node_offsets': ((len(graphs) + 1,), torch.long),
+        }
+        # Global features are stacked, one row per graph, node and edge features are concatenated
+        features = {}
+        combine = {'node_features': torch.cat, 'edge_features': torch.cat, 'global_features': torch.stack}
+        for name, feature_graphs in (('node_features', node_graphs), ('edge_features', edge_graphs),
+                                     ('global_features', global_graphs)):
+            tensors = [getattr(g, name) for g in feature_graphs]
+            if len(tensors) == 0:
+                continue
+            if torch.is_grad_enabled() and any(t.requires_grad for t in tensors):
+                # Concatenating into a preallocated buffer is not differentiable
+                features[name] = combine[name](tensors)
+            elif combine[name] is torch.stack:
+                shapes[name] = ((len(tensors), *tensors[0].shape), tensors[0].dtype)
+                features[name] = tensors
+            else:
+                shapes[name] = ((sum(len(t) for t in tensors), *tensors[0].shape[1:]), tensors[0].dtype)
+                features[name] = tensors
+        shared = device.type == 'cpu' and get_worker_info() is not None
+        if shared:
+            # Derived indexes are also sent to the main process, so they live in the same buffer
+            shapes['node_index_by_graph'] = ((num_nodes,), index_dtype)
+            shapes['edge_index_by_graph'] = ((num_edges,), index_dtype)
+        out = _allocate_views(shapes, device=device, shared=shared)
+
+        # Raw senders and receivers are concatenated once, then offset by the first node of their graph
+        indexes = out['indexes']
+        torch.cat([g.senders for g in graphs], out=indexes[0])
+        torch.cat([g.receivers for g in graphs], out=indexes[1])
+        num_by_graph = out['num_by_graph'].copy_(torch.tensor([num_nodes_by_graph, num_edges_by_graph]))
+        node_offsets = out['node_offsets']
+        node_offsets[0] = 0
+        torch.cumsum(num_by_graph[0], dim=0, out=node_offsets[1:])
+        indexes += torch.repeat_interleave(
+            node_offsets[:-1].to(index_dtype), num_by_graph[1], output_size=num_edges)
+
+        for name in features:
+            if name in out:
+                features[name] = combine[name](features[name], out=out[name])
+
+        # The edge indexes of the batch are valid if those of the graphs are
+        with _trusted_indexes():
+            batch = cls(
+                num_nodes=num_nodes,
+                num_edges=num_edges,
+                num_nodes_by_graph=num_by_graph[0],
+                num_edges_by_graph=num_by_graph[1],
+                node_features=features.get('node_features'),
+                edge_features=features.get('edge_features'),
+                global_features=features.get('global_features'),
+                senders=indexes[0],
+                receivers=indexes[1],
+                edge_order=graphs[0].edge_order if all(g.edge_order == graphs[0].edge_order for g in graphs) else None
+            )
+        cache = batch.structure.cache
+        cache['node_offsets'] = node_offsets
+        if shared:
+            cache['node_index_by_graph'] = out['node_index_by_graph'].copy_(segment_lengths_to_ids(num_by_graph[0]))
+            cache['edge_index_by_graph'] = out['edge_index_by_graph'].copy_(segment_lengths_to_ids(num_by_graph[1]))
+        return batch
+
+    @classmethod
+    def cat(cls, batches: Sequence[GraphBatch], index_dtype: Optional[torch.dtype] = None) -> GraphBatch:
+        """Concatenate batches into one batch, e.g. to merge micro-batches, without unbatching their graphs.
+
+        Every field is concatenated once and the edge indexes of every batch are offset in place as a single block.
+        The same rules as in `from_graphs` apply to missing features, `edge_order` and `index_dtype`.
+        The batches are not validated again.
+        """
+        if len(batches) == 0:
+            raise ValueError('Batches list can not be empty')
+
+        if index_dtype is None:
+            index_dtype = batches[0].senders.dtype
+            if any(b.senders.dtype != index_dtype for b in batches):
+                index_dtype = torch.long
+
+        num_nodes = sum(b.num_nodes for b in batches)
+        num_edges = sum(b.num_edges for b in batches)
+        num_graphs = sum(b.num_graphs for b in batches)
+        if 0 < sum(b.global_features is not None for b in batches) < len(batches):
+            raise ValueError('The field `global_features` must either be None on all batches or present on all batches')
+
+        device = batches[0].senders.device
+        shapes = {
+            'indexes': ((2, num_edges), index_dtype),
+            'num_by_graph': ((2, num_graphs), index_dtype),
+            'node_offsets': ((num_graphs + 1,), torch.long),
+        }
+        features = {}
+        for name, num_rows in (('node_features', num_nodes), ('edge_features', num_edges),
+                               ('global_features', num_graphs)):
+            tensors = [getattr(b, name) for b in batches if getattr(b, name) is not None]
+            if len(tensors) == 0:
+                continue
+            if torch.is_grad_enabled() and any(t.requires_grad for t in tensors):
+                # Concatenating into a preallocated buffer is not differentiable
+                features[name] = torch.cat(tensors)
+            else:
+                shapes[name] = ((sum(len(t) for t in tensors), *tensors[0].shape[1:]), tensors[0].dtype)
+                features[name] = tensors
+        out = _allocate_views(shapes, device=device, shared=device.type == 'cpu' and get_worker_info() is not None)
+        for name in features:
+            if name in out:
+                features[name] = torch.cat(features[name], out=out[name])
+
+        indexes = out['indexes']
+        torch.cat([b.senders for b in batches], out=indexes[0])
+        torch.cat([b.receivers for b in batches], out=indexes[1])
+        num_by_graph = out['num_by_graph']
+        torch.cat([b.num_nodes_by_graph for b in batches], out=num_by_graph[0])
+        torch.cat([b.num_edges_by_graph for b in batches], out=num_by_graph[1])
+        node_offsets = out['node_offsets']
+        node_offsets[0] = 0
+        torch.cumsum(num_by_graph[0], dim=0, out=node_offsets[1:])
+
+        # The indexes of every batch move by the number of nodes in the batches before it
+        node_start, edge_start = 0, 0
+        for b in batches:
+            if node_start > 0:
+                indexes[:, edge_start:edge_start + b.num_edges] += node_start
+            node_start += b.num_nodes
+            edge_start += b.num_edges
+
+        with _trusted_indexes():
+            batch = cls(
+                num_nodes=num_nodes,
+                num_edges=num_edges,
+                num_graphs=num_graphs,
+                num_nodes_by_graph=num_by_graph[0],
+                num_edges_by_graph=num_by_graph[1],
+                node_features=features.get('node_features'),
+                edge_features=features.get('edge_features'),
+                global_features=features.get('global_features'),
+                senders=indexes[0],
+                receivers=indexes[1],
+                edge_order=batches[0].edge_order if all(b.edge_order == batches[0].edge_order for b in batches)
+                else None
+            )
+        batch.structure.cache['node_offsets'] = node_offsets
+        return batch
+
+    def to_tensors(self) -> GraphTensors:
+        """The batch as a `GraphTensors`, for scripted or compiled models. The tensors are shared, not copied."""
+        return GraphTensors(
+            senders=self.senders,
+            receivers=self.receivers,
+            num_nodes_by_graph=self.num_nodes_by_graph,
+            num_edges_by_graph=self.num_edges_by_graph,
+            node_index_by_graph=self.node_index_by_graph,
+            edge_index_by_graph=self.edge_index_by_graph,
+            node_features=self.node_features,
+            edge_features=self.edge_features,
+            global_features=self.global_features
         )
 
+    @classmethod
+    def from_tensors(cls, tensors: GraphTensors) -> GraphBatch:
+        """The batch of a `GraphTensors`, e.g. the output of a scripted or compiled model.
+
+        The batch is validated as usual, the derived indexes of `tensors` are reused.
+        """
+        batch = cls(
+            num_nodes=len(tensors.node_index_by_graph),
+            num_edges=len(tensors.senders),
+            num_graphs=len(tensors.num_nodes_by_graph),
+            num_nodes_by_graph=tensors.num_nodes_by_graph,
+            num_edges_by_graph=tensors.num_edges_by_graph,
+            node_features=tensors.node_features,
+            edge_features=tensors.edge_features,
+            global_features=tensors.global_features,
+            senders=tensors.senders,
+            receivers=tensors.receivers
+        )
+        batch.structure.cache['node_index_by_graph'] = tensors.node_index_by_graph
+        batch.structure.cache['edge_index_by_graph'] = tensors.edge_index_by_graph
+        return batch
+
     @classmethod
     def from_networkxs(cls, networkxs: Iterable[nx.Graph]) -> GraphBatch:
         return cls.from_graphs([Graph.from_networkx(graph_nx) for graph_nx in networkxs])
@@ -321,14 +662,13 @@ class GraphBatch(_BaseGraph):
             return default_collate(samples)
 
 
+for _name in ('num_graphs', 'num_nodes_by_graph', 'num_edges_by_graph'):
+    setattr(GraphBatch, _name, _topology_property(_name))
+
+
 class _BatchView(object):
     def __init__(self, batch: GraphBatch):
         self._batch = batch
-        self._pooling_functions = {
-            'mean': lambda src, idx: torch_scatter.scatter_mean(src, idx, dim=0, dim_size=batch.num_graphs),
-            'sum': lambda src, idx: torch_scatter.scatter_add(src, idx, dim=0, dim_size=batch.num_graphs),
-            'max': lambda src, idx: torch_scatter.scatter_max(src, idx, dim=0, dim_size=batch.num_graphs)[0],
-        }
 
     def __len__(self):
         return self._batch.num_graphs
@@ -336,13 +676,14 @@ class _BatchView(object):
 
 class _BatchNodeView(_BatchView):
     def __getitem__(self, graph_index) -> torch.Tensor:
-        node_offset = self._batch.num_nodes_by_graph[:graph_index].sum()
-        num_nodes = self._batch.num_nodes_by_graph[graph_index]
-        return self._batch.node_features[node_offset:node_offset + num_nodes]
+        node_offsets, _ = self._batch._host_offsets
+        graph_index = range(self._batch.num_graphs)[graph_index]
+        return self._batch.node_features[node_offsets[graph_index]:node_offsets[graph_index + 1]]
 
     def __iter__(self) -> Iterator[torch.Tensor]:
-        for slice_ in segment_lengths_to_slices(self._batch.num_nodes_by_graph):
-            yield self._batch.node_features[slice_]
+        node_offsets, _ = self._batch._host_offsets
+        for start, end in zip(node_offsets[:-1], node_offsets[1:]):
+            yield self._batch.node_features[start:end]
 
     def as_tuple(self) -> Tuple[torch.Tensor]:
         """Convenience method to get a tuple of non-aggregated node features.
@@ -350,20 +691,27 @@ class _BatchNodeView(_BatchView):
         Better than building a tuple from the iterator: `tuple(batch.node_features_by_graph)`"""
         return torch.split_with_sizes(self._batch.node_features, self._batch.num_nodes_by_graph.tolist(), dim=0)
 
-    def __call__(self, aggregation) -> torch.Tensor:
-        aggregation = self._pooling_functions[aggregation]
-        return aggregation(self._batch.node_features, self._batch.node_index_by_graph)
+    def __call__(self, aggregation, concat=False) -> torch.Tensor:
+        if isinstance(aggregation, (list, tuple)):
+            results = scatter_many(self._batch.node_features, self._batch.node_index_by_graph, self._batch.num_graphs,
+                                   aggregation, pointers=self._batch.node_offsets)
+            return torch.cat(results, dim=-1) if concat else tuple(results)
+        if isinstance(aggregation, str):
+            # Nodes are sorted by graph
+            return torch_scatter.segment_csr(self._batch.node_features, self._batch.node_offsets, reduce=aggregation)
+        return aggregation(self._batch.node_features, self._batch.node_index_by_graph.long())
 
 
 class _BatchEdgeView(_BatchView):
     def __getitem__(self, graph_index) -> torch.Tensor:
-        edge_offset = self._batch.num_edges_by_graph[:graph_index].sum()
-        num_edges = self._batch.num_edges_by_graph[graph_index]
-        return self._batch.edge_features[edge_offset:edge_offset + num_edges]
+        _, edge_offsets = self._batch._host_offsets
+        graph_index = range(self._batch.num_graphs)[graph_index]
+        return self._batch.edge_features[edge_offsets[graph_index]:edge_offsets[graph_index + 1]]
 
     def __iter__(self) -> Iterator[torch.Tensor]:
-        for slice_ in segment_lengths_to_slices(self._batch.num_edges_by_graph):
-            yield self._batch.edge_features[slice_]
+        _, edge_offsets = self._batch._host_offsets
+        for start, end in zip(edge_offsets[:-1], edge_offsets[1:]):
+            yield self._batch.edge_features[start:end]
 
     def as_tuple(self) -> Tuple[torch.Tensor]:
         """Convenience method to get a tuple of non-aggregated edge features.
@@ -371,6 +719,37 @@ class _BatchEdgeView(_BatchView):
         Better than building a tuple from the iterator: `tuple(batch.edge_features_by_graph)`"""
         return torch.split_with_sizes(self._batch.edge_features, self._batch.num_edges_by_graph.tolist(), dim=0)
 
-    def __call__(self, aggregation) -> torch.Tensor:
-        aggregation = self._pooling_functions[aggregation]
-        return aggregation(self._batch.edge_features, self._batch.edge_index_by_graph)
+    def __call__(self, aggregation, concat=False) -> torch.Tensor:
+        if isinstance(aggregation, (list, tuple)):
+            results = scatter_many(self._batch.edge_features, self._batch.edge_index_by_graph, self._batch.num_graphs,
+                                   aggregation, pointers=self._batch.edge_offsets)
+            return torch.cat(results, dim=-1) if concat else tuple(results)
+        if isinstance(aggregation, str):
+            # Edges are sorted by graph
+            return torch_scatter.segment_csr(self._batch.edge_features, self._batch.edge_offsets, reduce=aggregation)
+        return aggregation(self._batch.edge_features, self._batch.edge_index_by_graph.long())
+
+
+def _as_int_index(index) -> Optional[int]:
+    """The index as an int if it selects a single graph, otherwise None."""
+    if isinstance(index, torch.Tensor):
+        if index.dim() == 0 and not index.is_floating_point() and index.dtype != torch.bool:
+            return index.item()
+        return None
+    try:
+        return operator.index(index)
+    except TypeError:
+        return None
+
+
+def _as_graph_indexes(graph_indexes, num_graphs: int, device: torch.device) -> torch.LongTensor:
+    """Convert a sequence of indexes, an index tensor or a boolean mask to a tensor of non-negative indexes."""
+    graph_indexes = torch.as_tensor(graph_indexes, device=device)
+    if graph_indexes.dtype == torch.bool:
+        if graph_indexes.shape != (num_graphs,):
+            raise IndexError(f'A boolean mask must have shape ({num_graphs},), got {tuple(graph_indexes.shape)}')
+        return graph_indexes.nonzero().squeeze(1)
+    graph_indexes = graph_indexes.long().reshape(-1)
+    if ((graph_indexes < -num_graphs) | (graph_indexes >= num_graphs)).any():
+        raise IndexError(f'Graph indexes out of range for {num_graphs} graphs')
+    return torch.where(graph_indexes < 0, graph_indexes + num_graphs, graph_indexes)
@@ -0,0 +1,187 @@
+import queue
+import threading
+import contextlib
+import dataclasses
+import collections.abc
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Union
+
+import torch
+
+from .base import _BaseGraph, GraphStructure
+
+
+class PrefetchLoader(object):
+    """Wraps a loader so that the next batches are prepared on a background thread while the current one is used.
+
+    For every item of `loader` the background thread runs `collate_fn` (if given), pins the tensors in page-locked
+    memory (if `pin_memory`) and moves them to `device` with `non_blocking=True`, then puts the result in a queue
+    of at most `prefetch` batches. Items can be graphs, batches, tensors, or tuples, lists and dicts of them.
+
+    On CUDA, transfers run on a separate stream and the current stream waits for them before a batch is returned.
+    Graphs and batches are not pinned as a whole: `to()` copies all their tensors, including the cached indexes,
+    into one pinned staging buffer that is moved with a single transfer. Every batch that can be in flight,
+    i.e. `prefetch + 1`, has its own staging buffers, which are reused once their previous transfer is complete.
+    With `device=None` or a CPU device, the transfer is a no-op and batches are only collated ahead of time.
+
+    Examples:
+        * Collate in DataLoader workers, transfer the next batch while the model runs on the current one
+
+          >>> loader = DataLoader(graphs, batch_size=32, num_workers=4, collate_fn=GraphBatch.collate)
+          >>> for batch in PrefetchLoader(loader, device='cuda'):
+          >>>     output = model(batch)
+
+        * Collate on the background thread
+
+          >>> loader = DataLoader(graphs, batch_size=32, collate_fn=list)
+          >>> loader = PrefetchLoader(loader, collate_fn=GraphBatch.collate)
+    """
+
+    def __init__(self, loader: Iterable, device: Union[torch.device, str, None] = None,
+                 collate_fn: Optional[Callable] = None, pin_memory: Optional[bool] = None, prefetch: int = 2):
+        if prefetch < 1:
+            raise ValueError(f'`prefetch` must be positive, got {prefetch}')
+        self.loader = loader
+        self.device = torch.device(device) if device is not None else torch.device('cpu')
+        self.collate_fn = collate_fn
+        self.pin_memory = self.device.type == 'cuda' if pin_memory is None else pin_memory
+        self.prefetch = prefetch
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self) -> Iterator[Any]:
+        batches = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        stream = torch.cuda.Stream(self.device) if self.device.type == 'cuda' else None
+        thread = threading.Thread(target=self._prepare_batches, args=(batches, stop, stream), daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                item = batches.get()
+                if item is _END:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.exception
+                batch, event = item
+                if event is not None:
+                    current_stream = torch.cuda.current_stream(self.device)
+                    current_stream.wait_event(event)
+                    # The memory of the batch was allocated on the side stream but is now used on the current one
+                    for tensor in _tensors(batch):
+                        tensor.record_stream(current_stream)
+                yield batch
+        finally:
+            stop.set()
+            # Unblock the background thread if it is waiting on a full queue
+            while thread.is_alive():
+                try:
+                    batches.get(timeout=0.01)
+                except queue.Empty:
+                    pass
+            thread.join()
+
+    def _prepare_batches(self, batches: queue.Queue, stop: threading.Event, stream: Optional['torch.cuda.Stream']):
+        def put(item):
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        # Graphs are copied into the staging buffers of their slot by `to()`, other tensors are pinned one by one
+        staged = self.pin_memory and self.device.type == 'cuda'
+        slots = [_StagingBuffers() for _ in range(self.prefetch + 1)] if staged else None
+
+        try:
+            for i, batch in enumerate(self.loader):
+                if self.collate_fn is not None:
+                    batch = self.collate_fn(batch)
+                staging = slots[i % len(slots)].reset() if staged else None
+                if self.pin_memory:
+                    batch = _apply(batch, lambda x: x if staged and isinstance(x, _BaseGraph) else x.pin_memory())
+                event = None
+                if self.device.type != 'cpu':
+                    def move(x):
+                        if isinstance(x, _BaseGraph):
+                            return x._to(self.device, non_blocking=True, index_dtype=None, dtype=None, staging=staging)
+                        return x.to(self.device, non_blocking=True)
+
+                    with torch.cuda.stream(stream) if stream is not None else contextlib.nullcontext():
+                        batch = _apply(batch, move)
+                    if stream is not None:
+                        event = torch.cuda.Event()
+                        event.record(stream)
+                        if staged:
+                            staging.event = event
+                if not put((batch, event)):
+                    return
+            put(_END)
+        except Exception as e:
+            put(_Failure(e))
+
+
+class _StagingBuffers(object):
+    """Pinned buffers reused for the graphs of the batches that go through the same prefetch slot.
+
+    Called with a number of bytes, returns the next buffer of the slot, grown to at least that size.
+    """
+
+    def __init__(self):
+        self.buffers = []
+        self.used = 0
+        # Recorded after the transfers from these buffers, which must complete before the buffers are overwritten
+        self.event = None
+
+    def reset(self):
+        if self.event is not None:
+            self.event.synchronize()
+            self.event = None
+        self.used = 0
+        return self
+
+    def __call__(self, num_bytes: int) -> torch.Tensor:
+        if self.used == len(self.buffers):
+            self.buffers.append(None)
+        buffer = self.buffers[self.used]
+        if buffer is None or len(buffer) < num_bytes:
+            buffer = self.buffers[self.used] = torch.empty(num_bytes, dtype=torch.uint8, pin_memory=True)
+        self.used += 1
+        return buffer
+
+
+_END = object()
+
+
+class _Failure(NamedTuple):
+    exception: Exception
+
+
+def _apply(obj, fn: Callable):
+    """Apply `fn` to all graphs, batches and tensors in a possibly nested structure."""
+    if isinstance(obj, (_BaseGraph, torch.Tensor)):
+        return fn(obj)
+    if isinstance(obj, collections.abc.Mapping):
+        return {key: _apply(value, fn) for key, value in obj.items()}
+    if isinstance(obj, tuple) and hasattr(obj, '_fields'):
+        return type(obj)(*(_apply(value, fn) for value in obj))
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_apply(value, fn) for value in obj)
+    return obj
+
+
+def _tensors(obj) -> Iterator[torch.Tensor]:
+    """All tensors in a possibly nested structure, including the derived tensors of graphs and batches."""
+    if isinstance(obj, torch.Tensor):
+        yield obj
+    elif isinstance(obj, (_BaseGraph, GraphStructure)):
+        for field in dataclasses.fields(obj):
+            yield from _tensors(getattr(obj, field.name))
+    elif isinstance(obj, collections.abc.Mapping):
+        for value in obj.values():
+            yield from _tensors(value)
+    elif isinstance(obj, (list, tuple)):
+        for value in obj:
+            yield from _tensors(value)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from typing import Iterator, List, Optional, Sequence, Union
+
+import torch
+from torch.utils.data import Sampler
+
+from .graph import Graph
+from .store import GraphStore
+
+
+class BudgetBatchSampler(Sampler):
+    """Batch sampler that packs graphs into batches up to a budget of nodes, edges and/or graphs.
+
+    Batches are filled greedily in the sampling order and a batch is closed as soon as the next graph would exceed
+    one of the budgets. A graph that alone exceeds a budget forms a batch of its own.
+
+    If `bucket_size` is given, the sampling order is split in buckets of that many graphs and the graphs of every
+    bucket are sorted by size before packing, so that graphs of similar size end up in the same batch.
+    When shuffling, the resulting batches are shuffled again so that their sizes do not follow the sorting.
+
+    With a `seed`, the batches only depend on the seed and on the epoch set with `set_epoch()`,
+    otherwise every iteration draws new batches. In both cases `len(sampler)` is the number of batches
+    of the next iteration.
+
+    Examples:
+        * Batches of at most 10k nodes and 30k edges, drawn from graphs of similar size
+
+          >>> sampler = BudgetBatchSampler.from_graphs(graphs, max_nodes=10_000, max_edges=30_000, bucket_size=1024)
+          >>> loader = DataLoader(graphs, batch_sampler=sampler, collate_fn=GraphBatch.collate)
+
+        * With a `GraphStore`, the sizes are read from the store and batches are built directly by the store
+
+          >>> sampler = BudgetBatchSampler.from_store(store, max_nodes=10_000, seed=0)
+          >>> loader = DataLoader(store, sampler=sampler, batch_size=None)
+    """
+
+    def __init__(self, num_nodes_by_graph: Union[Sequence[int], torch.Tensor],
+                 num_edges_by_graph: Union[Sequence[int], torch.Tensor, None] = None,
+                 max_nodes: Optional[int] = None, max_edges: Optional[int] = None, max_graphs: Optional[int] = None,
+                 shuffle: bool = True, bucket_size: Optional[int] = None, seed: Optional[int] = None):
+        super(BudgetBatchSampler, self).__init__()
+        if max_nodes is None and max_edges is None and max_graphs is None:
+            raise ValueError('At least one of `max_nodes`, `max_edges` and `max_graphs` must be given')
+        if max_edges is not None and num_edges_by_graph is None:
+            raise ValueError('`num_edges_by_graph` is required for an edge budget')
+        if bucket_size is not None and bucket_size < 1:
+            raise ValueError(f'`bucket_size` must be positive, got {bucket_size}')
+
+        self.num_nodes_by_graph = torch.as_tensor(num_nodes_by_graph, dtype=torch.long)
+        self.num_edges_by_graph = torch.as_tensor(num_edges_by_graph, dtype=torch.long) \
+            if num_edges_by_graph is not None else torch.zeros_like(self.num_nodes_by_graph)
+        if self.num_nodes_by_graph.shape != self.num_edges_by_graph.shape or self.num_nodes_by_graph.dim() != 1:
+            raise ValueError(f'`num_nodes_by_graph`, `num_edges_by_graph` must be 1D and have the same length, '
+                             f'got shapes {tuple(self.num_nodes_by_graph.shape)}, {tuple(self.num_edges_by_graph.shape)}')
+
+        self.max_nodes = max_nodes
+        self.max_edges = max_edges
+        self.max_graphs = max_graphs
+        self.shuffle = shuffle
+        self.bucket_size = bucket_size
+        self.seed = seed
+        self.epoch = 0
+        self._next_batches = None
+
+    @classmethod
+    def from_store(cls, store: GraphStore, **kwargs) -> BudgetBatchSampler:
+        return cls(store.num_nodes_by_graph, store.num_edges_by_graph, **kwargs)
+
+    @classmethod
+    def from_graphs(cls, graphs: Sequence[Graph], **kwargs) -> BudgetBatchSampler:
+        return cls([g.num_nodes for g in graphs], [g.num_edges for g in graphs], **kwargs)
+
+    def set_epoch(self, epoch: int):
+        """Set the epoch used together with `seed` to draw the batches, as in `DistributedSampler`."""
+        self.epoch = epoch
+        self._next_batches = None
+
+    def _generator(self) -> torch.Generator:
+        generator = torch.Generator()
+        if self.seed is not None:
+            generator.manual_seed(self.seed + self.epoch)
+        else:
+            generator.seed()
+        return generator
+
+    def _batches(self) -> List[List[int]]:
+        generator = self._generator()
+        num_graphs = len(self.num_nodes_by_graph)
+        order = torch.randperm(num_graphs, generator=generator) if self.shuffle else torch.arange(num_graphs)
+
+        if self.bucket_size is not None and num_graphs > 0:
+            # Sort by the size that is constrained by a budget, nodes if both are
+            sizes = self.num_edges_by_graph if self.max_nodes is None else self.num_nodes_by_graph
+            buckets = order.split(self.bucket_size)
+            order = torch.cat([bucket[torch.sort(sizes[bucket], stable=True)[1]] for bucket in buckets])
+
+        max_nodes = self.max_nodes if self.max_nodes is not None else float('inf')
+        max_edges = self.max_edges if self.max_edges is not None else float('inf')
+        max_graphs = self.max_graphs if self.max_graphs is not None else float('inf')
+        batches = []
+        batch, batch_nodes, batch_edges = [], 0, 0
+        for graph_index, nodes, edges in zip(order.tolist(), self.num_nodes_by_graph[order].tolist(),
+                                             self.num_edges_by_graph[order].tolist()):
+            if len(batch) > 0 and (batch_nodes + nodes > max_nodes or batch_edges + edges > max_edges
+                                   or len(batch) + 1 > max_graphs):
+                batches.append(batch)
+                batch, batch_nodes, batch_edges = [], 0, 0
+            batch.append(graph_index)
+            batch_nodes += nodes
+            batch_edges += edges
+        if len(batch) > 0:
+            batches.append(batch)
+
+        if self.shuffle and self.bucket_size is not None:
+            batches = [batches[i] for i in torch.randperm(len(batches), generator=generator).tolist()]
+        return batches
+
+    def __iter__(self) -> Iterator[List[int]]:
+        batches = self._next_batches if self._next_batches is not None else self._batches()
+        self._next_batches = None
+        return iter(batches)
+
+    def __len__(self):
+        if self._next_batches is None:
+            self._next_batches = self._batches()
+        return len(self._next_batches)
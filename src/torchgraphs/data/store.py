@@ -0,0 +1,407 @@
+from __future__ import annotations
+
+import json
+import pathlib
+import dataclasses
+from typing import Iterator, Iterable, Optional, Sequence, Union
+
+import numpy as np
+import torch
+
+from .graph import Graph
+from .graphbatch import GraphBatch, _as_int_index, _as_graph_indexes
+from .validation import Validation, get_validation, validation, _trusted_indexes
+from ..utils import segment_lengths_to_offsets, segment_lengths_to_ids, segments_to_index
+
+
+@dataclasses.dataclass
+class GraphStore(object):
+    """A dataset of graphs held as a few concatenated tensors, in the same layout as a `GraphBatch`.
+
+    Features of all graphs are concatenated along the first dimension and `num_nodes_by_graph`, `num_edges_by_graph`
+    give the size of every graph. Unlike in a batch, `senders` and `receivers` index the nodes of their own graph,
+    so that every graph is a slice of the concatenated tensors and a minibatch only needs to offset its indexes.
+
+    The store is meant to live in CPU memory, random access is O(1) and does not copy any tensor.
+    It can be saved to a directory of flat arrays and loaded back as memory-mapped tensors, see `load()`.
+
+    Examples:
+        * Pack a list of graphs
+
+          >>> store = GraphStore.from_graphs(graphs)
+
+        * Get a single graph, whose tensors are views of the store
+
+          >>> store[graph_index]
+
+        * Get a minibatch from a slice, a sequence of indexes or a boolean mask
+
+          >>> store[10:42]
+          >>> store[[3, 1, 4, 1, 5]]
+
+        * Write graphs to disk one at a time, then map them in memory
+
+          >>> GraphStore.write_graphs(graphs, 'dataset/')
+          >>> store = GraphStore.load('dataset/')
+
+        * Load minibatches without collating individual graphs
+
+          >>> sampler = BatchSampler(RandomSampler(store), batch_size=32, drop_last=False)
+          >>> loader = DataLoader(store, sampler=sampler, batch_size=None)
+    """
+    num_nodes_by_graph: torch.LongTensor
+    num_edges_by_graph: torch.LongTensor
+    senders: torch.LongTensor
+    receivers: torch.LongTensor
+    node_features: Optional[torch.Tensor] = None
+    edge_features: Optional[torch.Tensor] = None
+    global_features: Optional[torch.Tensor] = None
+    edge_order: Optional[str] = None
+    node_offsets: Optional[torch.LongTensor] = dataclasses.field(default=None, repr=False)
+    edge_offsets: Optional[torch.LongTensor] = dataclasses.field(default=None, repr=False)
+
+    _tensor_fields = ('num_nodes_by_graph', 'num_edges_by_graph', 'node_offsets', 'edge_offsets',
+                      'senders', 'receivers', 'node_features', 'edge_features', 'global_features')
+    _format_version = 1
+
+    def __post_init__(self):
+        if self.node_offsets is None:
+            self.node_offsets = segment_lengths_to_offsets(self.num_nodes_by_graph)
+        if self.edge_offsets is None:
+            self.edge_offsets = segment_lengths_to_offsets(self.num_edges_by_graph)
+        # Host copies of the offsets so that accessing a single graph requires no tensor operation
+        self._node_offsets = self.node_offsets.cpu().numpy()
+        self._edge_offsets = self.edge_offsets.cpu().numpy()
+        self._validate()
+
+    def _validate(self):
+        level = get_validation()
+        if level is Validation.OFF:
+            return
+
+        num_graphs = len(self.num_nodes_by_graph)
+        num_nodes = int(self._node_offsets[-1])
+        num_edges = int(self._edge_offsets[-1])
+        if len(self.num_edges_by_graph) != num_graphs:
+            raise ValueError(f'`len(num_nodes_by_graph)`, `len(num_edges_by_graph)` must match, '
+                             f'got {num_graphs}, {len(self.num_edges_by_graph)}')
+        if not (num_graphs + 1 == len(self.node_offsets) == len(self.edge_offsets)):
+            raise ValueError(f'`len(num_nodes_by_graph) + 1`, `len(node_offsets)`, `len(edge_offsets)` must match, '
+                             f'got {num_graphs + 1}, {len(self.node_offsets)}, {len(self.edge_offsets)}')
+        if not (num_edges == len(self.senders) == len(self.receivers)):
+            raise ValueError(f'`sum(num_edges_by_graph)`, `len(senders)`, `len(receivers)` must match, '
+                             f'got {num_edges}, {len(self.senders)}, {len(self.receivers)}')
+        if self.senders.dtype not in Graph._index_dtypes or self.receivers.dtype != self.senders.dtype:
+            raise ValueError(f'`senders`, `receivers` must have the same dtype, one of {Graph._index_dtypes}, '
+                             f'got {self.senders.dtype}, {self.receivers.dtype}')
+        if self.edge_order is not None and self.edge_order not in Graph._edge_orders:
+            raise ValueError(f'`edge_order` must be None or one of {Graph._edge_orders}, got {self.edge_order}')
+        if self.node_features is not None and len(self.node_features) != num_nodes:
+            raise ValueError(f'`sum(num_nodes_by_graph)`, `len(node_features)` must match, '
+                             f'got {num_nodes}, {len(self.node_features)}')
+        if self.edge_features is not None and len(self.edge_features) != num_edges:
+            raise ValueError(f'`sum(num_edges_by_graph)`, `len(edge_features)` must match, '
+                             f'got {num_edges}, {len(self.edge_features)}')
+        if self.global_features is not None and len(self.global_features) != num_graphs:
+            raise ValueError(f'`len(num_nodes_by_graph)`, `len(global_features)` must match, '
+                             f'got {num_graphs}, {len(self.global_features)}')
+
+        if level is Validation.FULL:
+            if (self.num_nodes_by_graph < 0).any() or (self.num_edges_by_graph < 0).any():
+                raise ValueError('`num_nodes_by_graph`, `num_edges_by_graph` cannot be negative')
+            if not torch.equal(self.node_offsets, segment_lengths_to_offsets(self.num_nodes_by_graph)):
+                raise ValueError('`node_offsets` must be the cumulative sum of `num_nodes_by_graph`')
+            if not torch.equal(self.edge_offsets, segment_lengths_to_offsets(self.num_edges_by_graph)):
+                raise ValueError('`edge_offsets` must be the cumulative sum of `num_edges_by_graph`')
+            num_nodes_by_edge = torch.repeat_interleave(self.num_nodes_by_graph, self.num_edges_by_graph)
+            for name in ('senders', 'receivers'):
+                index = getattr(self, name)
+                if ((index < 0) | (index >= num_nodes_by_edge)).any():
+                    raise ValueError(f'Some `{name}` are out of bounds for the graph they belong to')
+            if self.edge_order is not None:
+                index = self.senders if self.edge_order == 'sender' else self.receivers
+                edge_index_by_graph = segment_lengths_to_ids(self.num_edges_by_graph)
+                same_graph = edge_index_by_graph[1:] == edge_index_by_graph[:-1]
+                if (same_graph & (index[1:] < index[:-1])).any():
+                    raise ValueError(f'Edges are not sorted by {self.edge_order}')
+
+    @property
+    def num_graphs(self) -> int:
+        return len(self.num_nodes_by_graph)
+
+    def __len__(self):
+        return self.num_graphs
+
+    def __getitem__(self, index: Union[int, slice, Sequence[int], torch.Tensor]) -> Union[Graph, GraphBatch]:
+        """A single `Graph` for an integer index, otherwise a `GraphBatch` as in `store.batch(index)`."""
+        graph_index = _as_int_index(index)
+        if graph_index is not None:
+            return self.graph(graph_index)
+        return self.batch(index)
+
+    def __iter__(self) -> Iterator[Graph]:
+        for graph_index in range(self.num_graphs):
+            yield self.graph(graph_index)
+
+    def graph(self, graph_index: int) -> Graph:
+        """The graph at `graph_index`, in O(1). Its tensors are views of the store and it is not validated again."""
+        if not -self.num_graphs <= graph_index < self.num_graphs:
+            raise IndexError(f'Graph index {graph_index} out of range for a store with {self.num_graphs} graphs')
+        if graph_index < 0:
+            graph_index += self.num_graphs
+
+        node_start, node_end = (int(o) for o in self._node_offsets[graph_index:graph_index + 2])
+        edge_start, edge_end = (int(o) for o in self._edge_offsets[graph_index:graph_index + 2])
+        with validation(Validation.OFF):
+            return Graph(
+                num_nodes=node_end - node_start,
+                num_edges=edge_end - edge_start,
+                node_features=self.node_features[node_start:node_end] if self.node_features is not None else None,
+                edge_features=self.edge_features[edge_start:edge_end] if self.edge_features is not None else None,
+                global_features=self.global_features[graph_index] if self.global_features is not None else None,
+                senders=self.senders[edge_start:edge_end],
+                receivers=self.receivers[edge_start:edge_end],
+                edge_order=self.edge_order,
+            )
+
+    def batch(self, graph_indexes: Union[slice, Sequence[int], torch.Tensor]) -> GraphBatch:
+        """Build a batch of the selected graphs directly from the concatenated tensors.
+
+        A slice with unit step selects a contiguous range, whose features are views of the store. Any other slice,
+        sequence of indexes or boolean mask gathers the features of the selected graphs with one `index_select`.
+        In both cases only the edge indexes are offset and the batch is not validated again.
+        """
+        if isinstance(graph_indexes, slice):
+            start, stop, step = graph_indexes.indices(self.num_graphs)
+            if step == 1:
+                return self._batch_range(start, max(start, stop))
+            graph_indexes = range(start, stop, step)
+        graph_indexes = _as_graph_indexes(graph_indexes, self.num_graphs, self.num_nodes_by_graph.device)
+
+        num_nodes_by_graph = self.num_nodes_by_graph[graph_indexes]
+        num_edges_by_graph = self.num_edges_by_graph[graph_indexes]
+        node_index = segments_to_index(self.node_offsets[graph_indexes], num_nodes_by_graph)
+        edge_index = segments_to_index(self.edge_offsets[graph_indexes], num_edges_by_graph)
+        batch_node_offsets = segment_lengths_to_offsets(num_nodes_by_graph)
+
+        return self._make_batch(
+            num_nodes_by_graph=num_nodes_by_graph,
+            num_edges_by_graph=num_edges_by_graph,
+            node_offset_by_edge=torch.repeat_interleave(
+                batch_node_offsets[:-1], num_edges_by_graph, output_size=len(edge_index)),
+            node_features=self.node_features.index_select(0, node_index) if self.node_features is not None else None,
+            edge_features=self.edge_features.index_select(0, edge_index) if self.edge_features is not None else None,
+            global_features=self.global_features[graph_indexes] if self.global_features is not None else None,
+            senders=self.senders[edge_index],
+            receivers=self.receivers[edge_index],
+        )
+
+    def _batch_range(self, start: int, stop: int) -> GraphBatch:
+        node_start, node_end = int(self._node_offsets[start]), int(self._node_offsets[stop])
+        edge_start, edge_end = int(self._edge_offsets[start]), int(self._edge_offsets[stop])
+        num_edges_by_graph = self.num_edges_by_graph[start:stop]
+
+        return self._make_batch(
+            num_nodes_by_graph=self.num_nodes_by_graph[start:stop],
+            num_edges_by_graph=num_edges_by_graph,
+            node_offset_by_edge=torch.repeat_interleave(
+                self.node_offsets[start:stop] - node_start, num_edges_by_graph, output_size=edge_end - edge_start),
+            node_features=self.node_features[node_start:node_end] if self.node_features is not None else None,
+            edge_features=self.edge_features[edge_start:edge_end] if self.edge_features is not None else None,
+            global_features=self.global_features[start:stop] if self.global_features is not None else None,
+            senders=self.senders[edge_start:edge_end],
+            receivers=self.receivers[edge_start:edge_end],
+        )
+
+    def _make_batch(self, node_offset_by_edge, senders, receivers, **fields) -> GraphBatch:
+        node_offset_by_edge = node_offset_by_edge.to(senders.dtype)
+        # Edge indexes were validated when the store was created and offsetting them keeps them valid
+        with _trusted_indexes():
+            return GraphBatch(
+                num_nodes=len(fields['node_features']) if fields['node_features'] is not None
+                else fields['num_nodes_by_graph'].sum().item(),
+                num_edges=len(senders),
+                num_graphs=len(fields['num_nodes_by_graph']),
+                senders=senders + node_offset_by_edge,
+                receivers=receivers + node_offset_by_edge,
+                edge_order=self.edge_order,
+                **fields
+            )
+
+    @classmethod
+    def from_batch(cls, batch: GraphBatch) -> GraphStore:
+        """Store the graphs of a batch, the tensors of the batch are reused except for the edge indexes."""
+        node_offset_by_edge = torch.repeat_interleave(
+            batch.node_offsets[:-1], batch.num_edges_by_graph, output_size=batch.num_edges).to(batch.senders.dtype)
+        with _trusted_indexes():
+            return cls(
+                num_nodes_by_graph=batch.num_nodes_by_graph,
+                num_edges_by_graph=batch.num_edges_by_graph,
+                senders=batch.senders - node_offset_by_edge,
+                receivers=batch.receivers - node_offset_by_edge,
+                node_features=batch.node_features,
+                edge_features=batch.edge_features,
+                global_features=batch.global_features,
+                edge_order=batch.edge_order,
+            )
+
+    @classmethod
+    def from_graphs(cls, graphs: Sequence[Graph], index_dtype: Optional[torch.dtype] = None) -> GraphStore:
+        """Pack a sequence of graphs, with the same requirements on their features as `GraphBatch.from_graphs`."""
+        return cls.from_batch(GraphBatch.from_graphs(graphs, index_dtype=index_dtype))
+
+    def save(self, directory: Union[str, pathlib.Path]):
+        """Save the store to `directory` as one flat binary file per tensor and a `meta.json` describing them."""
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        arrays = {}
+        for name in self._tensor_fields:
+            tensor = getattr(self, name)
+            if tensor is not None:
+                writer = _ArrayWriter(directory / f'{name}.bin')
+                writer.append(tensor)
+                arrays[name] = writer.close()
+        self._write_meta(directory, arrays, self.edge_order)
+
+    @classmethod
+    def write_graphs(cls, graphs: Iterable[Graph], directory: Union[str, pathlib.Path],
+                     index_dtype: torch.dtype = torch.long):
+        """Write graphs to `directory` one at a time, in the format of `save()`, without holding them in memory.
+
+        The graphs must satisfy the same requirements on their features as in `GraphBatch.from_graphs`.
+        """
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        writers = {name: _ArrayWriter(directory / f'{name}.bin') for name in
+                   ('senders', 'receivers', 'node_features', 'edge_features', 'global_features')}
+        num_nodes_by_graph = []
+        num_edges_by_graph = []
+        edge_orders = set()
+        try:
+            for g in graphs:
+                writers['senders'].append(g.senders.to(index_dtype))
+                writers['receivers'].append(g.receivers.to(index_dtype))
+                if g.node_features is not None:
+                    writers['node_features'].append(g.node_features)
+                if g.edge_features is not None:
+                    writers['edge_features'].append(g.edge_features)
+                if g.global_features is not None:
+                    writers['global_features'].append(g.global_features.unsqueeze(0))
+                num_nodes_by_graph.append(g.num_nodes)
+                num_edges_by_graph.append(g.num_edges)
+                edge_orders.add(g.edge_order)
+            # Edge indexes are always written, so that a store without graphs can be loaded
+            for name in ('senders', 'receivers'):
+                if writers[name].file is None:
+                    writers[name].append(torch.empty(0, dtype=index_dtype))
+        finally:
+            arrays = {name: writer.close() for name, writer in writers.items()}
+
+        num_nodes_by_graph = torch.tensor(num_nodes_by_graph, dtype=index_dtype)
+        num_edges_by_graph = torch.tensor(num_edges_by_graph, dtype=index_dtype)
+        for name, tensor in (('num_nodes_by_graph', num_nodes_by_graph),
+                             ('num_edges_by_graph', num_edges_by_graph),
+                             ('node_offsets', segment_lengths_to_offsets(num_nodes_by_graph)),
+                             ('edge_offsets', segment_lengths_to_offsets(num_edges_by_graph))):
+            writer = _ArrayWriter(directory / f'{name}.bin')
+            writer.append(tensor)
+            arrays[name] = writer.close()
+
+        # Features missing from a graph with no nodes or edges are fine, but can not be left out in other cases
+        totals = {'node_features': num_nodes_by_graph.sum().item(), 'edge_features': num_edges_by_graph.sum().item(),
+                  'global_features': len(num_nodes_by_graph)}
+        for name, total in totals.items():
+            if arrays[name] is None:
+                del arrays[name]
+            elif arrays[name]['shape'][0] != total:
+                raise ValueError(f'The field `{name}` must be present on all graphs with nodes and edges, '
+                                 f'got {arrays[name]["shape"][0]} rows for {total} nodes/edges/graphs')
+        cls._write_meta(directory, arrays, edge_orders.pop() if len(edge_orders) == 1 else None)
+
+    @classmethod
+    def _write_meta(cls, directory: pathlib.Path, arrays: dict, edge_order: Optional[str]):
+        # Written last, so that a directory with a `meta.json` always contains complete arrays
+        meta = {'version': cls._format_version, 'edge_order': edge_order, 'arrays': arrays}
+        (directory / 'meta.json').write_text(json.dumps(meta, indent=2))
+
+    @classmethod
+    def load(cls, directory: Union[str, pathlib.Path], mmap: bool = True) -> GraphStore:
+        """Load a store written by `save()` or `write_graphs()`.
+
+        With `mmap=True` every tensor is a `torch.from_numpy` view of a `np.memmap` of its file, so only the pages
+        that are accessed are read from disk and processes that load the same directory share the page cache.
+        The files are mapped copy-on-write: in-place changes to the tensors are private and never written back.
+        A memory-mapped store is pickled as its directory, e.g. when sent to DataLoader workers,
+        so that every worker maps the same files instead of receiving a copy of the data.
+
+        Since the files are written from valid graphs, only the shapes are validated on load.
+        """
+        directory = pathlib.Path(directory)
+        meta = json.loads((directory / 'meta.json').read_text())
+        if meta['version'] != cls._format_version:
+            raise ValueError(f'Unsupported format version {meta["version"]}, expected {cls._format_version}')
+
+        tensors = {}
+        for name, info in meta['arrays'].items():
+            dtype = np.dtype(info['dtype'])
+            shape = tuple(info['shape'])
+            path = directory / f'{name}.bin'
+            if not mmap:
+                array = np.fromfile(path, dtype=dtype).reshape(shape)
+            elif np.prod(shape) == 0:
+                # Empty files can not be mapped
+                array = np.empty(shape, dtype=dtype)
+            else:
+                array = np.memmap(path, dtype=dtype, mode='c', shape=shape)
+            tensors[name] = torch.from_numpy(array)
+
+        with _trusted_indexes():
+            store = cls(edge_order=meta['edge_order'], **tensors)
+        if mmap:
+            store._directory = directory
+        return store
+
+    def __reduce_ex__(self, protocol):
+        directory = getattr(self, '_directory', None)
+        if directory is not None:
+            return type(self).load, (directory,)
+        return super(GraphStore, self).__reduce_ex__(protocol)
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}("
+                f"#{self.num_graphs}, "
+                f"n={int(self._node_offsets[-1])}, "
+                f"e={int(self._edge_offsets[-1])}, "
+                f"n_shape={self.node_features.shape[1:] if self.node_features is not None else None}, "
+                f"e_shape={self.edge_features.shape[1:] if self.edge_features is not None else None}, "
+                f"g_shape={self.global_features.shape[1:] if self.global_features is not None else None})")
+
+
+class _ArrayWriter(object):
+    """Appends tensors with the same dtype and trailing shape to a flat binary file, opened on the first append."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.file = None
+        self.dtype = None
+        self.shape = None
+        self.length = 0
+
+    def append(self, tensor: torch.Tensor):
+        array = tensor.detach().cpu().contiguous().numpy()
+        if self.file is None:
+            self.file = open(self.path, 'wb')
+            self.dtype = array.dtype
+            self.shape = array.shape[1:]
+        elif array.dtype != self.dtype or array.shape[1:] != self.shape:
+            raise ValueError(f'All tensors written to {self.path.name} must have the same dtype and trailing shape, '
+                             f'got {self.dtype} {self.shape} and {array.dtype} {array.shape[1:]}')
+        array.tofile(self.file)
+        self.length += len(array)
+
+    def close(self) -> Optional[dict]:
+        """Close the file and return its description, None if nothing was written."""
+        if self.file is None:
+            return None
+        self.file.close()
+        return {'dtype': self.dtype.str, 'shape': [self.length, *self.shape]}
@@ -0,0 +1,38 @@
+from typing import NamedTuple, Optional
+
+import torch
+
+
+class GraphTensors(NamedTuple):
+    """A batch of graphs as a plain tuple of tensors, for models that are scripted with `torch.jit.script`
+    or compiled with `torch.compile`.
+
+    Unlike a `GraphBatch` it has no validation, no cache and no methods: the indexes that the network modules
+    need are computed once by `GraphBatch.to_tensors()`, so that the modules only run tensor operations.
+    The sizes are given by the shapes of the tensors, e.g. `num_nodes` is `len(node_index_by_graph)`.
+    Use `GraphBatch.from_tensors()` to go back to a batch.
+
+    The `forward` of the network modules is annotated with `GraphTensors`, the only input type that TorchScript
+    compiles, but in eager mode they also accept a `GraphBatch` and then return a `GraphBatch`.
+
+    Examples:
+        >>> model = torch.jit.script(model)
+        >>> output = GraphBatch.from_tensors(model(batch.to_tensors()))
+    """
+    senders: torch.Tensor
+    receivers: torch.Tensor
+    num_nodes_by_graph: torch.Tensor
+    num_edges_by_graph: torch.Tensor
+    node_index_by_graph: torch.Tensor
+    edge_index_by_graph: torch.Tensor
+    node_features: Optional[torch.Tensor] = None
+    edge_features: Optional[torch.Tensor] = None
+    global_features: Optional[torch.Tensor] = None
+
+
+def with_features(graphs: GraphTensors, node_features: Optional[torch.Tensor], edge_features: Optional[torch.Tensor],
+                  global_features: Optional[torch.Tensor]) -> GraphTensors:
+    """The same graphs with new features, the scriptable equivalent of `GraphBatch.evolve()`."""
+    return GraphTensors(graphs.senders, graphs.receivers, graphs.num_nodes_by_graph, graphs.num_edges_by_graph,
+                        graphs.node_index_by_graph, graphs.edge_index_by_graph,
+                        node_features, edge_features, global_features)
@@ -0,0 +1,62 @@
+import enum
+import threading
+import contextlib
+from typing import Union
+
+
+class Validation(enum.Enum):
+    """How thoroughly graphs and batches are validated when they are created.
+
+    - `FULL`: check all shapes and that the edge indexes are within bounds,
+      the latter requires reading the index tensors and therefore a device synchronization
+    - `SHAPES`: only check the number of nodes and edges against the shapes of the tensors, never synchronizes
+    - `OFF`: no validation at all
+    """
+    FULL = 'full'
+    SHAPES = 'shapes'
+    OFF = 'off'
+
+
+_validation = Validation.FULL
+_local = threading.local()
+
+
+def get_validation() -> Validation:
+    level = getattr(_local, 'level', None)
+    return level if level is not None else _validation
+
+
+def set_validation(level: Union[Validation, str]):
+    """Globally set the validation level for the creation of graphs and batches.
+
+    Examples:
+        >>> set_validation('shapes')
+    """
+    global _validation
+    _validation = Validation(level)
+
+
+@contextlib.contextmanager
+def validation(level: Union[Validation, str]):
+    """Context manager that temporarily changes the validation level in the current thread.
+
+    Examples:
+        >>> with validation('off'):
+        >>>     output = model(graphs)
+    """
+    previous = getattr(_local, 'level', None)
+    _local.level = Validation(level)
+    try:
+        yield
+    finally:
+        _local.level = previous
+
+
+@contextlib.contextmanager
+def _trusted_indexes():
+    """Skip the index checks for graphs whose indexes are valid by construction, shapes are still checked."""
+    if get_validation() is Validation.FULL:
+        with validation(Validation.SHAPES):
+            yield
+    else:
+        yield
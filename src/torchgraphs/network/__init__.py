@@ -1,6 +1,7 @@
-from .network import GraphNetwork
+from .network import GraphNetwork, GraphLayer, GraphSequential
 from .linear import EdgeLinear, NodeLinear, GlobalLinear
-from .aggregation import EdgesToSender, EdgesToReceiver, EdgesToGlobal, NodesToGlobal
+from .aggregation import EdgesToSender, EdgesToReceiver, EdgesToGlobal, NodesToGlobal, \
+    PredecessorsToNode, SuccessorsToNode
 from .functions import \
     EdgeFunction, NodeFunction, GlobalFunction, \
     EdgeReLU, NodeReLU, GlobalReLU, \
@@ -1,58 +1,273 @@
+from typing import List, Optional
+
+import torch
 import torch_scatter
 import torch.nn as nn
 
-from ..data import GraphBatch
-from ..utils import segment_lengths_to_ids
+from ..data import GraphBatch, GraphTensors
+from ..scatter import scatter_many
+
+
+class _ScatterAggregation(object):
+    """A named reduction, computed with `torch_scatter.scatter` or, if the index is sorted,
+    with the faster and deterministic `torch_scatter.segment_csr`.
+    """
+    def __init__(self, reduce):
+        self.reduce = reduce
+
+    def __call__(self, src, index, dim=0, dim_size=None):
+        return torch_scatter.scatter(src, index.long(), dim=dim, dim_size=dim_size, reduce=self.reduce)
+
+    def segment(self, src, pointers):
+        return torch_scatter.segment_csr(src, pointers, reduce=self.reduce)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.reduce})'
+
+
+class _MultiAggregation(object):
+    """Several named reductions computed together with `torchgraphs.scatter.scatter_many`,
+    concatenated along the last dimension or returned as a tuple.
+    """
+    def __init__(self, reductions, concat=True):
+        self.reductions = tuple(reductions)
+        self.concat = concat
+
+    def __call__(self, src, index, dim=0, dim_size=None):
+        if dim != 0:
+            raise ValueError(f'Only aggregation along the first dimension is supported, got {dim}')
+        if dim_size is None:
+            dim_size = int(index.max()) + 1 if len(index) > 0 else 0
+        return self._output(scatter_many(src, index, dim_size, self.reductions))
+
+    def segment(self, src, pointers):
+        return self._output(scatter_many(src, None, len(pointers) - 1, self.reductions, pointers=pointers))
+
+    def _output(self, results):
+        return torch.cat(results, dim=-1) if self.concat else tuple(results)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({", ".join(self.reductions)})'
+
+
+_aggregation_names = {
+    'add': 'sum',
+    'sum': 'sum',
+    'mean': 'mean',
+    'avg': 'mean',
+    'max': 'max',
+    'min': 'min',
+    'std': 'std',
+}
+
+
+def get_aggregation(name, concat=True):
+    """Get an aggregation function by name.
+
+    Args:
+        name: one of `'sum'`, `'mean'`, `'max'`, `'min'`, `'std'` or a sequence of them, in which case the
+            statistics are computed together in a single pass over the input
+        concat: for a sequence of names, whether to concatenate the results along the last dimension,
+            e.g. `['mean', 'max']` over features of size `F` gives features of size `2F`, or return a tuple
+    """
+    if isinstance(name, (list, tuple)):
+        if any(n not in _aggregation_names for n in name):
+            raise ValueError(f'Unknown aggregation in {name}')
+        return _MultiAggregation([_aggregation_names[n] for n in name], concat=concat)
+    if name not in _aggregation_names:
+        raise ValueError(f'Unknown aggregation {name}')
+    if name == 'std':
+        return _MultiAggregation(['std'])
+    return _ScatterAggregation(_aggregation_names[name])
+
+
+def aggregate(aggregation, src, index, dim_size, pointers=None):
+    """Aggregate the rows of `src` grouped by `index`.
+
+    Args:
+        aggregation: either a named aggregation from `get_aggregation` or a function with the same signature
+            as the functions in `torch_scatter`
+        src: the tensor to aggregate
+        index: for every row of `src` the index of the output row
+        dim_size: the number of output rows
+        pointers: the CSR pointers of `index` if `index` is sorted, or None. Named aggregations use
+            a segment reduction when the pointers are given
+    """
+    if pointers is not None and isinstance(aggregation, (_ScatterAggregation, _MultiAggregation)):
+        return aggregation.segment(src, pointers)
+    # The kernels in torch_scatter require int64 indexes
+    return aggregation(src, index=index.long(), dim=0, dim_size=dim_size)
+
+
+def _get_reductions(aggregation) -> List[str]:
+    """The reductions computed by a named aggregation with `scatter_many`,
+    or an empty list if `aggregation` is a custom function or does not return a single tensor."""
+    if isinstance(aggregation, _ScatterAggregation):
+        return [aggregation.reduce]
+    if isinstance(aggregation, _MultiAggregation) and aggregation.concat:
+        return list(aggregation.reductions)
+    return []
+
+
+def _sender_pointers(graphs: GraphBatch):
+    return graphs.edges_by_sender.pointers if graphs.edge_order == 'sender' else None
 
 
-def get_aggregation(name):
-    if name in ('add', 'sum'):
-        return torch_scatter.scatter_add
-    elif name in ('mean', 'avg'):
-        return torch_scatter.scatter_mean
-    elif name == 'max':
-        from functools import wraps
+def _receiver_pointers(graphs: GraphBatch):
+    return graphs.edges_by_receiver.pointers if graphs.edge_order == 'receiver' else None
 
-        @wraps(torch_scatter.scatter_max)
-        def wrapper(*args, **kwargs):
-            return torch_scatter.scatter_max(*args, **kwargs)[0]
 
-        return wrapper
+class _AggregationModule(nn.Module):
+    """Base of the modules that aggregate features with a named aggregation from `get_aggregation`
+    or a function with the same signature as the functions in `torch_scatter`.
 
+    Named aggregations are computed with `scatter_many`, both for `GraphBatch` and `GraphTensors`,
+    custom functions only run on a `GraphBatch`.
+    """
+    _reductions: List[str]
+    _aggregation_name: str
 
-class _BatchAggregator(nn.Module):
     def __init__(self, aggregation):
         super().__init__()
-        if isinstance(aggregation, str):
+        self._aggregation_name = aggregation if isinstance(aggregation, str) else \
+            getattr(aggregation, '__name__', repr(aggregation))
+        if isinstance(aggregation, (str, list, tuple)):
             aggregation = get_aggregation(aggregation)
         self.aggregation = aggregation
+        self._reductions = _get_reductions(aggregation)
 
-    def forward(self, graphs: GraphBatch):
+    def _aggregate(self, src: torch.Tensor, index: torch.Tensor, dim_size: int,
+                   pointers: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """Aggregate the rows of `src` grouped by `index`, the `pointers` of a sorted index are optional."""
+        if len(self._reductions) == 0:
+            return self._aggregate_custom(src, index, dim_size, pointers)
+        results = scatter_many(src, index, dim_size, self._reductions, pointers)
+        return results[0] if len(results) == 1 else torch.cat(results, dim=-1)
+
+    @torch.jit.unused
+    def _aggregate_custom(self, src: torch.Tensor, index: torch.Tensor, dim_size: int,
+                          pointers: Optional[torch.Tensor]) -> torch.Tensor:
+        return aggregate(self.aggregation, src, index, dim_size, pointers)
+
+    def _check_tensors_aggregation(self):
+        if len(self._reductions) == 0:
+            raise ValueError('Aggregation ' + self._aggregation_name + ' is not supported on GraphTensors, '
+                             'only the named aggregations of `get_aggregation` with `concat=True` are')
+
+
+class _BatchAggregator(_AggregationModule):
+    def forward(self, graphs: GraphTensors) -> torch.Tensor:
+        """Aggregate the features of a `GraphBatch` or `GraphTensors`."""
+        if isinstance(graphs, GraphTensors):
+            self._check_tensors_aggregation()
+            return self._forward_tensors(graphs)
+        else:
+            return self._forward_batch(graphs)
+
+    def _forward_tensors(self, graphs: GraphTensors) -> torch.Tensor:
+        raise NotImplementedError
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> torch.Tensor:
         raise NotImplementedError
 
 
 class EdgesToSender(_BatchAggregator):
-    def forward(self, graphs: GraphBatch):
+    def _forward_tensors(self, graphs: GraphTensors) -> torch.Tensor:
+        edge_features = graphs.edge_features
+        assert edge_features is not None
+        return self._aggregate(edge_features, graphs.senders, graphs.node_index_by_graph.shape[0])
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> torch.Tensor:
         # It's necessary to specify the shape of the output dimension, otherwise when max(receivers) != num_nodes
         # the pooling operation would output a minimal tensor with shape (max(receivers), *edge_features_shape)
         # instead of (num_nodes, *edge_features_shape), same would happen for senders
-        return self.aggregation(
-            graphs.edge_features, index=graphs.senders, dim=0, dim_size=graphs.num_nodes)
+        return self._aggregate(graphs.edge_features, graphs.senders, graphs.num_nodes, _sender_pointers(graphs))
 
 
 class EdgesToReceiver(_BatchAggregator):
-    def forward(self, graphs: GraphBatch):
-        return self.aggregation(
-            graphs.edge_features, index=graphs.receivers, dim=0, dim_size=graphs.num_nodes)
+    def _forward_tensors(self, graphs: GraphTensors) -> torch.Tensor:
+        edge_features = graphs.edge_features
+        assert edge_features is not None
+        return self._aggregate(edge_features, graphs.receivers, graphs.node_index_by_graph.shape[0])
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> torch.Tensor:
+        return self._aggregate(graphs.edge_features, graphs.receivers, graphs.num_nodes, _receiver_pointers(graphs))
 
 
 class EdgesToGlobal(_BatchAggregator):
-    def forward(self, graphs: GraphBatch):
-        return self.aggregation(
-            graphs.edge_features, index=graphs.node_index_by_graph, dim=0, dim_size=graphs.num_graphs)
+    def _forward_tensors(self, graphs: GraphTensors) -> torch.Tensor:
+        edge_features = graphs.edge_features
+        assert edge_features is not None
+        return self._aggregate(edge_features, graphs.edge_index_by_graph, graphs.num_nodes_by_graph.shape[0])
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> torch.Tensor:
+        # Edges are always sorted by graph
+        return self._aggregate(graphs.edge_features, graphs.edge_index_by_graph, graphs.num_graphs,
+                               graphs.edge_offsets)
 
 
 class NodesToGlobal(_BatchAggregator):
-    def forward(self, graphs: GraphBatch):
-        return self.aggregation(
-            graphs.node_features, index=graphs.edge_index_by_graph, dim=0, dim_size=graphs.num_graphs)
+    def _forward_tensors(self, graphs: GraphTensors) -> torch.Tensor:
+        node_features = graphs.node_features
+        assert node_features is not None
+        return self._aggregate(node_features, graphs.node_index_by_graph, graphs.num_nodes_by_graph.shape[0])
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> torch.Tensor:
+        # Nodes are always sorted by graph
+        return self._aggregate(graphs.node_features, graphs.node_index_by_graph, graphs.num_graphs,
+                               graphs.node_offsets)
+
+
+class _NeighborAggregator(_BatchAggregator):
+    # Reductions that the views of `GraphBatch` compute without a copy of the node features for every edge,
+    # see `torchgraphs.scatter.gather_csr`
+    _fused_aggregations = ('sum', 'mean', 'max')
+    _fused_aggregation: Optional[str]
+
+    def __init__(self, aggregation):
+        super().__init__(aggregation)
+        name = _aggregation_names.get(aggregation) if isinstance(aggregation, str) else None
+        self._fused_aggregation = name if name in self._fused_aggregations else None
+
+
+class PredecessorsToNode(_NeighborAggregator):
+    """For every node, aggregate the features of the nodes that have an edge towards it.
+
+    On a `GraphBatch`, sum, mean and max are computed without a copy of the node features for every edge.
+    """
+    def _forward_tensors(self, graphs: GraphTensors) -> torch.Tensor:
+        node_features = graphs.node_features
+        assert node_features is not None
+        return self._aggregate(node_features.index_select(0, graphs.senders), graphs.receivers,
+                               node_features.shape[0])
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> torch.Tensor:
+        if self._fused_aggregation is not None:
+            return graphs.predecessor_features(self._fused_aggregation)
+        return self._aggregate(graphs.node_features.index_select(0, graphs.senders), graphs.receivers,
+                               graphs.num_nodes, _receiver_pointers(graphs))
+
+
+class SuccessorsToNode(_NeighborAggregator):
+    """For every node, aggregate the features of the nodes that it has an edge towards.
+
+    On a `GraphBatch`, sum, mean and max are computed without a copy of the node features for every edge.
+    """
+    def _forward_tensors(self, graphs: GraphTensors) -> torch.Tensor:
+        node_features = graphs.node_features
+        assert node_features is not None
+        return self._aggregate(node_features.index_select(0, graphs.receivers), graphs.senders,
+                               node_features.shape[0])
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> torch.Tensor:
+        if self._fused_aggregation is not None:
+            return graphs.successor_features(self._fused_aggregation)
+        return self._aggregate(graphs.node_features.index_select(0, graphs.receivers), graphs.senders,
+                               graphs.num_nodes, _sender_pointers(graphs))
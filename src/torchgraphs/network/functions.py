@@ -1,59 +1,119 @@
 import torch
 
-from ..data import GraphBatch
+from ..data import GraphBatch, GraphTensors
+from ..data.tensors import with_features
+from ..scatter import _INPLACE_ACTIVATIONS
 
 
-class _FeatureFunction(torch.nn.Module):
+class _Function(torch.nn.Module):
+    """Wraps a plain function so that it can be held by a scripted module, where it is called from Python."""
     def __init__(self, function):
         super().__init__()
         self.function = function
 
+    @torch.jit.ignore
+    def forward(self, features: torch.Tensor) -> torch.Tensor:
+        return self.function(features)
+
+
+class _FeatureFunction(torch.nn.Module):
+    def __init__(self, function):
+        super().__init__()
+        # Modules can be scripted and compiled together with the rest of the network
+        self.function = function if isinstance(function, torch.nn.Module) else _Function(function)
+
+    @torch.jit.unused
+    def _inplace_function(self):
+        """A function that computes the same result in place on its input, or None if there is none.
+        Used by `GraphSequential` to reuse the feature buffers in inference."""
+        if isinstance(self.function, torch.nn.Dropout) and not self.training:
+            return lambda features: features
+        # Activation modules of `torch.nn` are found by name, e.g. `nn.ReLU` uses `relu` as in `Broadcast.add_to`
+        name = type(self.function).__name__
+        if getattr(torch.nn, name, None) is type(self.function):
+            return _INPLACE_ACTIVATIONS.get(name.lower())
+        return None
+
 
 class EdgeFunction(_FeatureFunction):
-    def forward(self, graphs: GraphBatch) -> GraphBatch:
+    _field = 'edge_features'
+
+    def forward(self, graphs: GraphTensors) -> GraphTensors:
+        """Apply the function to the edge features of a `GraphBatch` or `GraphTensors`, the result has the same type."""
+        if isinstance(graphs, GraphTensors):
+            edge_features = graphs.edge_features
+            assert edge_features is not None
+            return with_features(graphs, graphs.node_features, self.function(edge_features), graphs.global_features)
+        else:
+            return self._forward_batch(graphs)
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> GraphBatch:
         return graphs.evolve(edge_features=self.function(graphs.edge_features))
 
 
 class NodeFunction(_FeatureFunction):
-
-    def forward(self, graphs: GraphBatch) -> GraphBatch:
+    _field = 'node_features'
+
+    def forward(self, graphs: GraphTensors) -> GraphTensors:
+        """Apply the function to the node features of a `GraphBatch` or `GraphTensors`, the result has the same type."""
+        if isinstance(graphs, GraphTensors):
+            node_features = graphs.node_features
+            assert node_features is not None
+            return with_features(graphs, self.function(node_features), graphs.edge_features, graphs.global_features)
+        else:
+            return self._forward_batch(graphs)
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> GraphBatch:
         return graphs.evolve(node_features=self.function(graphs.node_features))
 
 
 class GlobalFunction(_FeatureFunction):
-
-    def forward(self, graphs: GraphBatch) -> GraphBatch:
+    _field = 'global_features'
+
+    def forward(self, graphs: GraphTensors) -> GraphTensors:
+        """Apply the function to the globals of a `GraphBatch` or `GraphTensors`, the result has the same type."""
+        if isinstance(graphs, GraphTensors):
+            global_features = graphs.global_features
+            assert global_features is not None
+            return with_features(graphs, graphs.node_features, graphs.edge_features, self.function(global_features))
+        else:
+            return self._forward_batch(graphs)
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> GraphBatch:
         return graphs.evolve(global_features=self.function(graphs.global_features))
 
 
 class NodeReLU(NodeFunction):
     def __init__(self):
-        super(NodeReLU, self).__init__(torch.nn.functional.relu)
+        super(NodeReLU, self).__init__(torch.nn.ReLU())
 
 
 class EdgeReLU(EdgeFunction):
     def __init__(self):
-        super(EdgeReLU, self).__init__(torch.nn.functional.relu)
+        super(EdgeReLU, self).__init__(torch.nn.ReLU())
 
 
 class GlobalReLU(GlobalFunction):
     def __init__(self):
-        super(GlobalReLU, self).__init__(torch.nn.functional.relu)
+        super(GlobalReLU, self).__init__(torch.nn.ReLU())
 
 
 class NodeSigmoid(NodeFunction):
     def __init__(self):
-        super(NodeSigmoid, self).__init__(torch.sigmoid)
+        super(NodeSigmoid, self).__init__(torch.nn.Sigmoid())
 
 
 class EdgeSigmoid(EdgeFunction):
     def __init__(self):
-        super(EdgeSigmoid, self).__init__(torch.sigmoid)
+        super(EdgeSigmoid, self).__init__(torch.nn.Sigmoid())
 
 
 class GlobalSigmoid(GlobalFunction):
     def __init__(self):
-        super(GlobalSigmoid, self).__init__(torch.sigmoid)
+        super(GlobalSigmoid, self).__init__(torch.nn.Sigmoid())
 
 
 class EdgeDropout(EdgeFunction):
@@ -1,17 +1,34 @@
 import math
+from typing import List, Optional, Tuple
 
 import torch
 import torch.nn as nn
 
-from .aggregation import get_aggregation
-from ..data import GraphBatch
+from .aggregation import _AggregationModule, _sender_pointers, _receiver_pointers
+from ..data import GraphBatch, GraphTensors
+from ..data.tensors import with_features
 
 
 class EdgeLinear(nn.Module):
+    """Linear layer that updates the edges from their features, those of their sender and receiver, and the globals.
+
+    All terms are accumulated into a single output buffer. The sender and receiver terms use one gather and
+    one matrix multiplication with the concatenated weights, either projecting the nodes and gathering the
+    projections for every edge (`'project'`) or gathering the node features and projecting them per edge
+    (`'gather'`). With `strategy=None` the cheaper one is chosen from the number of nodes and edges
+    and the feature sizes of every batch, see `_edge_linear_strategy`.
+    """
+
     def __init__(self, out_features, edge_features=None, sender_features=None, receiver_features=None,
-                 global_features=None, bias=True):
+                 global_features=None, bias=True, strategy=None):
         super(EdgeLinear, self).__init__()
+        if strategy not in (None, 'project', 'gather'):
+            raise ValueError(f'`strategy` must be one of None, `project`, `gather`, got {strategy}')
+        if sender_features is not None and receiver_features is not None and sender_features != receiver_features:
+            raise ValueError(f'Sender and receiver features must have the same size, '
+                             f'got {sender_features} and {receiver_features}')
         self.out_features = out_features
+        self.strategy = strategy
 
         self.W_edge = nn.Parameter(torch.Tensor(out_features, edge_features)) \
             if edge_features is not None else None
@@ -25,34 +42,149 @@ class EdgeLinear(nn.Module):
 
         _reset_parameters(self)
 
-    def forward(self, graphs: GraphBatch) -> GraphBatch:
-        new_edges = 0
+    def forward(self, graphs: GraphTensors) -> GraphTensors:
+        """Update the edges of a `GraphBatch` or `GraphTensors`, the result has the same type."""
+        if isinstance(graphs, GraphTensors):
+            return self._forward_tensors(graphs)
+        else:
+            return self._forward_batch(graphs)
 
-        if self.W_edge is not None:
-            new_edges += graphs.edge_features @ self.W_edge.t()
+    def _forward_tensors(self, graphs: GraphTensors) -> GraphTensors:
+        strategy = self._strategy(graphs.node_index_by_graph.shape[0], graphs.senders.shape[0])
+        indexes: List[torch.Tensor] = []
         if self.W_sender is not None:
-            new_edges += torch.index_select(
-                graphs.node_features @ self.W_sender.t(), dim=0, index=graphs.senders)
+            indexes.append(graphs.senders)
         if self.W_receiver is not None:
-            new_edges += torch.index_select(
-                graphs.node_features @ self.W_receiver.t(), dim=0, index=graphs.receivers)
-        if self.W_global is not None:
-            new_edges += torch.repeat_interleave(
-                graphs.global_features @ self.W_global.t(), dim=0, repeats=graphs.num_edges_by_graph)
-        if self.bias is not None:
-            new_edges = new_edges + self.bias.expand(graphs.num_edges, -1)
+            indexes.append(graphs.receivers)
+        endpoints_index = _interleave(indexes, projected=strategy == 'project') if len(indexes) > 0 else None
 
+        new_edges = self._linear(graphs.node_features, graphs.edge_features, graphs.global_features,
+                                 graphs.edge_index_by_graph, endpoints_index, strategy)
+        return with_features(graphs, graphs.node_features, new_edges, graphs.global_features)
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> GraphBatch:
+        strategy = self._strategy(graphs.num_nodes, graphs.num_edges)
+        endpoints = tuple(name for name, weight in (('senders', self.W_sender), ('receivers', self.W_receiver))
+                          if weight is not None)
+        endpoints_index = _endpoints_index(graphs, endpoints, projected=strategy == 'project') \
+            if len(endpoints) > 0 else None
+
+        new_edges = self._linear(graphs.node_features, graphs.edge_features, graphs.global_features,
+                                 graphs.edge_index_by_graph, endpoints_index, strategy)
         return graphs.evolve(edge_features=new_edges)
 
+    def _linear(self, node_features: Optional[torch.Tensor], edge_features: Optional[torch.Tensor],
+                global_features: Optional[torch.Tensor], edge_index_by_graph: torch.Tensor,
+                endpoints_index: Optional[torch.Tensor], strategy: str) -> torch.Tensor:
+        # The projected global features are gathered directly into the output buffer, other terms are added in place
+        new_edges: Optional[torch.Tensor] = None
+        bias: Optional[torch.Tensor] = self.bias
+
+        if self.W_global is not None:
+            assert global_features is not None
+            new_edges = _project_globals(global_features, self.W_global, bias, edge_index_by_graph)
+            bias = None
+        if self.W_edge is not None:
+            assert edge_features is not None
+            new_edges = _addmm(new_edges, edge_features, self.W_edge, bias)
+            bias = None
+        if endpoints_index is not None:
+            assert node_features is not None
+            new_edges = _endpoint_terms(new_edges, node_features, self._endpoint_weights(), endpoints_index,
+                                        strategy, bias)
+            bias = None
+
+        return _finish(new_edges, bias, edge_index_by_graph.shape[0], self.out_features, edge_index_by_graph.device)
+
+    def _endpoint_weights(self) -> List[torch.Tensor]:
+        weights: List[torch.Tensor] = []
+        if self.W_sender is not None:
+            weights.append(self.W_sender)
+        if self.W_receiver is not None:
+            weights.append(self.W_receiver)
+        return weights
+
+    def _strategy(self, num_nodes: int, num_edges: int) -> str:
+        if self.strategy is not None:
+            return self.strategy
+        weights = self._endpoint_weights()
+        if len(weights) == 0:
+            return 'project'
+        return _edge_linear_strategy(num_nodes, num_edges, weights[0].shape[1], len(weights), self.out_features)
+
+
+def _interleave(indexes: List[torch.Tensor], projected: bool) -> torch.Tensor:
+    """Interleave the indexes of the endpoints of every edge, i.e. row `e * len(indexes) + i` is `indexes[i][e]`.
+
+    If `projected`, the rows index the node projections viewed as `(num_nodes * len(indexes), out_features)`,
+    where the projection for the i-th endpoint of node `n` is row `n * len(indexes) + i`.
+    """
+    if projected:
+        shifted: List[torch.Tensor] = []
+        for i in range(len(indexes)):
+            shifted.append(indexes[i] * len(indexes) + i)
+        indexes = shifted
+    return torch.stack(indexes, dim=1).view(-1) if len(indexes) > 1 else indexes[0]
+
+
+def _endpoints_index(graphs: GraphBatch, endpoints: Tuple[str, ...], projected: bool) -> torch.Tensor:
+    """`_interleave` of the given endpoints of the edges of a batch, computed once and cached."""
+    return graphs._cached(('endpoints_index', endpoints, projected),
+                          lambda: _interleave([getattr(graphs, name) for name in endpoints], projected))
 
-class NodeLinear(nn.Module):
+
+def _endpoint_terms(out: Optional[torch.Tensor], node_features: torch.Tensor, weights: List[torch.Tensor],
+                    index: torch.Tensor, strategy: str, bias: Optional[torch.Tensor]) -> torch.Tensor:
+    """Add the sender and/or receiver terms of `EdgeLinear` and the bias, if given, to `out`.
+
+    With `'gather'`, the features of the endpoints of every edge are gathered side by side, then projected.
+    With `'project'`, the nodes are projected once for all endpoints side by side, then the projections are gathered.
+    In both cases `index` is the result of `_interleave` with `projected=strategy == 'project'`.
+    """
+    num_endpoints = len(weights)
+    num_edges = index.shape[0] // num_endpoints
+    if strategy == 'gather':
+        gathered = node_features.index_select(0, index)
+        return _addmm(out, gathered.view(num_edges, num_endpoints * node_features.shape[1]),
+                      torch.cat(weights, dim=1), bias)
+
+    out_features = weights[0].shape[0]
+    projected = node_features @ torch.cat(weights, dim=0).t()
+    gathered = projected.view(-1, out_features).index_select(0, index)
+    if num_endpoints > 1:
+        gathered = gathered.view(num_edges, num_endpoints, out_features).sum(dim=1)
+    out = _add(out, gathered)
+    if bias is not None:
+        out = out.add_(bias)
+    return out
+
+
+# Relative cost of gathering or scattering one element compared to a multiply-add, including the backward pass,
+# fitted on CPU with `benchmarks/edge_linear.py`
+_MEMORY_COST = 64
+
+
+def _edge_linear_strategy(num_nodes: int, num_edges: int, node_features: int, num_endpoints: int,
+                          out_features: int, memory_cost: int = _MEMORY_COST) -> str:
+    """Choose how `EdgeLinear` computes its sender and receiver terms, `'project'` or `'gather'`.
+
+    Projecting first multiplies `num_nodes` rows and moves `num_edges` projected rows of size `out_features`
+    per endpoint, gathering first moves `num_edges` feature rows of size `node_features` per endpoint
+    and multiplies them all, so it is cheaper when there are few edges per node or narrow node features.
+    """
+    project = (num_nodes * node_features * num_endpoints * out_features +
+               memory_cost * num_edges * num_endpoints * out_features * 2)
+    gather = (num_edges * node_features * num_endpoints * out_features +
+              memory_cost * num_edges * num_endpoints * node_features)
+    return 'gather' if gather < project else 'project'
+
+
+class NodeLinear(_AggregationModule):
     def __init__(self, out_features, node_features=None, incoming_features=None, outgoing_features=None,
                  global_features=None, aggregation=None, bias=True):
-        super(NodeLinear, self).__init__()
+        super(NodeLinear, self).__init__(aggregation)
         self.out_features = out_features
-        if isinstance(aggregation, str):
-            aggregation = get_aggregation(aggregation)
-        self.aggregation = aggregation
 
         self.W_node = nn.Parameter(torch.Tensor(out_features, node_features)) \
             if node_features is not None else None
@@ -71,31 +203,146 @@ class NodeLinear(nn.Module):
 
         _reset_parameters(self)
 
-    def forward(self, graphs: GraphBatch) -> GraphBatch:
-        new_nodes = 0
+    def forward(self, graphs: GraphTensors) -> GraphTensors:
+        """Update the nodes of a `GraphBatch` or `GraphTensors`, the result has the same type."""
+        if isinstance(graphs, GraphTensors):
+            return self._forward_tensors(graphs)
+        else:
+            return self._forward_batch(graphs)
 
-        if self.W_node is not None:
-            new_nodes += graphs.node_features @ self.W_node.t()
+    def _forward_tensors(self, graphs: GraphTensors) -> GraphTensors:
+        num_nodes = graphs.node_index_by_graph.shape[0]
+        index: Optional[torch.Tensor] = None
+        counts: Optional[torch.Tensor] = None
+        aggregated: List[torch.Tensor] = []
+
+        indexes: List[torch.Tensor] = []
         if self.W_incoming is not None:
-            new_nodes += self.aggregation(
-                graphs.edge_features, dim=0, index=graphs.receivers, dim_size=graphs.num_nodes) @ self.W_incoming.t()
+            indexes.append(graphs.receivers)
         if self.W_outgoing is not None:
-            new_nodes += self.aggregation(
-                graphs.edge_features, dim=0, index=graphs.senders, dim_size=graphs.num_nodes) @ self.W_outgoing.t()
-        if self.W_global is not None:
-            new_nodes += torch.repeat_interleave(
-                graphs.global_features @ self.W_global.t(), dim=0, repeats=graphs.num_nodes_by_graph)
-        if self.bias is not None:
-            new_nodes = new_nodes + self.bias.expand(graphs.num_nodes, -1)
+            indexes.append(graphs.senders)
+        if len(indexes) > 0:
+            self._check_tensors_aggregation()
+            edge_features = graphs.edge_features
+            assert edge_features is not None
+            if self._projects_first(num_nodes, graphs.senders.shape[0]):
+                index = _interleave(indexes, projected=False)
+                if self._reductions[0] == 'mean':
+                    degrees: List[torch.Tensor] = []
+                    for i in range(len(indexes)):
+                        degrees.append(_degree(indexes[i], num_nodes))
+                    counts = _edge_counts(degrees, indexes)
+            else:
+                for i in range(len(indexes)):
+                    aggregated.append(self._aggregate(edge_features, indexes[i], num_nodes))
+
+        new_nodes = self._linear(graphs.node_features, graphs.edge_features, graphs.global_features,
+                                 graphs.node_index_by_graph, index, counts, aggregated)
+        return with_features(graphs, new_nodes, graphs.edge_features, graphs.global_features)
 
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> GraphBatch:
+        index = counts = None
+        aggregated = []
+
+        directions = tuple(name for name, weight in (('receivers', self.W_incoming), ('senders', self.W_outgoing))
+                           if weight is not None)
+        if len(directions) > 0:
+            if self._projects_first(graphs.num_nodes, graphs.num_edges):
+                index = _endpoints_index(graphs, directions, projected=False)
+                if self._reductions[0] == 'mean':
+                    degrees = {'receivers': graphs.in_degree, 'senders': graphs.out_degree}
+                    counts = graphs._cached(('edge_counts', directions), lambda: _edge_counts(
+                        [degrees[name] for name in directions], [getattr(graphs, name) for name in directions]))
+            else:
+                pointers = {'receivers': _receiver_pointers(graphs), 'senders': _sender_pointers(graphs)}
+                aggregated = [self._aggregate(graphs.edge_features, getattr(graphs, name), graphs.num_nodes,
+                                              pointers[name]) for name in directions]
+
+        new_nodes = self._linear(graphs.node_features, graphs.edge_features, graphs.global_features,
+                                 graphs.node_index_by_graph, index, counts, aggregated)
         return graphs.evolve(node_features=new_nodes)
 
+    def _linear(self, node_features: Optional[torch.Tensor], edge_features: Optional[torch.Tensor],
+                global_features: Optional[torch.Tensor], node_index_by_graph: torch.Tensor,
+                index: Optional[torch.Tensor], counts: Optional[torch.Tensor],
+                aggregated: List[torch.Tensor]) -> torch.Tensor:
+        """The new node features, the edge terms are given either as `index` and `counts` to project the edges
+        before aggregating them, see `_project_then_aggregate`, or as the `aggregated` edges of every direction."""
+        num_nodes = node_index_by_graph.shape[0]
+        new_nodes: Optional[torch.Tensor] = None
+        bias: Optional[torch.Tensor] = self.bias
 
-class GlobalLinear(nn.Module):
+        # The projected global features are gathered directly into the output buffer, other terms are added in place
+        if self.W_global is not None:
+            assert global_features is not None
+            new_nodes = _project_globals(global_features, self.W_global, bias, node_index_by_graph)
+            bias = None
+        if self.W_node is not None:
+            assert node_features is not None
+            new_nodes = _addmm(new_nodes, node_features, self.W_node, bias)
+            bias = None
 
+        weights = self._edge_weights()
+        if index is not None:
+            assert edge_features is not None
+            new_nodes = _project_then_aggregate(new_nodes, edge_features, weights, index, num_nodes, counts)
+        for i in range(len(aggregated)):
+            new_nodes = _addmm(new_nodes, aggregated[i], weights[i], bias)
+            bias = None
+
+        return _finish(new_nodes, bias, num_nodes, self.out_features, node_index_by_graph.device)
+
+    def _edge_weights(self) -> List[torch.Tensor]:
+        weights: List[torch.Tensor] = []
+        if self.W_incoming is not None:
+            weights.append(self.W_incoming)
+        if self.W_outgoing is not None:
+            weights.append(self.W_outgoing)
+        return weights
+
+    def _projects_first(self, num_nodes: int, num_edges: int) -> bool:
+        weights = self._edge_weights()
+        return _linear_reduce(self._reductions) is not None and \
+            _project_first(num_edges, num_nodes, weights[0].shape[1], self.out_features)
+
+
+def _project_then_aggregate(out: Optional[torch.Tensor], edge_features: torch.Tensor, weights: List[torch.Tensor],
+                            index: torch.Tensor, num_nodes: int, counts: Optional[torch.Tensor]) -> torch.Tensor:
+    """Sums and means commute with the projection: project the edges once for all directions,
+    then reduce the rows of all directions with a single scatter into `out`.
+
+    `index` is the result of `_interleave` of the nodes that receive every direction, for a mean
+    `counts` are the degrees of these nodes, see `_edge_counts`.
+    """
+    out_features = weights[0].shape[0]
+    projected = (edge_features @ torch.cat(weights, dim=0).t()).view(-1, out_features)
+    if counts is not None:
+        projected = projected / counts.to(projected.dtype)
+    if out is None:
+        out = projected.new_zeros(num_nodes, out_features)
+    # Row `e * len(weights) + i` of `projected` goes to the i-th node of edge `e`
+    return out.index_add_(0, index, projected)
+
+
+def _degree(index: torch.Tensor, num_nodes: int) -> torch.Tensor:
+    """The number of occurrences of every node in `index`, as `torch.bincount` but with a static size."""
+    return torch.zeros(num_nodes, dtype=index.dtype, device=index.device).index_add_(0, index, torch.ones_like(index))
+
+
+def _edge_counts(degrees: List[torch.Tensor], indexes: List[torch.Tensor]) -> torch.Tensor:
+    """For every row of `_interleave(indexes)`, the degree of its node, at least 1, as a column."""
+    counts: List[torch.Tensor] = []
+    for i in range(len(indexes)):
+        counts.append(degrees[i].index_select(0, indexes[i]))
+    return torch.stack(counts, dim=1).view(-1, 1).clamp(min=1)
+
+
+class GlobalLinear(_AggregationModule):
     def __init__(self, out_features, node_features=None, edge_features=None, global_features=None,
                  aggregation=None, bias=True):
-        super(GlobalLinear, self).__init__()
+        super(GlobalLinear, self).__init__(aggregation)
+        self.out_features = out_features
         self.W_node = nn.Parameter(torch.Tensor(out_features, node_features)) \
             if node_features is not None else None
         self.W_edges = nn.Parameter(torch.Tensor(out_features, edge_features)) \
@@ -104,10 +351,6 @@ class GlobalLinear(nn.Module):
             if global_features is not None else None
         self.bias = nn.Parameter(torch.Tensor(out_features)) if bias else None
 
-        if isinstance(aggregation, str):
-            aggregation = get_aggregation(aggregation)
-        self.aggregation = aggregation
-
         if node_features is not None and aggregation is None:
             raise ValueError('An aggregation function is needed to process node features')
 
@@ -116,21 +359,121 @@ class GlobalLinear(nn.Module):
 
         _reset_parameters(self)
 
-    def forward(self, graphs: GraphBatch) -> GraphBatch:
-        new_globals = 0
+    def forward(self, graphs: GraphTensors) -> GraphTensors:
+        """Update the globals of a `GraphBatch` or `GraphTensors`, the result has the same type."""
+        if isinstance(graphs, GraphTensors):
+            return self._forward_tensors(graphs)
+        else:
+            return self._forward_batch(graphs)
+
+    def _forward_tensors(self, graphs: GraphTensors) -> GraphTensors:
+        if self.W_node is not None or self.W_edges is not None:
+            self._check_tensors_aggregation()
+        new_globals = self._linear(graphs.node_features, graphs.edge_features, graphs.global_features,
+                                   graphs.node_index_by_graph, graphs.edge_index_by_graph,
+                                   graphs.num_nodes_by_graph.shape[0], None, None)
+        return with_features(graphs, graphs.node_features, graphs.edge_features, new_globals)
+
+    @torch.jit.unused
+    def _forward_batch(self, graphs: GraphBatch) -> GraphBatch:
+        # Nodes and edges are always sorted by graph
+        new_globals = self._linear(graphs.node_features, graphs.edge_features, graphs.global_features,
+                                   graphs.node_index_by_graph, graphs.edge_index_by_graph, graphs.num_graphs,
+                                   graphs.node_offsets, graphs.edge_offsets)
+        return graphs.evolve(global_features=new_globals)
+
+    def _linear(self, node_features: Optional[torch.Tensor], edge_features: Optional[torch.Tensor],
+                global_features: Optional[torch.Tensor], node_index_by_graph: torch.Tensor,
+                edge_index_by_graph: torch.Tensor, num_graphs: int, node_offsets: Optional[torch.Tensor],
+                edge_offsets: Optional[torch.Tensor]) -> torch.Tensor:
+        new_globals: Optional[torch.Tensor] = None
 
         if self.W_node is not None:
-            new_globals = new_globals + self.aggregation(graphs.node_features, index=graphs.node_index_by_graph,
-                                                         dim=0, dim_size=graphs.num_graphs) @ self.W_node.t()
+            assert node_features is not None
+            new_globals = self._aggregate_linear(new_globals, node_features, self.W_node, node_index_by_graph,
+                                                 num_graphs, node_offsets)
         if self.W_edges is not None:
-            new_globals = new_globals + self.aggregation(graphs.edge_features, index=graphs.edge_index_by_graph,
-                                                         dim=0, dim_size=graphs.num_graphs) @ self.W_edges.t()
+            assert edge_features is not None
+            new_globals = self._aggregate_linear(new_globals, edge_features, self.W_edges, edge_index_by_graph,
+                                                 num_graphs, edge_offsets)
         if self.W_global is not None:
-            new_globals = new_globals + graphs.global_features @ self.W_global.t()
-        if self.bias is not None:
-            new_globals = new_globals + self.bias.expand(graphs.num_graphs, -1)
+            assert global_features is not None
+            new_globals = _addmm(new_globals, global_features, self.W_global)
 
-        return graphs.evolve(global_features=new_globals)
+        return _finish(new_globals, self.bias, num_graphs, self.out_features, node_index_by_graph.device)
+
+    def _aggregate_linear(self, out: Optional[torch.Tensor], src: torch.Tensor, weight: torch.Tensor,
+                          index: torch.Tensor, dim_size: int, pointers: Optional[torch.Tensor]) -> torch.Tensor:
+        """`out + aggregate(src) @ weight.t()`, projecting `src` before the aggregation
+        if that is cheaper for a sum or a mean."""
+        if _linear_reduce(self._reductions) is not None and \
+                _project_first(src.shape[0], dim_size, weight.shape[1], weight.shape[0]):
+            return _add(out, self._aggregate(src @ weight.t(), index, dim_size, pointers))
+        return _addmm(out, self._aggregate(src, index, dim_size, pointers), weight)
+
+
+def _linear_reduce(reductions: List[str]) -> Optional[str]:
+    """The reduction if it is a single sum or mean, which commute with a linear projection."""
+    if len(reductions) == 1 and (reductions[0] == 'sum' or reductions[0] == 'mean'):
+        return reductions[0]
+    return None
+
+
+# Relative cost of scattering one element in a sum or a mean compared to a multiply-add, including the backward pass,
+# fitted on CPU by timing both orders for increasing output sizes
+_SCATTER_COST = 8
+
+
+def _project_first(num_rows: int, num_groups: int, in_features: int, out_features: int,
+                   scatter_cost: int = _SCATTER_COST) -> bool:
+    """Whether projecting `num_rows` rows before reducing them to `num_groups` rows is cheaper than the opposite.
+
+    Projecting first multiplies all rows but scatters `out_features` values per row instead of `in_features`,
+    so it pays off when the projection is much narrower than the input.
+    """
+    project = num_rows * in_features * out_features + scatter_cost * num_rows * out_features
+    aggregate_first = scatter_cost * num_rows * in_features + num_groups * in_features * out_features
+    return project < aggregate_first
+
+
+def _project_globals(global_features: torch.Tensor, weight: torch.Tensor, bias: Optional[torch.Tensor],
+                     index: torch.Tensor) -> torch.Tensor:
+    """Project the global features and add the bias once per graph, then gather them for every row of `index`,
+    e.g. `edge_index_by_graph`, into a new tensor."""
+    projected = global_features @ weight.t()
+    if bias is not None:
+        projected = projected + bias
+    return projected.index_select(0, index)
+
+
+def _addmm(out: Optional[torch.Tensor], input: torch.Tensor, weight: torch.Tensor,
+           bias: Optional[torch.Tensor] = None) -> torch.Tensor:
+    """`out + input @ weight.t()`, accumulated in place if `out` is given, otherwise the `bias`, if given,
+    is added as part of the matrix multiplication."""
+    if out is not None:
+        return out.addmm_(input, weight.t())
+    if bias is not None:
+        return torch.addmm(bias, input, weight.t())
+    return input @ weight.t()
+
+
+def _add(out: Optional[torch.Tensor], other: torch.Tensor) -> torch.Tensor:
+    """`out + other`, accumulated in place if `out` is given, otherwise `other` must be a new tensor."""
+    if out is not None:
+        return out.add_(other)
+    return other
+
+
+def _finish(out: Optional[torch.Tensor], bias: Optional[torch.Tensor], num_rows: int, out_features: int,
+            device: torch.device) -> torch.Tensor:
+    """Add the bias if it was not added with another term, an output without any term is all zeros."""
+    if out is None:
+        if bias is not None:
+            return bias.expand(num_rows, out_features).clone()
+        return torch.zeros(num_rows, out_features, device=device)
+    if bias is not None:
+        return out.add_(bias)
+    return out
 
 
 def _reset_parameters(module):
@@ -1,11 +1,20 @@
-import warnings
+from typing import Union
 
+import torch
 import torch.nn as nn
+import torch.utils.checkpoint
 
-from ..data import GraphBatch
+from .functions import _FeatureFunction
+from ..data import GraphBatch, GraphTensors
 
 
 class GraphNetwork(nn.Module):
+    """A full graph network block: update the edges, aggregate them to update the nodes,
+    then aggregate nodes and edges to update the globals.
+
+    The feature functions take the graphs, with the features updated so far, and the aggregated features,
+    while the aggregators are modules like `EdgesToSender` that take the graphs.
+    """
     def __init__(self, node_fn, edge_fn, global_fn,
                  edges_to_sender, edges_to_receiver, nodes_to_global, edges_to_global):
         super(GraphNetwork, self).__init__()
@@ -18,24 +27,20 @@ class GraphNetwork(nn.Module):
         self.edges_to_global = edges_to_global
 
     def forward(self, graphs: GraphBatch) -> GraphBatch:
-        edge_features = self.edge_fn(graphs)
-
-        edges_to_sender = self.edges_to_sender(graphs, edge_features)
-        edges_to_receiver = self.edges_to_receiver(graphs, edge_features)
-        node_features = self.node_fn(graphs, edges_to_sender, edges_to_receiver)
+        graphs = _replace_features(graphs, edge_features=self.edge_fn(graphs))
 
-        edge_to_global = self.edges_to_global(graphs, edge_features)
-        node_to_global = self.nodes_to_global(graphs, node_features)
-        global_features = self.global_fn(graphs, node_to_global, edge_to_global)
+        edges_to_sender = self.edges_to_sender(graphs)
+        edges_to_receiver = self.edges_to_receiver(graphs)
+        graphs = _replace_features(graphs, node_features=self.node_fn(graphs, edges_to_sender, edges_to_receiver))
 
-        return graphs.evolve(
-            node_features=node_features,
-            edge_features=edge_features,
-            global_features=global_features
-        )
+        edge_to_global = self.edges_to_global(graphs)
+        node_to_global = self.nodes_to_global(graphs)
+        return _replace_features(graphs, global_features=self.global_fn(graphs, node_to_global, edge_to_global))
 
 
 class GraphLayer(nn.Module):
+    """Update edges, nodes and globals in this order, every function takes the graphs updated so far
+    and returns the new features."""
     def __init__(self, edge_fn=None, node_fn=None, global_fn=None):
         super(GraphLayer, self).__init__()
         self.node_fn = node_fn
@@ -44,15 +49,87 @@ class GraphLayer(nn.Module):
 
     def forward(self, graphs: GraphBatch) -> GraphBatch:
         if self.edge_fn is not None:
-            new_edge_features = self.edge_fn(graphs)
-            graphs.evolve(edge_features=new_edge_features)
-
+            graphs = _replace_features(graphs, edge_features=self.edge_fn(graphs))
         if self.node_fn is not None:
-            new_node_features = self.node_fn(graphs)
-            graphs.evolve(node_features=new_node_features)
-
+            graphs = _replace_features(graphs, node_features=self.node_fn(graphs))
         if self.global_fn is not None:
-            new_global_features = self.global_fn(graphs)
-            graphs.evolve(global_features=new_global_features)
-
+            graphs = _replace_features(graphs, global_features=self.global_fn(graphs))
         return graphs
+
+
+class GraphSequential(nn.Sequential):
+    """A sequential container for modules that take and return graphs, either `GraphBatch` or `GraphTensors`.
+
+    Deep message passing keeps the outputs of every layer alive for the backward pass, two options reduce
+    the memory that is needed:
+
+    - `checkpoint`: when computing gradients, only the graphs between blocks are kept and the activations
+      inside a block are recomputed during the backward pass, see `torch.utils.checkpoint`.
+      With `True` every module is a block, with an integer `k` every `k` consecutive modules form a block.
+    - `inplace`: when gradients are not needed, feature functions like `EdgeReLU` are applied in place to the
+      features produced by previous modules of the container, the features of the input are never modified.
+
+    With `torch.jit.script`, the modules are called one after the other on `GraphTensors`, without these options.
+
+    Examples:
+        * 30 steps of message passing, recomputing the activations of one step at a time
+
+          >>> model = GraphSequential(*(GraphSequential(EdgeLinear(...), EdgeReLU(), NodeLinear(...), NodeReLU())
+          >>>                           for _ in range(30)), checkpoint=True)
+    """
+
+    def __init__(self, *modules: nn.Module, checkpoint: Union[bool, int] = False, inplace: bool = True):
+        super(GraphSequential, self).__init__(*modules)
+        if not isinstance(checkpoint, bool) and checkpoint < 1:
+            raise ValueError(f'`checkpoint` must be a boolean or a positive number of modules, got {checkpoint}')
+        self.checkpoint = checkpoint
+        self.inplace = inplace
+
+    def forward(self, graphs: GraphTensors) -> GraphTensors:
+        """Run the modules in order on a `GraphBatch` or `GraphTensors`, the result has the same type."""
+        if torch.jit.is_scripting():
+            for module in self:
+                graphs = module(graphs)
+            return graphs
+        else:
+            return self._forward_python(graphs)
+
+    @torch.jit.unused
+    def _forward_python(self, graphs):
+        modules = list(self)
+        if self.checkpoint is not False and torch.is_grad_enabled():
+            block_size = 1 if self.checkpoint is True else self.checkpoint
+            for start in range(0, len(modules), block_size):
+                graphs = torch.utils.checkpoint.checkpoint(
+                    _run_modules, modules[start:start + block_size], graphs, use_reentrant=False)
+            return graphs
+
+        if self.inplace and not torch.is_grad_enabled():
+            # Features that share memory with the input must not be modified
+            input_storages = {features.untyped_storage().data_ptr() for features in _features(graphs)}
+            for module in modules:
+                inplace_function = module._inplace_function() if isinstance(module, _FeatureFunction) else None
+                features = getattr(graphs, module._field) if inplace_function is not None else None
+                if features is not None and features.untyped_storage().data_ptr() not in input_storages:
+                    inplace_function(features)
+                else:
+                    graphs = module(graphs)
+            return graphs
+
+        return _run_modules(modules, graphs)
+
+
+def _run_modules(modules, graphs):
+    for module in modules:
+        graphs = module(graphs)
+    return graphs
+
+
+def _features(graphs):
+    return [f for f in (graphs.node_features, graphs.edge_features, graphs.global_features) if f is not None]
+
+
+def _replace_features(graphs, **features):
+    if isinstance(graphs, GraphTensors):
+        return graphs._replace(**features)
+    return graphs.evolve(**features)
@@ -0,0 +1,203 @@
+import warnings
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+import torch
+import torch_scatter
+
+
+def gather_csr(src: torch.Tensor, pointers: torch.LongTensor, index: torch.LongTensor,
+               reduce: str = 'sum', chunk_size: int = None) -> torch.Tensor:
+    """Gather rows of `src` and reduce them in segments, without materializing all gathered rows at once.
+
+    Equivalent to `segment_csr(src.index_select(0, index), pointers, reduce)`, i.e. for every segment `i`:
+
+    >>> out[i] = reduce(src[index[pointers[i]:pointers[i + 1]]])
+
+    Empty segments are filled with zeros. Sums and means are computed as a sparse-dense matrix multiplication,
+    max and min reduce the gathered rows in chunks of whole segments. Gradients can be computed w.r.t. `src`.
+
+    Args:
+        src: a tensor of shape `(num_rows, *)`
+        pointers: the boundaries of the segments in `index`, a tensor of shape `(num_segments + 1,)`
+        index: the rows of `src` to gather, sorted by segment
+        reduce: one of `'sum'`, `'mean'`, `'max'`, `'min'`
+        chunk_size: approximate number of rows gathered at the same time for `'max'` and `'min'`,
+            defaults to `max(num_rows, 4096)` so that the temporary is about as big as `src`
+
+    Returns:
+        A tensor of shape `(num_segments, *)`
+    """
+    num_segments = len(pointers) - 1
+    shape = src.shape[1:]
+    src = src.reshape(len(src), shape.numel())
+
+    if reduce in ('sum', 'add', 'mean', 'avg'):
+        with warnings.catch_warnings():
+            # The beta warning of sparse CSR tensors would be emitted by every aggregation,
+            # the pointers and the index are valid by construction so the invariants are not checked
+            warnings.filterwarnings('ignore', message='Sparse CSR tensor support is in beta')
+            adjacency = torch.sparse_csr_tensor(
+                pointers.to(index.dtype), index, src.new_ones(len(index)), size=(num_segments, len(src)),
+                check_invariants=False)
+        out = torch.sparse.mm(adjacency, src)
+        if reduce in ('mean', 'avg'):
+            counts = (pointers[1:] - pointers[:-1]).clamp_(min=1)
+            out = out / counts.unsqueeze(-1).to(out.dtype)
+    elif reduce in ('max', 'min'):
+        if chunk_size is None:
+            chunk_size = max(len(src), 4096)
+        # Split the segments in chunks of about `chunk_size` gathered rows, every segment is contained in one chunk
+        bounds = torch.searchsorted(
+            pointers, torch.arange(0, len(index), chunk_size, device=pointers.device), right=True) - 1
+        bounds = sorted(set(bounds.tolist()) | {0, num_segments})
+        out = []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            chunk_pointers = pointers[start:end + 1]
+            chunk_index = index[chunk_pointers[0]:chunk_pointers[-1]]
+            out.append(torch_scatter.segment_csr(
+                src.index_select(0, chunk_index), chunk_pointers - chunk_pointers[0], reduce=reduce))
+        out = torch.cat(out) if len(out) > 0 else src.new_zeros(num_segments, src.shape[1])
+    else:
+        raise ValueError(f'Unknown reduction {reduce}')
+
+    return out.reshape(num_segments, *shape)
+
+
+def scatter_many(src: torch.Tensor, index: Optional[torch.Tensor], dim_size: int, reductions: List[str],
+                 pointers: Optional[torch.Tensor] = None) -> List[torch.Tensor]:
+    """Compute several reductions of the rows of `src` grouped by `index`, reading `src` as few times as possible.
+
+    Sums and means share a single scatter of `src`, while the counts come from `index` alone.
+    The standard deviation reuses the means and needs a second scatter of the centered rows `src - mean[index]`,
+    which avoids the cancellation of `E[x²] - E[x]²` when the mean is large compared to the deviation.
+    Max and min require one scatter each. Empty groups are filled with zeros.
+
+    Without `pointers`, only native PyTorch operations are used, so that the function can be scripted
+    with `torch.jit.script` and compiled with `torch.compile` without graph breaks.
+
+    Args:
+        src: a tensor of shape `(num_rows, *)`
+        index: for every row of `src` the index of the output row, can be None if `pointers` are given
+        dim_size: the number of output rows
+        reductions: any of `'sum'`, `'mean'`, `'max'`, `'min'`, `'std'`, possibly repeated
+        pointers: the CSR pointers of `index` if `index` is sorted, in which case segment reductions are used
+
+    Returns:
+        A list of tensors of shape `(dim_size, *)`, one for every reduction in the same order
+    """
+    for reduction in reductions:
+        if reduction not in ('sum', 'mean', 'max', 'min', 'std'):
+            raise ValueError('Unknown reduction ' + reduction)
+
+    shape = list(src.shape[1:])
+    src = src.reshape(src.shape[0], -1)
+
+    results: Dict[str, torch.Tensor] = {}
+    if 'sum' in reductions or 'mean' in reductions or 'std' in reductions:
+        results['sum'] = _reduce(src, index, pointers, dim_size, 'sum')
+    if 'mean' in reductions or 'std' in reductions:
+        if pointers is not None:
+            counts = pointers[1:] - pointers[:-1]
+        else:
+            assert index is not None
+            counts = torch.zeros(dim_size, dtype=src.dtype, device=src.device).index_add_(
+                0, index, torch.ones(index.shape[0], dtype=src.dtype, device=src.device))
+        counts = counts.clamp(min=1).unsqueeze(-1).to(src.dtype)
+        results['mean'] = results['sum'] / counts
+        if 'std' in reductions:
+            if index is None:
+                assert pointers is not None
+                index = torch.repeat_interleave(
+                    torch.arange(dim_size, device=src.device), pointers[1:] - pointers[:-1])
+            centered = src - results['mean'].index_select(0, index)
+            variance = _reduce(centered * centered, index, pointers, dim_size, 'sum') / counts
+            # The gradient of the square root is infinite for a zero variance, e.g. for constant or empty groups
+            nonzero = variance > 0
+            results['std'] = torch.where(nonzero, torch.where(nonzero, variance, 1.).sqrt(), 0.)
+    for reduction in ('max', 'min'):
+        if reduction in reductions:
+            results[reduction] = _reduce(src, index, pointers, dim_size, reduction)
+
+    return [results[reduction].reshape([dim_size] + shape) for reduction in reductions]
+
+
+def _reduce(src: torch.Tensor, index: Optional[torch.Tensor], pointers: Optional[torch.Tensor], dim_size: int,
+            reduction: str) -> torch.Tensor:
+    if pointers is not None:
+        return torch_scatter.segment_csr(src, pointers, reduce=reduction)
+    assert index is not None
+    out = src.new_zeros(dim_size, src.shape[1])
+    if reduction == 'sum':
+        return out.index_add_(0, index, src)
+    # Groups without rows keep the initial zeros
+    return out.scatter_reduce_(0, index.long().unsqueeze(1).expand_as(src), src, 'a' + reduction,
+                               include_self=False)
+
+
+_INPLACE_ACTIVATIONS = {
+    'relu': torch.relu_,
+    'sigmoid': torch.sigmoid_,
+    'tanh': torch.tanh_,
+}
+
+
+class Broadcast(NamedTuple):
+    """Lazy broadcast of per-group rows, e.g. of global features to the nodes or edges of their graph.
+
+    Represents the tensor `values.index_select(0, index)` without allocating it: rows are gathered only
+    when the broadcast is consumed, and directly into the buffer that holds the result.
+    Operations that act row-wise, like a linear projection, are applied to the `values` before broadcasting.
+
+    Examples:
+        * Project the global features, then add them to the edge features and apply a ReLU,
+          only the output tensor of shape `(num_edges, out_features)` is allocated
+
+          >>> globals_as_edges = batch.global_features_as_edges(lazy=True)
+          >>> out = (globals_as_edges @ weight.t()).add_to(edge_features @ other.t(), activation='relu')
+    """
+    values: torch.Tensor
+    index: torch.LongTensor
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def shape(self) -> torch.Size:
+        return torch.Size((len(self.index), *self.values.shape[1:]))
+
+    def materialize(self) -> torch.Tensor:
+        """The broadcast tensor of shape `(len(index), *values.shape[1:])`."""
+        return self.values.index_select(0, self.index)
+
+    def __matmul__(self, other: torch.Tensor) -> 'Broadcast':
+        return Broadcast(self.values @ other, self.index)
+
+    def add_to(self, tensor: torch.Tensor, activation: Union[str, Callable, None] = None) -> torch.Tensor:
+        """Compute `activation(tensor + broadcast)` allocating a single tensor of the size of the result.
+
+        The rows of `values` are gathered into the output buffer, then `tensor` is added and the activation
+        is applied in place, instead of allocating the broadcast, the sum and the activation separately.
+
+        Args:
+            tensor: a tensor that broadcasts to `(len(index), *values.shape[1:])`
+            activation: one of `'relu'`, `'sigmoid'`, `'tanh'`, which are applied in place,
+                or any function of a tensor
+
+        Returns:
+            A tensor of shape `(len(index), *values.shape[1:])`
+        """
+        if isinstance(activation, str) and activation not in _INPLACE_ACTIVATIONS:
+            raise ValueError(f'Unknown activation {activation}, '
+                             f'expected one of {sorted(_INPLACE_ACTIVATIONS)} or a function')
+
+        out = self.materialize()
+        if torch.broadcast_shapes(out.shape, tensor.shape) == out.shape and \
+                torch.promote_types(out.dtype, tensor.dtype) == out.dtype:
+            out = out.add_(tensor)
+        else:
+            out = out + tensor
+        if activation is None:
+            return out
+        if isinstance(activation, str):
+            return _INPLACE_ACTIVATIONS[activation](out)
+        return activation(out)
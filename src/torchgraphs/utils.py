@@ -59,7 +59,8 @@ def segment_lengths_to_ids(segment_lengths: torch.LongTensor) -> torch.LongTenso
         >>> segment_lengths_to_slices(segments)
         tensor([0, 0, 1, 1, 1, 1, 2, 2, 2, 3])
     """
-    return torch.repeat_interleave(torch.arange(len(segment_lengths), device=segment_lengths.device), segment_lengths)
+    return torch.repeat_interleave(
+        torch.arange(len(segment_lengths), device=segment_lengths.device, dtype=segment_lengths.dtype), segment_lengths)
 
 
 def segment_lengths_to_slices(segment_lengths: torch.LongTensor) -> typing.Iterator[slice]:
@@ -82,3 +83,42 @@ def segment_lengths_to_slices(segment_lengths: torch.LongTensor) -> typing.Itera
     yield slice(indexes.new_tensor(0), indexes[0])
     for start, end in zip(indexes[:-1], indexes[1:]):
         yield slice(start, end)
+
+
+def segment_lengths_to_offsets(segment_lengths: torch.LongTensor) -> torch.LongTensor:
+    """
+    Args:
+        segment_lengths: Non-negative lengths of the tensor segments
+
+    Returns:
+        A tensor containing the start of every segment followed by the total length,
+        i.e. the pointers of the segments in CSR format
+
+    Examples:
+        >>> segments = torch.tensor([2, 4, 3, 1])
+        >>> segment_lengths_to_offsets(segments)
+        tensor([0, 2, 6, 9, 10])
+    """
+    offsets = segment_lengths.new_zeros(len(segment_lengths) + 1, dtype=torch.long)
+    torch.cumsum(segment_lengths, dim=0, out=offsets[1:])
+    return offsets
+
+
+def segments_to_index(starts: torch.LongTensor, lengths: torch.LongTensor) -> torch.LongTensor:
+    """
+    Args:
+        starts: the first index of every segment
+        lengths: Non-negative lengths of the segments
+
+    Returns:
+        The concatenation of `arange(start, start + length)` for every segment,
+        i.e. the indexes to gather the segments from a larger tensor
+
+    Examples:
+        >>> segments_to_index(torch.tensor([5, 0, 2]), torch.tensor([2, 0, 3]))
+        tensor([5, 6, 2, 3, 4])
+    """
+    offsets = segment_lengths_to_offsets(lengths)
+    total = offsets[-1].item()
+    shifts = torch.repeat_interleave((starts - offsets[:-1]).long(), lengths, output_size=total)
+    return torch.arange(total, device=starts.device) + shifts
@@ -2,6 +2,7 @@ import pytest
 import torch
 
 from torchgraphs import Graph
+from torchgraphs.data import Validation, get_validation, validation
 
 def test_empty():
     graph = Graph()
@@ -109,6 +110,40 @@ def test_globals():
     validate_graph(graph)
 
 
+def test_validation_levels():
+    assert get_validation() is Validation.FULL
+
+    with validation('shapes'):
+        # Out-of-bounds indexes are not detected without reading the index tensors
+        Graph(num_nodes=6, senders=torch.tensor([0, 1, 1000]), receivers=torch.tensor([3, 4, 5]))
+        with pytest.raises(ValueError):
+            Graph(num_nodes=6, senders=torch.tensor([0]), receivers=torch.tensor([3, 4, 5]))
+
+    with validation(Validation.OFF):
+        Graph(num_nodes=6, senders=torch.tensor([0]), receivers=torch.tensor([3, 4, 5]))
+
+    assert get_validation() is Validation.FULL
+    with pytest.raises(ValueError):
+        Graph(num_nodes=6, senders=torch.tensor([0, 1, 1000]), receivers=torch.tensor([3, 4, 5]))
+
+
+def test_evolve():
+    graph = Graph(num_nodes=6, edge_features=torch.rand(5, 2), global_features=torch.rand(3),
+                  senders=torch.tensor([0, 1, 2, 5, 5]), receivers=torch.tensor([3, 4, 5, 5, 5]))
+
+    # Only features are replaced: the structure is shared, the new features are validated
+    other = graph.evolve(edge_features=torch.rand(5, 7), node_features=torch.rand(6, 3))
+    validate_graph(other)
+    assert other.senders is graph.senders and other.receivers is graph.receivers
+    assert other.edge_features_shape == (7,) and graph.edge_features_shape == (2,)
+    with pytest.raises(ValueError):
+        graph.evolve(edge_features=torch.rand(4, 2))
+
+    # The structure is replaced: full validation
+    with pytest.raises(ValueError):
+        graph.evolve(senders=torch.tensor([0, 1, 2, 5, 1000]))
+
+
 def validate_graph(graph: Graph):
     assert graph.num_nodes >= 0
     assert graph.num_edges >= 0
@@ -1,9 +1,9 @@
 import pytest
-
+import torch
 import networkx as nx
 
 from torchgraphs import Graph
-from torchgraphs.data.features import add_dummy_features
+from torchgraphs.data.features import add_dummy_features, add_random_features
 from graphs_for_test import graphs_for_test
 
 
@@ -109,3 +109,88 @@ def test_global_functions(graph_nx):
     assert graph.global_features.shape == graph.global_features_shape
     assert graph.global_features_as_nodes.shape == (graph.num_nodes, *graph.global_features_shape)
     assert graph.global_features_as_edges.shape == (graph.num_edges, *graph.global_features_shape)
+
+
+def test_compressed_edge_index(graph_nx):
+    graph_nx = add_dummy_features(graph_nx)
+    graph = Graph.from_networkx(graph_nx)
+
+    for node_index in range(graph.num_nodes):
+        out_edges = graph.edges_by_sender.edges_of(node_index)
+        in_edges = graph.edges_by_receiver.edges_of(node_index)
+        assert (graph.senders[out_edges] == node_index).all()
+        assert (graph.receivers[in_edges] == node_index).all()
+        assert out_edges.tolist() == (graph.senders == node_index).nonzero().flatten().tolist()
+        assert in_edges.tolist() == (graph.receivers == node_index).nonzero().flatten().tolist()
+
+        assert sorted(graph.neighbors(node_index).tolist()) == sorted(r for _, r in graph_nx.out_edges(node_index))
+        assert sorted(graph.successor_features[node_index][:, 0].tolist()) == \
+            sorted(r for _, r in graph_nx.out_edges(node_index))
+        assert sorted(graph.predecessor_features[node_index][:, 0].tolist()) == \
+            sorted(s for s, _ in graph_nx.in_edges(node_index))
+
+
+def test_compressed_edge_index_cache(graph_nx):
+    graph = add_dummy_features(Graph.from_networkx(graph_nx))
+    edges_by_sender = graph.edges_by_sender
+    assert graph.edges_by_sender is edges_by_sender
+
+    # Only features change, the index is carried over
+    other = graph.evolve(edge_features=graph.edge_features * 2)
+    assert other.edges_by_sender is edges_by_sender
+
+    # The structure changes, the index is rebuilt
+    other = graph.evolve(senders=graph.receivers, receivers=graph.senders)
+    assert other.edges_by_sender is not edges_by_sender
+    assert (other.edges_by_sender.permutation == graph.edges_by_receiver.permutation).all()
+
+    graph.senders = graph.senders.clone()
+    assert graph.edges_by_sender is not edges_by_sender
+
+
+@pytest.mark.parametrize('by', ['receiver', 'sender'])
+def test_sort_edges(graph_nx, by):
+    graph = add_random_features(Graph.from_networkx(graph_nx), node_features_shape=3, edge_features_shape=2)
+    sorted_graph, permutation = graph.sort_edges(by=by)
+
+    assert sorted_graph.edge_order == by
+    assert (sorted_graph.senders == graph.senders[permutation]).all()
+    assert (sorted_graph.receivers == graph.receivers[permutation]).all()
+    assert (sorted_graph.edge_features == graph.edge_features[permutation]).all()
+    primary, secondary = (sorted_graph.receivers, sorted_graph.senders) if by == 'receiver' \
+        else (sorted_graph.senders, sorted_graph.receivers)
+    keys = list(zip(primary.tolist(), secondary.tolist()))
+    assert keys == sorted(keys)
+
+    # Segment reductions on the sorted graph match scatter reductions on the original graph
+    for aggregation in ('sum', 'mean', 'max'):
+        torch.testing.assert_close(sorted_graph.in_edge_features(aggregation),
+                                   graph.in_edge_features(aggregation))
+        torch.testing.assert_close(sorted_graph.out_edge_features(aggregation),
+                                   graph.out_edge_features(aggregation))
+
+    # The ordering is kept when only features change or the graph is moved, reset when the edges change
+    assert sorted_graph.evolve(edge_features=sorted_graph.edge_features + 1).edge_order == by
+    assert sorted_graph.cpu().edge_order == by
+    assert sorted_graph.evolve(senders=sorted_graph.senders, receivers=sorted_graph.receivers).edge_order is None
+
+
+def test_edge_order_validation():
+    with pytest.raises(ValueError):
+        Graph(num_nodes=3, senders=torch.tensor([0, 1, 2]), receivers=torch.tensor([2, 1, 0]), edge_order='receiver')
+    with pytest.raises(ValueError):
+        Graph(num_nodes=3, senders=torch.tensor([0, 1, 2]), receivers=torch.tensor([2, 1, 0]), edge_order='other')
+    Graph(num_nodes=3, senders=torch.tensor([0, 1, 2]), receivers=torch.tensor([2, 1, 0]), edge_order='sender')
+
+
+def test_multiple_aggregations(graph_nx):
+    graph = add_random_features(Graph.from_networkx(graph_nx), edge_features_shape=2)
+    aggregations = ['sum', 'mean', 'max']
+
+    results = graph.in_edge_features(aggregations)
+    for aggregation, result in zip(aggregations, results):
+        torch.testing.assert_close(result, graph.in_edge_features(aggregation))
+
+    result = graph.out_edge_features(aggregations, concat=True)
+    assert result.shape == (graph.num_nodes, 3 * 2)
+    torch.testing.assert_close(result, torch.cat([graph.out_edge_features(a) for a in aggregations], dim=-1))
@@ -1,3 +1,5 @@
+import networkx as nx
+
 from torchgraphs import Graph
 from torchgraphs.data.features import add_random_features
 
@@ -24,3 +26,15 @@ def test_device(graph, features_shapes, device):
         assert (getattr(other_graph, k) is None) or (getattr(other_graph, k).device == device)
 
     assert_graphs_equal(graph, other_graph.cpu())
+
+
+def test_from_networkx_relabel():
+    graph_nx = nx.MultiDiGraph()
+    graph_nx.add_nodes_from(['a', 'b', 'c'])
+    graph_nx.add_edges_from([('c', 'a'), ('a', 'b'), ('c', 'a')])
+    graph = Graph.from_networkx(graph_nx)
+
+    assert graph.num_nodes == 3
+    # Edges are listed by networkx grouped by sender
+    assert graph.senders.tolist() == [0, 2, 2]
+    assert graph.receivers.tolist() == [1, 0, 0]
@@ -0,0 +1,58 @@
+import pytest
+import torch
+
+from torchgraphs import Graph
+from torchgraphs.data.features import add_random_features
+
+from data.utils import assert_graphs_equal
+
+
+def dense_adjacency(graph: Graph, values=None):
+    if values is None:
+        values = torch.ones(graph.num_edges)
+    adjacency = values.new_zeros(graph.num_nodes, graph.num_nodes, *values.shape[1:])
+    return adjacency.index_put_((graph.senders, graph.receivers), values, accumulate=True)
+
+
+def test_to_sparse(graph):
+    graph = add_random_features(graph, edge_features_shape=3)
+
+    torch.testing.assert_close(graph.to_sparse_coo().to_dense(), dense_adjacency(graph))
+    torch.testing.assert_close(graph.to_sparse_csr().to_dense(), dense_adjacency(graph))
+    torch.testing.assert_close(graph.to_sparse_coo('edge_features').to_dense(),
+                               dense_adjacency(graph, graph.edge_features))
+    torch.testing.assert_close(graph.to_sparse_csr(graph.edge_features).to_dense(),
+                               dense_adjacency(graph, graph.edge_features))
+
+    # Aggregation of the successors as a sparse matrix multiplication
+    node_features = torch.rand(graph.num_nodes, 5)
+    torch.testing.assert_close(torch.sparse.mm(graph.to_sparse_csr(), node_features),
+                               graph.evolve(node_features=node_features).successor_features(aggregation='sum'))
+
+
+def test_from_torch_sparse(graph):
+    graph = add_random_features(graph, edge_features_shape=3)
+
+    assert_graphs_equal(Graph.from_torch_sparse(graph.to_sparse_coo('edge_features')), graph)
+
+    other = Graph.from_torch_sparse(graph.to_sparse_csr('edge_features'))
+    torch.testing.assert_close(other.to_sparse_coo('edge_features').to_dense(),
+                               dense_adjacency(graph, graph.edge_features))
+
+    other = Graph.from_torch_sparse(graph.to_sparse_coo(), edge_features=False)
+    assert other.edge_features is None
+    assert other.num_edges == graph.num_edges
+
+
+def test_scipy_sparse(graph):
+    pytest.importorskip('scipy')
+    graph = add_random_features(graph, edge_features_shape=())
+
+    for format in ('coo', 'csr', 'csc'):
+        matrix = graph.to_scipy_sparse('edge_features', format=format)
+        torch.testing.assert_close(torch.from_numpy(matrix.toarray()), dense_adjacency(graph, graph.edge_features))
+
+    assert_graphs_equal(Graph.from_scipy_sparse(graph.to_scipy_sparse('edge_features')), graph)
+
+    with pytest.raises(ValueError):
+        add_random_features(graph, edge_features_shape=3).to_scipy_sparse('edge_features')
@@ -1,4 +1,5 @@
 import torch
+from torch.utils.data import DataLoader
 
 from torchgraphs import Graph, GraphBatch
 from torchgraphs.data.features import add_random_features
@@ -43,3 +44,20 @@ def test_collate_dicts(graphs_nx, features_shapes, device):
 
     for g1, g2 in zip(graphs_out, batch['out']):
         assert_graphs_equal(g1, g2)
+
+
+def test_collate_in_workers(graphs_nx, features_shapes):
+    graphs = [add_random_features(Graph.from_networkx(g), **features_shapes) for g in graphs_nx]
+    loader = DataLoader(graphs, batch_size=3, num_workers=2, collate_fn=GraphBatch.collate)
+
+    for i, batch in enumerate(loader):
+        # All tensors of the batch are views of a single shared memory buffer
+        tensors = [batch.senders, batch.receivers, batch.num_nodes_by_graph, batch.num_edges_by_graph,
+                   batch.node_index_by_graph, batch.edge_index_by_graph, batch.node_features, batch.edge_features,
+                   batch.global_features]
+        tensors = [t for t in tensors if t is not None]
+        assert all(t.is_shared() for t in tensors)
+        assert len({t.untyped_storage().data_ptr() for t in tensors}) == 1
+
+        for g1, g2 in zip(graphs[3 * i:3 * i + 3], batch):
+            assert_graphs_equal(g1, g2)
@@ -79,8 +79,153 @@ def test_from_graphs(graphs, features_shapes, device):
         assert_graphs_equal(graphs[i], graphbatch[i])
 
 
+
+def test_from_graphs_grad(graphs, device):
+    graphs = [add_random_features(g, node_features_shape=3, edge_features_shape=2, global_features_shape=2).to(device)
+              for g in graphs]
+    graphs[0].node_features.requires_grad_()
+    graphs[-1].global_features.requires_grad_()
+
+    graphbatch = GraphBatch.from_graphs(graphs)
+    assert graphbatch.edge_features.grad_fn is None
+    (graphbatch.node_features.sum() + 2 * graphbatch.global_features.sum()).backward()
+    torch.testing.assert_close(graphs[0].node_features.grad, torch.ones_like(graphs[0].node_features))
+    torch.testing.assert_close(graphs[-1].global_features.grad, torch.full_like(graphs[-1].global_features, 2))
+
+    with torch.no_grad():
+        assert not GraphBatch.from_graphs(graphs).node_features.requires_grad
+
+
+def test_to_sparse(graphs):
+    graphbatch = GraphBatch.from_graphs(graphs)
+    adjacency = torch.block_diag(*(g.to_sparse_coo().to_dense() for g in graphs))
+    torch.testing.assert_close(graphbatch.to_sparse_coo().to_dense(), adjacency)
+    torch.testing.assert_close(graphbatch.to_sparse_csr().to_dense(), adjacency)
+
+
+def test_edge_order(graphs):
+    graphs = [add_random_features(g, edge_features_shape=2) for g in graphs]
+    sorted_graphs = [g.sort_edges(by='receiver')[0] for g in graphs]
+
+    graphbatch = GraphBatch.from_graphs(sorted_graphs)
+    assert graphbatch.edge_order == 'receiver'
+    graphbatch._validate(level='full')
+    for g_orig, g_batch in zip(sorted_graphs, graphbatch):
+        assert g_batch.edge_order == 'receiver'
+        assert_graphs_equal(g_orig, g_batch)
+
+    # Mixed orderings are not retained
+    assert GraphBatch.from_graphs(sorted_graphs[:2] + graphs[2:]).edge_order is None
+
+
+def test_index_dtype(graphs, device):
+    graphs = [add_random_features(g, node_features_shape=3, edge_features_shape=2).to(device) for g in graphs]
+    graphbatch = GraphBatch.from_graphs(graphs, index_dtype=torch.int32)
+    validate_batch(graphbatch)
+
+    assert graphbatch.index_dtype == torch.int32
+    for name in ('senders', 'receivers', 'num_nodes_by_graph', 'num_edges_by_graph',
+                 'node_index_by_graph', 'edge_index_by_graph'):
+        assert getattr(graphbatch, name).dtype == torch.int32
+    for g, gb in zip(graphs, graphbatch):
+        assert gb.index_dtype == torch.int32
+        assert_graphs_equal(g, gb)
+
+    # The dtype of the graphs is kept by default and converted with `to()`
+    assert GraphBatch.from_graphs([g.to(index_dtype=torch.int32) for g in graphs]).index_dtype == torch.int32
+    assert graphbatch.to(index_dtype=torch.int64).index_dtype == torch.int64
+    assert GraphBatch.from_graphs(graphs).index_dtype == torch.int64
+
+    # Aggregations give the same results as with int64 indexes
+    graphbatch_long = graphbatch.to(index_dtype=torch.long)
+    for aggregation in ('sum', 'mean', 'max'):
+        for view in ('in_edge_features', 'out_edge_features', 'successor_features', 'predecessor_features',
+                     'node_features_by_graph', 'edge_features_by_graph'):
+            torch.testing.assert_close(getattr(graphbatch, view)(aggregation),
+                                       getattr(graphbatch_long, view)(aggregation))
+    torch.testing.assert_close(graphbatch.to_sparse_csr().to_dense(), graphbatch_long.to_sparse_coo().to_dense())
+
+    with pytest.raises(ValueError):
+        GraphBatch.from_graphs(graphs).to(index_dtype=torch.int16)
+
+
 def validate_batch(graphbatch):
     assert len(graphbatch) == graphbatch.num_graphs
     assert (graphbatch.senders < graphbatch.num_nodes).all()
     assert (graphbatch.receivers < graphbatch.num_nodes).all()
     assert (graphbatch.degree == graphbatch.in_degree + graphbatch.out_degree).all()
+
+
+def test_to(graphs, device):
+    graphs = [add_random_features(g, node_features_shape=3, edge_features_shape=2, global_features_shape=4)
+              for g in graphs]
+    graphbatch = GraphBatch.from_graphs(graphs)
+    degree = graphbatch.degree
+    edges_by_sender = graphbatch.edges_by_sender
+    node_index_by_graph = graphbatch.node_index_by_graph
+    edge_index_by_graph = graphbatch.edge_index_by_graph
+
+    moved = graphbatch.to(device, dtype=torch.float64)
+    validate_batch(moved)
+    assert moved.node_features.dtype == moved.edge_features.dtype == moved.global_features.dtype == torch.float64
+    assert moved.senders.device.type == moved.node_index_by_graph.device.type == torch.device(device).type
+    for g, gb in zip(graphs, moved):
+        assert_graphs_equal(g, gb.cpu())
+
+    # Derived and cached values are moved along, all tensors are views of one buffer
+    assert moved.structure.cache['node_index_by_graph'].device == moved.senders.device
+    torch.testing.assert_close(moved.node_index_by_graph.cpu(), node_index_by_graph)
+    torch.testing.assert_close(moved.edge_index_by_graph.cpu(), edge_index_by_graph)
+    assert moved.structure.cache['degree'].device == moved.senders.device
+    torch.testing.assert_close(moved.degree.cpu(), degree)
+    torch.testing.assert_close(moved.edges_by_sender.permutation.cpu(), edges_by_sender.permutation)
+    storages = {getattr(moved, name).untyped_storage().data_ptr() for name in
+                moved._index_fields + moved._feature_fields + ('node_index_by_graph', 'edge_index_by_graph')}
+    assert len(storages) == 1
+
+    # The cache is dropped when the index dtype changes
+    moved = graphbatch.to(device, index_dtype=torch.int32)
+    assert 'degree' not in moved.structure.cache
+    assert moved.node_index_by_graph.dtype == torch.int32
+
+    # Gradients flow back through the transfer
+    graphbatch.node_features.requires_grad_()
+    graphbatch.to(device, dtype=torch.float64).node_features.sum().backward()
+    torch.testing.assert_close(graphbatch.node_features.grad, torch.ones_like(graphbatch.node_features))
+
+
+def test_cat(graphs_nx, features_shapes, device):
+    graphs = [Graph.from_networkx(add_random_features(g, **features_shapes)).to(device) for g in graphs_nx]
+    batches = [GraphBatch.from_graphs(graphs[:3]), GraphBatch.from_graphs(graphs[3:4]),
+               GraphBatch.from_graphs(graphs[4:], index_dtype=torch.int32)]
+
+    graphbatch = GraphBatch.cat(batches)
+    validate_batch(graphbatch)
+    graphbatch._validate(level='full')
+    assert graphbatch.index_dtype == torch.int64
+    assert graphbatch.num_graphs == len(graphs)
+    assert graphbatch.node_offsets.tolist() == GraphBatch.from_graphs(graphs).node_offsets.tolist()
+    for g, gb in zip(graphs, graphbatch):
+        assert_graphs_equal(g, gb)
+
+    # Splitting and concatenating again gives the same batch
+    for g, gb in zip(graphs, GraphBatch.cat(graphbatch.split(3, balance='nodes'), index_dtype=torch.int32)):
+        assert gb.index_dtype == torch.int32
+        assert_graphs_equal(g, gb)
+
+    with pytest.raises(ValueError):
+        GraphBatch.cat([])
+
+
+def test_cat_grad(graphs, device):
+    graphs = [add_random_features(g, node_features_shape=3, global_features_shape=2).to(device) for g in graphs]
+    batches = [GraphBatch.from_graphs(graphs[:2]), GraphBatch.from_graphs(graphs[2:])]
+    for b in batches:
+        b.node_features.requires_grad_()
+
+    GraphBatch.cat(batches).node_features.sum().backward()
+    for b in batches:
+        torch.testing.assert_close(b.node_features.grad, torch.ones_like(b.node_features))
+
+    with pytest.raises(ValueError):
+        GraphBatch.cat([batches[0], batches[1].evolve(global_features=None)])
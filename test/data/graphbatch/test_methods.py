@@ -0,0 +1,170 @@
+import dataclasses
+
+import pytest
+import torch
+
+from torchgraphs import Graph, GraphBatch
+from torchgraphs.data.features import add_random_features
+from data.utils import assert_graphs_equal
+
+
+@pytest.mark.parametrize('direction', ['in', 'out', None])
+@pytest.mark.parametrize('aggregation', ['max', 'min', 'mean', 'sum'])
+def test_degree_by_graph(graphs, aggregation, direction):
+    graphbatch = GraphBatch.from_graphs(graphs)
+    result = graphbatch.degree_by_graph(aggregation, direction=direction)
+    assert result is graphbatch.degree_by_graph(aggregation, direction=direction)
+
+    attribute = {'in': 'in_degree', 'out': 'out_degree', None: 'degree'}[direction]
+    expected = []
+    for g in graphs:
+        degree = getattr(g, attribute)
+        if len(degree) == 0:
+            expected.append(0)
+        elif aggregation == 'mean':
+            expected.append(degree.float().mean().item())
+        else:
+            expected.append(getattr(degree, aggregation)().item())
+    torch.testing.assert_close(result, torch.tensor(expected, dtype=result.dtype))
+
+
+def test_cached_degree(graphs):
+    graphbatch = GraphBatch.from_graphs(graphs)
+    degree = graphbatch.degree
+    assert graphbatch.degree is degree
+    assert graphbatch.evolve(node_features=torch.rand(graphbatch.num_nodes, 2)).degree is degree
+    assert (graphbatch.degree == graphbatch.in_degree + graphbatch.out_degree).all()
+    assert graphbatch.out_degree.sum() == graphbatch.in_degree.sum() == graphbatch.num_edges
+
+
+def test_indexing(graphs_nx, features_shapes, device):
+    graphs = [Graph.from_networkx(add_random_features(g, **features_shapes)) for g in graphs_nx]
+    graphbatch = GraphBatch.from_graphs(graphs).to(device)
+
+    def assert_batch_of(batch, expected_graphs):
+        expected = GraphBatch.from_graphs(expected_graphs)
+        assert batch.num_graphs == len(expected_graphs)
+        assert batch.num_nodes_by_graph.tolist() == expected.num_nodes_by_graph.tolist()
+        assert batch.num_edges_by_graph.tolist() == expected.num_edges_by_graph.tolist()
+        assert batch.senders.tolist() == expected.senders.tolist()
+        assert batch.receivers.tolist() == expected.receivers.tolist()
+        for g1, g2 in zip(batch, expected_graphs):
+            assert_graphs_equal(g1.cpu(), g2)
+
+    for i in range(-len(graphs), len(graphs)):
+        assert_graphs_equal(graphbatch[i].cpu(), graphs[i])
+    with pytest.raises(IndexError):
+        graphbatch[len(graphs)]
+
+    assert_batch_of(graphbatch[2:5], graphs[2:5])
+    assert_batch_of(graphbatch[-3:], graphs[-3:])
+    assert_batch_of(graphbatch[::-2], graphs[::-2])
+    assert_batch_of(graphbatch[[6, 2, 2, 0]], [graphs[i] for i in [6, 2, 2, 0]])
+    assert_batch_of(graphbatch[torch.tensor([1, -1], device=device)], [graphs[1], graphs[-1]])
+    mask = torch.arange(len(graphs), device=device) % 2 == 1
+    assert_batch_of(graphbatch[mask], graphs[1::2])
+
+    if graphbatch.node_features is not None:
+        assert graphbatch[1:].node_features.data_ptr() == graphbatch.node_features[graphs[0].num_nodes:].data_ptr()
+        for i, g in enumerate(graphs):
+            if g.node_features is not None:
+                torch.testing.assert_close(graphbatch.node_features_by_graph[i].cpu(), g.node_features)
+    if graphbatch.edge_features is not None:
+        for features, g in zip(graphbatch.edge_features_by_graph, graphs):
+            if g.edge_features is not None:
+                torch.testing.assert_close(features.cpu(), g.edge_features)
+
+
+def test_to_graphs(graphs_nx, features_shapes, device):
+    graphs = [Graph.from_networkx(add_random_features(g, **features_shapes)) for g in graphs_nx]
+    graphbatch = GraphBatch.from_graphs(graphs, index_dtype=torch.int32).to(device)
+
+    unbatched = graphbatch.to_graphs()
+    assert len(unbatched) == len(graphs)
+    for g1, g2 in zip(unbatched, graphs):
+        assert g1.senders.dtype == torch.int32
+        assert_graphs_equal(g1.cpu(), g2)
+
+
+def test_shared_structure(graphs):
+    graphbatch = GraphBatch.from_graphs(graphs)
+    structure = graphbatch.structure
+
+    # Replacing only features shares the structure, values derived by one graph are available to the other
+    evolved = graphbatch.evolve(node_features=torch.rand(graphbatch.num_nodes, 3))
+    assert evolved.structure is structure
+    edge_index_by_graph = evolved.edge_index_by_graph
+    assert graphbatch.edge_index_by_graph is edge_index_by_graph
+
+    # Replacing the structure builds a new one
+    evolved = graphbatch.evolve(senders=graphbatch.receivers, receivers=graphbatch.senders)
+    assert evolved.structure is not structure
+    assert evolved.edge_index_by_graph is not edge_index_by_graph
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        structure.senders = None
+
+    # The topology is read from the structure, assigning it replaces the structure of this batch only
+    assert graphbatch.senders is structure.senders and graphbatch.num_graphs == structure.num_graphs
+    evolved = graphbatch.evolve(node_features=None)
+    evolved.num_edges_by_graph = evolved.num_edges_by_graph.clone()
+    assert evolved.structure is not structure and evolved.structure.cache == {}
+    assert evolved.num_edges_by_graph is evolved.structure.num_edges_by_graph
+    assert graphbatch.structure is structure and graphbatch.num_edges_by_graph is structure.num_edges_by_graph
+
+
+def test_global_features_broadcast(graphs_nx, features_shapes, device):
+    graphs = [Graph.from_networkx(add_random_features(g, **features_shapes)) for g in graphs_nx]
+    graphbatch = GraphBatch.from_graphs(graphs).to(device)
+    if graphbatch.global_features is None:
+        pytest.skip('No global features')
+
+    as_edges = graphbatch.global_features_as_edges()
+    as_nodes = graphbatch.global_features_as_nodes()
+    assert as_edges.shape == (graphbatch.num_edges, *graphbatch.global_features_shape)
+    assert as_nodes.shape == (graphbatch.num_nodes, *graphbatch.global_features_shape)
+    for graph, edges, nodes in zip(graphbatch, as_edges.split(graphbatch.num_edges_by_graph.tolist()),
+                                   as_nodes.split(graphbatch.num_nodes_by_graph.tolist())):
+        torch.testing.assert_close(edges, graph.global_features_as_edges)
+        torch.testing.assert_close(nodes, graph.global_features_as_nodes)
+
+    lazy = graphbatch.global_features_as_edges(lazy=True)
+    assert lazy.shape == as_edges.shape
+    torch.testing.assert_close(lazy.materialize(), as_edges)
+
+
+@pytest.mark.parametrize('balance', [None, 'nodes', 'edges'])
+def test_split(graphs, balance, device):
+    graphs = [add_random_features(g, node_features_shape=3, edge_features_shape=2).to(device) for g in graphs]
+    graphbatch = GraphBatch.from_graphs(graphs)
+
+    for sections in (1, 3, len(graphs) + 2):
+        chunks = graphbatch.split(sections, balance=balance)
+        assert len(chunks) == sections
+        assert sum(chunk.num_graphs for chunk in chunks) == len(graphs)
+        for g, gb in zip(graphs, (gb for chunk in chunks for gb in chunk)):
+            assert_graphs_equal(g, gb)
+
+    # Balanced chunks are at most one graph away from the ideal split
+    if balance is not None:
+        sizes = [getattr(g, f'num_{balance}') for g in graphs]
+        for chunk in graphbatch.split(2, balance=balance):
+            assert abs(getattr(chunk, f'num_{balance}') - sum(sizes) / 2) <= max(sizes) / 2
+
+
+def test_split_sizes(graphs):
+    graphs = [add_random_features(g, node_features_shape=3) for g in graphs]
+    graphbatch = GraphBatch.from_graphs(graphs)
+
+    chunks = graphbatch.split([2, 0, len(graphs) - 2])
+    assert [chunk.num_graphs for chunk in chunks] == [2, 0, len(graphs) - 2]
+    assert chunks[2].node_features.data_ptr() == graphbatch.node_features[graphbatch.node_offsets[2]:].data_ptr()
+    for g, gb in zip(graphs, (gb for chunk in chunks for gb in chunk)):
+        assert_graphs_equal(g, gb)
+
+    with pytest.raises(ValueError):
+        graphbatch.split([1, 1])
+    with pytest.raises(ValueError):
+        graphbatch.split([2, len(graphs) - 2], balance='nodes')
+    with pytest.raises(ValueError):
+        graphbatch.split(0)
@@ -0,0 +1,86 @@
+import pytest
+import torch
+from torch.utils.data import DataLoader
+
+from torchgraphs import Graph, GraphBatch
+from torchgraphs.data import PrefetchLoader
+from torchgraphs.data.features import add_random_features
+from data.utils import assert_graphs_equal
+
+
+@pytest.fixture
+def samples(graphs_nx, features_shapes):
+    graphs = [add_random_features(Graph.from_networkx(g), **features_shapes) for g in graphs_nx]
+    return [(g, torch.rand(3)) for g in graphs]
+
+
+def assert_samples_equal(batch, samples):
+    graphbatch, xs = batch
+    assert isinstance(graphbatch, GraphBatch)
+    for g1, (g2, _) in zip(graphbatch, samples):
+        assert_graphs_equal(g1, g2)
+    torch.testing.assert_close(xs, torch.stack([x for _, x in samples]))
+
+
+@pytest.mark.parametrize('num_workers', [0, 2])
+def test_prefetch(samples, num_workers):
+    loader = DataLoader(samples, batch_size=2, num_workers=num_workers, collate_fn=GraphBatch.collate)
+    prefetcher = PrefetchLoader(loader, device='cpu', prefetch=1)
+    assert len(prefetcher) == len(loader)
+    for _ in range(2):
+        batches = list(prefetcher)
+        assert len(batches) == len(loader)
+        for i, batch in enumerate(batches):
+            assert_samples_equal(batch, samples[2 * i:2 * i + 2])
+
+
+def test_collate_on_thread(samples):
+    loader = DataLoader(samples, batch_size=3, collate_fn=list)
+    for i, batch in enumerate(PrefetchLoader(loader, collate_fn=GraphBatch.collate)):
+        assert_samples_equal(batch, samples[3 * i:3 * i + 3])
+
+
+def test_early_stop(samples):
+    prefetcher = PrefetchLoader(DataLoader(samples, batch_size=1, collate_fn=GraphBatch.collate), prefetch=1)
+    for batch in prefetcher:
+        break
+    assert_samples_equal(next(iter(prefetcher)), samples[:1])
+
+
+def test_exception(samples):
+    def collate(samples):
+        raise RuntimeError('collate failed')
+
+    with pytest.raises(RuntimeError, match='collate failed'):
+        list(PrefetchLoader(DataLoader(samples, batch_size=2, collate_fn=list), collate_fn=collate))
+
+
+def test_cache(samples, device):
+    # Indexes computed while collating are moved along with the batch instead of being recomputed
+    def collate(samples):
+        batch, xs = GraphBatch.collate(samples)
+        batch.edges_by_receiver
+        return batch, xs
+
+    loader = DataLoader(samples, batch_size=2, collate_fn=collate)
+    for i, (batch, xs) in enumerate(PrefetchLoader(loader, device=device)):
+        assert batch.senders.device == device
+        assert 'edges_by_receiver' in batch.structure.cache and 'node_offsets' in batch.structure.cache
+        assert batch.structure.cache['edges_by_receiver'].pointers.device == device
+        assert_samples_equal((batch.cpu(), xs.cpu()), samples[2 * i:2 * i + 2])
+
+
+@pytest.mark.skipif(not torch.cuda.is_available(), reason='Pinned memory requires CUDA')
+def test_pin_memory(samples):
+    graph, _ = samples[0]
+    pinned = graph.pin_memory()
+    assert pinned is not graph
+    assert pinned.senders.is_pinned() and not graph.senders.is_pinned()
+
+    # The staging buffers of every prefetch slot are reused across batches and epochs
+    loader = DataLoader(samples, batch_size=2, collate_fn=GraphBatch.collate)
+    prefetcher = PrefetchLoader(loader, device='cuda', prefetch=1)
+    for _ in range(2):
+        for i, (batch, xs) in enumerate(prefetcher):
+            assert batch.senders.is_cuda and xs.is_cuda
+            assert_samples_equal((batch.cpu(), xs.cpu()), samples[2 * i:2 * i + 2])
@@ -0,0 +1,77 @@
+import pytest
+import torch
+from torch.utils.data import DataLoader
+
+from torchgraphs import Graph, GraphBatch, GraphStore
+from torchgraphs.data import BudgetBatchSampler
+
+
+@pytest.fixture
+def sizes():
+    generator = torch.Generator().manual_seed(0)
+    num_nodes = torch.randint(1, 50, (500,), generator=generator)
+    num_edges = num_nodes * torch.randint(0, 4, (500,), generator=generator)
+    return num_nodes, num_edges
+
+
+@pytest.mark.parametrize('bucket_size', [None, 64])
+@pytest.mark.parametrize('shuffle', [True, False])
+def test_budgets(sizes, shuffle, bucket_size):
+    num_nodes, num_edges = sizes
+    sampler = BudgetBatchSampler(num_nodes, num_edges, max_nodes=200, max_edges=300, max_graphs=20,
+                                 shuffle=shuffle, bucket_size=bucket_size)
+    batches = list(sampler)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(num_nodes)))
+    for batch in batches:
+        assert len(batch) <= 20
+        assert num_nodes[batch].sum() <= 200
+        assert num_edges[batch].sum() <= 300
+    if not shuffle and bucket_size is None:
+        assert [i for batch in batches for i in batch] == list(range(len(num_nodes)))
+
+
+def test_oversized_graph():
+    sampler = BudgetBatchSampler([3, 10, 3], max_nodes=5, shuffle=False)
+    assert list(sampler) == [[0], [1], [2]]
+
+
+def test_bucketing_reduces_variance(sizes):
+    num_nodes, num_edges = sizes
+
+    def size_std(bucket_size):
+        sampler = BudgetBatchSampler(num_nodes, max_graphs=16, bucket_size=bucket_size, seed=0)
+        return torch.stack([num_nodes[batch].float().std() for batch in sampler]).mean()
+
+    assert size_std(bucket_size=128) < size_std(bucket_size=None)
+
+
+def test_seed(sizes):
+    num_nodes, num_edges = sizes
+    sampler = BudgetBatchSampler(num_nodes, num_edges, max_edges=300, bucket_size=64, seed=42)
+    other = BudgetBatchSampler(num_nodes, num_edges, max_edges=300, bucket_size=64, seed=42)
+
+    assert len(sampler) == len(list(sampler))
+    assert list(sampler) == list(other)
+    sampler.set_epoch(1)
+    assert list(sampler) != list(other)
+    other.set_epoch(1)
+    assert list(sampler) == list(other)
+
+    unseeded = BudgetBatchSampler(num_nodes, num_edges, max_edges=300)
+    length = len(unseeded)
+    assert length == len(list(unseeded))
+
+
+def test_data_loader(graphs):
+    sampler = BudgetBatchSampler.from_graphs(graphs, max_nodes=40, shuffle=False)
+    loader = DataLoader(graphs, batch_sampler=sampler, collate_fn=GraphBatch.collate)
+    batches = list(loader)
+    assert len(batches) == len(sampler)
+    assert sum(batch.num_graphs for batch in batches) == len(graphs)
+
+    store = GraphStore.from_graphs(graphs)
+    sampler = BudgetBatchSampler.from_store(store, max_nodes=40, shuffle=False)
+    for batch, expected in zip(DataLoader(store, sampler=sampler, batch_size=None), batches):
+        assert batch.num_nodes_by_graph.tolist() == expected.num_nodes_by_graph.tolist()
+        assert batch.senders.tolist() == expected.senders.tolist()
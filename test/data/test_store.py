@@ -0,0 +1,141 @@
+import pickle
+
+import pytest
+import torch
+from torch.utils.data import DataLoader, BatchSampler, SequentialSampler
+
+from torchgraphs import Graph, GraphBatch, GraphStore
+from torchgraphs.data.features import add_random_features
+from data.utils import assert_graphs_equal
+
+
+@pytest.fixture
+def store_and_graphs(graphs_nx, features_shapes):
+    graphs = [Graph.from_networkx(add_random_features(g, **features_shapes)) for g in graphs_nx]
+    return GraphStore.from_graphs(graphs), graphs
+
+
+def assert_batches_equal(batch1: GraphBatch, batch2: GraphBatch):
+    assert batch1.num_graphs == batch2.num_graphs
+    assert batch1.num_nodes_by_graph.tolist() == batch2.num_nodes_by_graph.tolist()
+    assert batch1.num_edges_by_graph.tolist() == batch2.num_edges_by_graph.tolist()
+    assert batch1.senders.tolist() == batch2.senders.tolist()
+    assert batch1.receivers.tolist() == batch2.receivers.tolist()
+    for g1, g2 in zip(batch1, batch2):
+        assert_graphs_equal(g1, g2)
+
+
+def test_random_access(store_and_graphs):
+    store, graphs = store_and_graphs
+    assert len(store) == len(graphs)
+    for i in range(-len(graphs), len(graphs)):
+        assert_graphs_equal(store[i], graphs[i])
+    for g1, g2 in zip(store, graphs):
+        assert_graphs_equal(g1, g2)
+    assert_graphs_equal(store[torch.tensor(1)], graphs[1])
+
+    with pytest.raises(IndexError):
+        store[len(graphs)]
+
+
+def test_views(store_and_graphs):
+    store, _ = store_and_graphs
+    graph = store[2]
+    if graph.node_features is not None:
+        assert graph.node_features.data_ptr() == store.node_features[store.node_offsets[2]:].data_ptr()
+    assert graph.senders.data_ptr() == store.senders[store.edge_offsets[2]:].data_ptr()
+
+
+def test_batch(store_and_graphs):
+    store, graphs = store_and_graphs
+    assert_batches_equal(store[:], GraphBatch.from_graphs(graphs))
+    assert_batches_equal(store[2:5], GraphBatch.from_graphs(graphs[2:5]))
+    assert_batches_equal(store[::-2], GraphBatch.from_graphs(graphs[::-2]))
+
+    indexes = [3, 1, 4, 1, 5, -1]
+    assert_batches_equal(store[indexes], GraphBatch.from_graphs([graphs[i] for i in indexes]))
+    assert_batches_equal(store[torch.tensor(indexes)], GraphBatch.from_graphs([graphs[i] for i in indexes]))
+
+    mask = torch.arange(len(graphs)) % 3 == 0
+    assert_batches_equal(store[mask], GraphBatch.from_graphs([g for g, m in zip(graphs, mask) if m]))
+
+    with pytest.raises(IndexError):
+        store[[len(graphs)]]
+
+
+def test_data_loader(store_and_graphs):
+    store, graphs = store_and_graphs
+    sampler = BatchSampler(SequentialSampler(store), batch_size=3, drop_last=False)
+    for i, batch in enumerate(DataLoader(store, sampler=sampler, batch_size=None)):
+        assert_batches_equal(batch, GraphBatch.from_graphs(graphs[3 * i:3 * i + 3]))
+
+
+def test_index_dtype(store_and_graphs):
+    _, graphs = store_and_graphs
+    store = GraphStore.from_graphs(graphs, index_dtype=torch.int32)
+    assert store.senders.dtype == store[0].senders.dtype == store[[0, 2]].senders.dtype == torch.int32
+
+
+def test_validation(store_and_graphs):
+    store, graphs = store_and_graphs
+    senders = store.senders.clone()
+    senders[store.edge_offsets[2]] = store.num_nodes_by_graph[2]
+    with pytest.raises(ValueError):
+        GraphStore(store.num_nodes_by_graph, store.num_edges_by_graph, senders, store.receivers)
+    with pytest.raises(ValueError):
+        GraphStore(store.num_nodes_by_graph, store.num_edges_by_graph[1:], store.senders, store.receivers)
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_save_load(store_and_graphs, tmp_path, mmap):
+    store, graphs = store_and_graphs
+    store.save(tmp_path)
+    loaded = GraphStore.load(tmp_path, mmap=mmap)
+    assert len(loaded) == len(graphs)
+    for g1, g2 in zip(loaded, graphs):
+        assert_graphs_equal(g1, g2)
+    assert_batches_equal(loaded[[4, 0, 2]], store[[4, 0, 2]])
+
+
+def test_write_graphs(store_and_graphs, tmp_path):
+    store, graphs = store_and_graphs
+    sorted_graphs = [g.sort_edges('receiver')[0] for g in graphs]
+    GraphStore.write_graphs(iter(sorted_graphs), tmp_path, index_dtype=torch.int32)
+    loaded = GraphStore.load(tmp_path)
+    assert loaded.edge_order == 'receiver'
+    assert loaded.senders.dtype == torch.int32
+    for g1, g2 in zip(loaded, sorted_graphs):
+        assert_graphs_equal(g1, g2)
+
+    if graphs[-1].node_features is not None:
+        with pytest.raises(ValueError):
+            GraphStore.write_graphs([graphs[-1], graphs[-1].evolve(node_features=None)], tmp_path / 'missing')
+
+
+
+@pytest.mark.parametrize('mmap', [True, False])
+def test_write_no_graphs(tmp_path, mmap):
+    GraphStore.write_graphs([], tmp_path, index_dtype=torch.int32)
+    loaded = GraphStore.load(tmp_path, mmap=mmap)
+    assert len(loaded) == 0 and list(loaded) == []
+    assert loaded.senders.dtype == torch.int32 and loaded.senders.shape == (0,)
+    assert loaded.node_features is None and loaded.edge_features is None and loaded.global_features is None
+    assert loaded[0:0].num_graphs == 0
+
+
+def test_mmap(store_and_graphs, tmp_path):
+
+    store, graphs = store_and_graphs
+    store.save(tmp_path)
+    loaded = GraphStore.load(tmp_path)
+
+    # In-place changes are not written back to disk
+    loaded.senders.zero_()
+    assert GraphStore.load(tmp_path).senders.tolist() == store.senders.tolist()
+
+    # Pickling a memory-mapped store only pickles its directory
+    assert len(pickle.dumps(loaded)) < 1000
+    for g1, g2 in zip(pickle.loads(pickle.dumps(loaded)), graphs):
+        assert_graphs_equal(g1, g2)
+    for g1, g2 in zip(pickle.loads(pickle.dumps(store)), graphs):
+        assert_graphs_equal(g1, g2)
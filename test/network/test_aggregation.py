@@ -0,0 +1,96 @@
+import torch
+import torch_scatter
+
+from torchgraphs import GraphBatch
+from torchgraphs.network import \
+    EdgesToSender, EdgesToReceiver, EdgesToGlobal, NodesToGlobal, PredecessorsToNode, SuccessorsToNode
+from torchgraphs.network.aggregation import get_aggregation
+from torchgraphs.data.features import add_random_features
+
+
+def test_neighbor_aggregation(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, node_features_shape=5).to(device)
+    graphbatch.node_features.requires_grad_()
+
+    for aggregation in ('sum', 'mean', 'max'):
+        reduce = getattr(torch_scatter, f'scatter_{aggregation}')
+        expected = reduce(graphbatch.node_features[graphbatch.senders], graphbatch.receivers,
+                          dim=0, dim_size=graphbatch.num_nodes)
+        if aggregation == 'max':
+            expected = expected[0]
+        torch.testing.assert_close(PredecessorsToNode(aggregation)(graphbatch), expected)
+
+        expected = reduce(graphbatch.node_features[graphbatch.receivers], graphbatch.senders,
+                          dim=0, dim_size=graphbatch.num_nodes)
+        if aggregation == 'max':
+            expected = expected[0]
+        torch.testing.assert_close(SuccessorsToNode(aggregation)(graphbatch), expected)
+
+    SuccessorsToNode('mean')(graphbatch).sum().backward()
+    assert graphbatch.node_features.grad is not None
+
+
+
+def test_neighbor_aggregation_names(graphbatch: GraphBatch, device):
+    # Aliases, reductions without a fused implementation and lists of reductions, sorted and unsorted edges
+    graphbatch = add_random_features(graphbatch, node_features_shape=5).to(device)
+    by_receiver, _ = graphbatch.sort_edges(by='receiver')
+    by_sender, _ = graphbatch.sort_edges(by='sender')
+
+    for aggregation in ('add', 'avg', 'min', 'std', ['mean', 'max'], ('min', 'std', 'sum')):
+        reduce = get_aggregation(aggregation)
+        expected = reduce(graphbatch.node_features[graphbatch.senders], graphbatch.receivers,
+                          dim_size=graphbatch.num_nodes)
+        torch.testing.assert_close(PredecessorsToNode(aggregation)(graphbatch), expected)
+        torch.testing.assert_close(PredecessorsToNode(aggregation)(by_receiver), expected)
+        torch.testing.assert_close(PredecessorsToNode(aggregation)(graphbatch.to_tensors()), expected)
+
+        expected = reduce(graphbatch.node_features[graphbatch.receivers], graphbatch.senders,
+                          dim_size=graphbatch.num_nodes)
+        torch.testing.assert_close(SuccessorsToNode(aggregation)(graphbatch), expected)
+        torch.testing.assert_close(SuccessorsToNode(aggregation)(by_sender), expected)
+        torch.testing.assert_close(SuccessorsToNode(aggregation)(graphbatch.to_tensors()), expected)
+
+
+def test_edge_aggregation(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, node_features_shape=3, edge_features_shape=5).to(device)
+    by_receiver, _ = graphbatch.sort_edges(by='receiver')
+    by_sender, _ = graphbatch.sort_edges(by='sender')
+
+    for aggregation in ('sum', 'mean', 'max'):
+        expected = torch_scatter.scatter(graphbatch.edge_features, graphbatch.receivers, dim=0,
+                                         dim_size=graphbatch.num_nodes, reduce=aggregation)
+        torch.testing.assert_close(EdgesToReceiver(aggregation)(graphbatch), expected)
+        torch.testing.assert_close(EdgesToReceiver(aggregation)(by_receiver), expected)
+
+        expected = torch_scatter.scatter(graphbatch.edge_features, graphbatch.senders, dim=0,
+                                         dim_size=graphbatch.num_nodes, reduce=aggregation)
+        torch.testing.assert_close(EdgesToSender(aggregation)(graphbatch), expected)
+        torch.testing.assert_close(EdgesToSender(aggregation)(by_sender), expected)
+
+        expected = torch.stack([getattr(torch, 'amax' if aggregation == 'max' else aggregation)(e, dim=0)
+                                if len(e) > 0 else e.new_zeros(e.shape[1:])
+                                for e in graphbatch.edge_features_by_graph])
+        torch.testing.assert_close(EdgesToGlobal(aggregation)(graphbatch), expected)
+
+        expected = torch.stack([getattr(torch, 'amax' if aggregation == 'max' else aggregation)(n, dim=0)
+                                if len(n) > 0 else n.new_zeros(n.shape[1:])
+                                for n in graphbatch.node_features_by_graph])
+        torch.testing.assert_close(NodesToGlobal(aggregation)(graphbatch), expected)
+
+
+def test_multiple_aggregations(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, node_features_shape=3, edge_features_shape=5).to(device)
+    aggregations = ['sum', 'mean', 'max', 'min']
+
+    for graphs in (graphbatch, graphbatch.sort_edges('receiver')[0]):
+        result = EdgesToReceiver(aggregations)(graphs)
+        assert result.shape == (graphbatch.num_nodes, len(aggregations) * 5)
+        torch.testing.assert_close(result, torch.cat([EdgesToReceiver(a)(graphs) for a in aggregations], dim=-1))
+
+    result = NodesToGlobal(aggregations)(graphbatch)
+    torch.testing.assert_close(result, torch.cat([NodesToGlobal(a)(graphbatch) for a in aggregations], dim=-1))
+
+    results = EdgesToGlobal(get_aggregation(aggregations, concat=False))(graphbatch)
+    for aggregation, result in zip(aggregations, results):
+        torch.testing.assert_close(result, EdgesToGlobal(aggregation)(graphbatch))
@@ -1,9 +1,12 @@
 from collections import OrderedDict
 
+import pytest
 import torch
 
 from torchgraphs import GraphBatch
 from torchgraphs.network import NodeLinear, EdgeLinear, GlobalLinear, EdgeReLU, NodeReLU, GlobalReLU
+from torchgraphs.network.aggregation import get_aggregation
+from torchgraphs.network.linear import _edge_linear_strategy
 
 from features_shapes import linear_features
 from torchgraphs.data.features import add_random_features
@@ -54,3 +57,180 @@ def test_linear_graph_network(graphbatch: GraphBatch, device):
     assert (graphbatch.num_edges_by_graph == result.num_edges_by_graph).all()
     assert (graphbatch.senders == result.senders).all()
     assert (graphbatch.receivers == result.receivers).all()
+
+
+def test_multiple_aggregations(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    aggregations = ['mean', 'max', 'std']
+
+    node_linear = NodeLinear(
+        out_features=4,
+        incoming_features=len(aggregations) * linear_features['edge_features_shape'],
+        outgoing_features=len(aggregations) * linear_features['edge_features_shape'],
+        aggregation=aggregations
+    ).to(device)
+    global_linear = GlobalLinear(
+        out_features=4,
+        node_features=len(aggregations) * linear_features['node_features_shape'],
+        aggregation=aggregations
+    ).to(device)
+
+    assert node_linear(graphbatch).node_features.shape == (graphbatch.num_nodes, 4)
+    assert global_linear(graphbatch).global_features.shape == (graphbatch.num_graphs, 4)
+
+
+def test_index_dtype(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    net = torch.nn.Sequential(
+        EdgeLinear(
+            out_features=linear_features['edge_features_shape'],
+            edge_features=linear_features['edge_features_shape'],
+            sender_features=linear_features['node_features_shape'],
+            global_features=linear_features['global_features_shape']
+        ),
+        NodeLinear(
+            out_features=linear_features['node_features_shape'],
+            incoming_features=linear_features['edge_features_shape'],
+            global_features=linear_features['global_features_shape'],
+            aggregation='max'
+        ),
+        GlobalLinear(
+            out_features=linear_features['global_features_shape'],
+            edge_features=linear_features['edge_features_shape'],
+            node_features=linear_features['node_features_shape'],
+            aggregation='mean'
+        ),
+    ).to(device)
+
+    result = net(graphbatch.to(index_dtype=torch.int32))
+    expected = net(graphbatch)
+    assert result.index_dtype == torch.int32
+    torch.testing.assert_close(result.node_features, expected.node_features)
+    torch.testing.assert_close(result.edge_features, expected.edge_features)
+    torch.testing.assert_close(result.global_features, expected.global_features)
+
+
+def test_global_terms(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    edge_linear = EdgeLinear(
+        out_features=5,
+        edge_features=linear_features['edge_features_shape'],
+        receiver_features=linear_features['node_features_shape'],
+        global_features=linear_features['global_features_shape']
+    ).to(device)
+    node_linear = NodeLinear(
+        out_features=5,
+        node_features=linear_features['node_features_shape'],
+        global_features=linear_features['global_features_shape']
+    ).to(device)
+
+    edges = edge_linear(graphbatch).edge_features
+    nodes = node_linear(graphbatch).node_features
+    expected_edges = (graphbatch.edge_features @ edge_linear.W_edge.t() +
+                      graphbatch.node_features[graphbatch.receivers] @ edge_linear.W_receiver.t() +
+                      graphbatch.global_features_as_edges() @ edge_linear.W_global.t() + edge_linear.bias)
+    expected_nodes = (graphbatch.node_features @ node_linear.W_node.t() +
+                      graphbatch.global_features_as_nodes() @ node_linear.W_global.t() + node_linear.bias)
+    torch.testing.assert_close(edges, expected_edges)
+    torch.testing.assert_close(nodes, expected_nodes)
+
+    params = list(edge_linear.parameters()) + list(node_linear.parameters())
+    grads = torch.autograd.grad(edges.sum() + nodes.sum(), params)
+    expected_grads = torch.autograd.grad(expected_edges.sum() + expected_nodes.sum(), params)
+    for grad, expected_grad in zip(grads, expected_grads):
+        # Sums over all nodes and edges are accumulated in a different order
+        torch.testing.assert_close(grad, expected_grad, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize('strategy', [None, 'project', 'gather'])
+@pytest.mark.parametrize('terms', [('edge', 'sender', 'receiver', 'global'), ('sender',), ('receiver', 'global'),
+                                   ('edge', 'receiver')])
+@pytest.mark.parametrize('bias', [True, False])
+def test_edge_linear_strategies(graphbatch: GraphBatch, strategy, terms, bias, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    edge_linear = EdgeLinear(
+        out_features=5,
+        edge_features=linear_features['edge_features_shape'] if 'edge' in terms else None,
+        sender_features=linear_features['node_features_shape'] if 'sender' in terms else None,
+        receiver_features=linear_features['node_features_shape'] if 'receiver' in terms else None,
+        global_features=linear_features['global_features_shape'] if 'global' in terms else None,
+        bias=bias,
+        strategy=strategy
+    ).to(device)
+
+    edges = edge_linear(graphbatch).edge_features
+    expected = torch.zeros(graphbatch.num_edges, 5, device=device)
+    if 'edge' in terms:
+        expected = expected + graphbatch.edge_features @ edge_linear.W_edge.t()
+    if 'sender' in terms:
+        expected = expected + graphbatch.node_features[graphbatch.senders] @ edge_linear.W_sender.t()
+    if 'receiver' in terms:
+        expected = expected + graphbatch.node_features[graphbatch.receivers] @ edge_linear.W_receiver.t()
+    if 'global' in terms:
+        expected = expected + graphbatch.global_features_as_edges() @ edge_linear.W_global.t()
+    if bias:
+        expected = expected + edge_linear.bias
+    torch.testing.assert_close(edges, expected, rtol=1e-4, atol=1e-4)
+
+    params = list(edge_linear.parameters())
+    grads = torch.autograd.grad(edges.sum(), params)
+    expected_grads = torch.autograd.grad(expected.sum(), params)
+    for grad, expected_grad in zip(grads, expected_grads):
+        torch.testing.assert_close(grad, expected_grad, rtol=1e-4, atol=1e-4)
+
+
+def test_edge_linear_strategy():
+    # Wide node features projected to few outputs favor projecting the nodes, few edges with
+    # narrow node features favor gathering
+    assert _edge_linear_strategy(num_nodes=1000, num_edges=10_000, node_features=256, num_endpoints=2,
+                                 out_features=8) == 'project'
+    assert _edge_linear_strategy(num_nodes=1000, num_edges=500, node_features=8, num_endpoints=2,
+                                 out_features=256) == 'gather'
+
+    with pytest.raises(ValueError):
+        EdgeLinear(out_features=5, sender_features=3, strategy='unknown')
+
+
+@pytest.mark.parametrize('aggregation', ['sum', 'mean', 'max'])
+@pytest.mark.parametrize('out_features', [2, 50])
+@pytest.mark.parametrize('directions', [('incoming', 'outgoing'), ('outgoing',)])
+def test_project_before_aggregation(graphbatch: GraphBatch, aggregation, out_features, directions, device):
+    # Narrow outputs are projected before the aggregation, wide outputs after
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    node_linear = NodeLinear(
+        out_features=out_features,
+        incoming_features=linear_features['edge_features_shape'] if 'incoming' in directions else None,
+        outgoing_features=linear_features['edge_features_shape'] if 'outgoing' in directions else None,
+        aggregation=aggregation
+    ).to(device)
+    global_linear = GlobalLinear(
+        out_features=out_features,
+        node_features=linear_features['node_features_shape'],
+        edge_features=linear_features['edge_features_shape'],
+        aggregation=aggregation
+    ).to(device)
+
+    nodes = node_linear(graphbatch).node_features
+    globals_ = global_linear(graphbatch).global_features
+
+    reduce = get_aggregation(aggregation)
+    expected_nodes = node_linear.bias.expand(graphbatch.num_nodes, -1)
+    if 'incoming' in directions:
+        expected_nodes = expected_nodes + reduce(graphbatch.edge_features, graphbatch.receivers,
+                                                 dim_size=graphbatch.num_nodes) @ node_linear.W_incoming.t()
+    if 'outgoing' in directions:
+        expected_nodes = expected_nodes + reduce(graphbatch.edge_features, graphbatch.senders,
+                                                 dim_size=graphbatch.num_nodes) @ node_linear.W_outgoing.t()
+    expected_globals = (
+        reduce(graphbatch.node_features, graphbatch.node_index_by_graph, dim_size=graphbatch.num_graphs)
+        @ global_linear.W_node.t() +
+        reduce(graphbatch.edge_features, graphbatch.edge_index_by_graph, dim_size=graphbatch.num_graphs)
+        @ global_linear.W_edges.t() + global_linear.bias)
+    torch.testing.assert_close(nodes, expected_nodes, rtol=1e-4, atol=1e-4)
+    torch.testing.assert_close(globals_, expected_globals, rtol=1e-4, atol=1e-4)
+
+    params = list(node_linear.parameters()) + list(global_linear.parameters())
+    grads = torch.autograd.grad(nodes.sum() + globals_.sum(), params)
+    expected_grads = torch.autograd.grad(expected_nodes.sum() + expected_globals.sum(), params)
+    for grad, expected_grad in zip(grads, expected_grads):
+        torch.testing.assert_close(grad, expected_grad, rtol=1e-4, atol=1e-4)
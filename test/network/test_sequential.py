@@ -0,0 +1,115 @@
+import warnings
+
+import pytest
+import torch
+
+from torchgraphs import GraphBatch
+from torchgraphs.data.features import add_random_features
+from torchgraphs.network import GraphNetwork, GraphLayer, GraphSequential, EdgeLinear, NodeLinear, GlobalLinear, \
+    EdgeReLU, NodeReLU, NodeSigmoid, NodeDropout, EdgesToSender, EdgesToReceiver, EdgesToGlobal, NodesToGlobal
+
+from features_shapes import linear_features
+
+n, e, g = linear_features['node_features_shape'], linear_features['edge_features_shape'], \
+    linear_features['global_features_shape']
+
+
+def message_passing(num_steps):
+    return [GraphSequential(
+        EdgeLinear(e, edge_features=e, sender_features=n, receiver_features=n, global_features=g),
+        EdgeReLU(),
+        NodeLinear(n, node_features=n, incoming_features=e, aggregation='mean'),
+        NodeDropout(p=0.3),
+        NodeSigmoid(),
+    ) for _ in range(num_steps)]
+
+
+def test_graph_layer(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    layer = GraphLayer(
+        edge_fn=lambda graphs: graphs.edge_features + 1,
+        node_fn=lambda graphs: graphs.in_edge_features('sum'),
+        global_fn=lambda graphs: graphs.node_features_by_graph('sum'),
+    )
+    result = layer(graphbatch)
+    torch.testing.assert_close(result.edge_features, graphbatch.edge_features + 1)
+    torch.testing.assert_close(result.node_features, result.in_edge_features('sum'))
+    torch.testing.assert_close(result.global_features, result.node_features_by_graph('sum'))
+
+
+def test_graph_network(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    network = GraphNetwork(
+        edge_fn=lambda graphs: graphs.edge_features * 2,
+        node_fn=lambda graphs, to_sender, to_receiver: graphs.node_features[:, :e] + to_sender + to_receiver,
+        global_fn=lambda graphs, from_nodes, from_edges: from_nodes + from_edges,
+        edges_to_sender=EdgesToSender('sum'),
+        edges_to_receiver=EdgesToReceiver('sum'),
+        nodes_to_global=NodesToGlobal('sum'),
+        edges_to_global=EdgesToGlobal('sum'),
+    )
+    result = network(graphbatch)
+    torch.testing.assert_close(result.edge_features, graphbatch.edge_features * 2)
+    torch.testing.assert_close(result.node_features, graphbatch.node_features[:, :e] +
+                               result.out_edge_features('sum') + result.in_edge_features('sum'))
+    torch.testing.assert_close(result.global_features, result.node_features_by_graph('sum') +
+                               result.edge_features_by_graph('sum'))
+
+
+@pytest.mark.parametrize('checkpoint', [True, 2])
+def test_checkpoint(graphbatch: GraphBatch, checkpoint, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    graphbatch.node_features.requires_grad_()
+    steps = message_passing(6)
+    model = GraphSequential(*steps).to(device)
+    checkpointed = GraphSequential(*steps, checkpoint=checkpoint).to(device)
+
+    def run(module):
+        saved = []
+        torch.manual_seed(0)
+        with torch.autograd.graph.saved_tensors_hooks(lambda t: saved.append(t.numel()) or t, lambda t: t):
+            output = module(graphbatch).node_features
+        grads = torch.autograd.grad(output.sum(), [graphbatch.node_features, *model.parameters()])
+        return output, grads, sum(saved)
+
+    output, grads, saved = run(model)
+    output_checkpointed, grads_checkpointed, saved_checkpointed = run(checkpointed)
+    torch.testing.assert_close(output_checkpointed, output)
+    for grad, grad_checkpointed in zip(grads, grads_checkpointed):
+        torch.testing.assert_close(grad_checkpointed, grad)
+    assert saved_checkpointed < saved
+
+
+def test_inplace_inference(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    model = GraphSequential(EdgeReLU(), NodeReLU(), *message_passing(3)).to(device).eval()
+    node_features = graphbatch.node_features.clone()
+    edge_features = graphbatch.edge_features.clone()
+
+    expected = torch.nn.Sequential(*model)(graphbatch)
+    linear_outputs = []
+    model[-1][2].register_forward_hook(lambda module, inputs, output: linear_outputs.append(output.node_features))
+    with torch.no_grad():
+        output = model(graphbatch)
+
+    torch.testing.assert_close(output.node_features, expected.node_features)
+    torch.testing.assert_close(output.edge_features, expected.edge_features)
+    # The input is not modified, the activations are computed in the buffer of the last linear layer
+    torch.testing.assert_close(graphbatch.node_features, node_features)
+    torch.testing.assert_close(graphbatch.edge_features, edge_features)
+    assert output.node_features.data_ptr() == linear_outputs[-1].data_ptr()
+
+
+def test_script(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    model = GraphSequential(*message_passing(2), GlobalLinear(g, node_features=n, aggregation='sum')).to(device).eval()
+    expected = model(graphbatch)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        scripted = torch.jit.script(model)
+    output = GraphBatch.from_tensors(scripted(graphbatch.to_tensors()))
+    torch.testing.assert_close(output.global_features, expected.global_features, rtol=1e-4, atol=1e-4)
+
+    with pytest.raises(ValueError):
+        GraphSequential(checkpoint=0)
@@ -0,0 +1,132 @@
+import warnings
+
+import pytest
+import torch
+import torch_scatter
+
+from torchgraphs import GraphBatch
+from torchgraphs.data import GraphTensors
+from torchgraphs.data.features import add_random_features
+from torchgraphs.network import EdgeLinear, NodeLinear, GlobalLinear, \
+    EdgesToSender, EdgesToReceiver, EdgesToGlobal, NodesToGlobal, PredecessorsToNode, SuccessorsToNode, \
+    EdgeReLU, NodeReLU, GlobalReLU, EdgeSigmoid, NodeSigmoid, GlobalSigmoid, EdgeDropout, NodeDropout, GlobalDropout
+from torchgraphs.network.aggregation import get_aggregation
+
+from features_shapes import linear_features
+
+n, e, g = linear_features['node_features_shape'], linear_features['edge_features_shape'], \
+    linear_features['global_features_shape']
+
+
+def graph_modules():
+    return [
+        EdgeLinear(5, edge_features=e, sender_features=n, receiver_features=n, global_features=g),
+        EdgeLinear(5, sender_features=n, bias=False, strategy='gather'),
+        EdgeLinear(5, receiver_features=n, global_features=g, strategy='project'),
+        NodeLinear(5, node_features=n, incoming_features=e, outgoing_features=e, global_features=g,
+                   aggregation='mean'),
+        NodeLinear(2, incoming_features=e, aggregation='sum'),
+        NodeLinear(5, outgoing_features=3 * e, aggregation=['max', 'min', 'std']),
+        GlobalLinear(5, node_features=n, edge_features=e, global_features=g, aggregation='mean'),
+        GlobalLinear(2, node_features=n, aggregation='max'),
+        EdgeReLU(), NodeReLU(), GlobalReLU(), EdgeSigmoid(), NodeSigmoid(), GlobalSigmoid(),
+        EdgeDropout(), NodeDropout(), GlobalDropout(),
+    ]
+
+
+def aggregation_modules():
+    return [
+        EdgesToSender('sum'), EdgesToReceiver(['mean', 'max']), EdgesToGlobal('std'), NodesToGlobal('min'),
+        PredecessorsToNode('mean'), SuccessorsToNode('max'),
+    ]
+
+
+def assert_tensors_equal(tensors: GraphTensors, graphbatch: GraphBatch):
+    for name in ('node_features', 'edge_features', 'global_features'):
+        torch.testing.assert_close(getattr(tensors, name), getattr(graphbatch, name), rtol=1e-4, atol=1e-4)
+
+
+def test_round_trip(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    tensors = graphbatch.to_tensors()
+    assert tensors.node_index_by_graph is graphbatch.node_index_by_graph
+
+    batch = GraphBatch.from_tensors(tensors)
+    assert batch.num_nodes == graphbatch.num_nodes and batch.num_edges == graphbatch.num_edges
+    assert batch.edge_index_by_graph is tensors.edge_index_by_graph
+    assert_tensors_equal(tensors, batch)
+
+
+@pytest.mark.parametrize('index', range(len(graph_modules())))
+def test_graph_modules(graphbatch: GraphBatch, index, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    module = graph_modules()[index].to(device).eval()
+
+    expected = module(graphbatch)
+    assert_tensors_equal(module(graphbatch.to_tensors()), expected)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        scripted = torch.jit.script(module)
+    assert_tensors_equal(scripted(graphbatch.to_tensors()), expected)
+
+    compiled = torch.compile(module, backend='aot_eager', fullgraph=True, dynamic=True)
+    assert_tensors_equal(compiled(graphbatch.to_tensors()), expected)
+
+
+@pytest.mark.parametrize('index', range(len(aggregation_modules())))
+def test_aggregation_modules(graphbatch: GraphBatch, index, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    module = aggregation_modules()[index].to(device)
+
+    expected = module(graphbatch)
+    torch.testing.assert_close(module(graphbatch.to_tensors()), expected, rtol=1e-4, atol=1e-4)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        scripted = torch.jit.script(module)
+    torch.testing.assert_close(scripted(graphbatch.to_tensors()), expected, rtol=1e-4, atol=1e-4)
+
+    compiled = torch.compile(module, backend='aot_eager', fullgraph=True, dynamic=True)
+    torch.testing.assert_close(compiled(graphbatch.to_tensors()), expected, rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize('module', [
+    NodeLinear(5, incoming_features=e, aggregation=torch_scatter.scatter_add),
+    GlobalLinear(5, node_features=n, aggregation=torch_scatter.scatter_mean),
+    EdgesToSender(torch_scatter.scatter_add),
+    NodesToGlobal(get_aggregation(['mean', 'max'], concat=False)),
+])
+def test_unsupported_aggregation(graphbatch: GraphBatch, module):
+    # Custom functions and aggregations that return a tuple only run on a GraphBatch
+    graphbatch = add_random_features(graphbatch, **linear_features)
+    module(graphbatch)
+    with pytest.raises(ValueError, match='is not supported on GraphTensors'):
+        module(graphbatch.to_tensors())
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        scripted = torch.jit.script(module)
+    with pytest.raises(torch.jit.Error, match='is not supported on GraphTensors'):
+        scripted(graphbatch.to_tensors())
+
+
+def test_compiled_network(graphbatch: GraphBatch, device):
+    graphbatch = add_random_features(graphbatch, **linear_features).to(device)
+    net = torch.nn.Sequential(
+        EdgeLinear(e, edge_features=e, sender_features=n, receiver_features=n, global_features=g),
+        EdgeReLU(),
+        NodeLinear(n, node_features=n, incoming_features=e, global_features=g, aggregation='mean'),
+        NodeSigmoid(),
+        GlobalLinear(g, node_features=n, edge_features=e, global_features=g, aggregation='sum'),
+    ).to(device)
+
+    expected = net(graphbatch)
+    compiled = torch.compile(net, backend='aot_eager', fullgraph=True, dynamic=True)
+    output = compiled(graphbatch.to_tensors())
+    assert_tensors_equal(output, expected)
+    assert_tensors_equal(output, GraphBatch.from_tensors(output))
+
+    # Gradients flow through the compiled network
+    output.global_features.sum().backward()
+    assert all(p.grad is not None for p in net[0].parameters())
@@ -0,0 +1,112 @@
+import pytest
+import torch
+import torch_scatter
+
+from torchgraphs.scatter import Broadcast, gather_csr, scatter_many
+
+
+# Sums and means go through a sparse CSR tensor, whose construction must not warn in the aggregation hot path
+@pytest.mark.filterwarnings('error::UserWarning')
+@pytest.mark.parametrize('reduce', ['sum', 'mean', 'max', 'min'])
+@pytest.mark.parametrize('chunk_size', [None, 1, 7])
+def test_gather_csr(reduce, chunk_size, device):
+    src = torch.rand(20, 3, 2, device=device, requires_grad=True)
+    segment_lengths = torch.tensor([0, 3, 1, 0, 0, 12, 4, 0, 6, 0], device=device)
+    pointers = torch.cat((segment_lengths.new_zeros(1), segment_lengths.cumsum(dim=0)))
+    index = torch.randint(len(src), size=(pointers[-1].item(),), device=device)
+
+    out = gather_csr(src, pointers, index, reduce=reduce, chunk_size=chunk_size)
+    grad_out = torch.rand_like(out)
+    grad, = torch.autograd.grad(out, src, grad_out)
+
+    expected = torch_scatter.segment_csr(src.index_select(0, index), pointers, reduce=reduce)
+    expected_grad, = torch.autograd.grad(expected, src, grad_out)
+
+    torch.testing.assert_close(out, expected)
+    torch.testing.assert_close(grad, expected_grad)
+
+
+def test_gather_csr_empty(device):
+    src = torch.rand(5, 3, device=device)
+    for reduce in ('sum', 'mean', 'max'):
+        out = gather_csr(src, torch.zeros(4, dtype=torch.long, device=device),
+                         torch.zeros(0, dtype=torch.long, device=device), reduce=reduce)
+        torch.testing.assert_close(out, src.new_zeros(3, 3))
+
+
+@pytest.mark.parametrize('sorted_index', [False, True])
+def test_scatter_many(sorted_index, device):
+    src = torch.rand(30, 4, 2, device=device, requires_grad=True)
+    index = torch.randint(8, size=(30,), device=device)
+    index[index == 3] = 4  # Leave an empty group
+    pointers = None
+    if sorted_index:
+        index = index.sort()[0]
+        pointers = torch.cat((index.new_zeros(1), torch.bincount(index, minlength=10).cumsum(dim=0)))
+
+    reductions = ['max', 'sum', 'std', 'mean', 'min', 'mean']
+    results = scatter_many(src, index, 10, reductions, pointers=pointers)
+    assert len(results) == len(reductions)
+
+    for reduction, result in zip(reductions, results):
+        if reduction == 'std':
+            groups = [src[index == i] for i in range(10)]
+            expected = torch.stack([
+                g.std(dim=0, unbiased=False) if len(g) > 0 else src.new_zeros(4, 2) for g in groups])
+            torch.testing.assert_close(result, expected)
+        else:
+            torch.testing.assert_close(
+                result, torch_scatter.scatter(src, index, dim=0, dim_size=10, reduce=reduction))
+
+    torch.stack(results).sum().backward()
+    assert torch.isfinite(src.grad).all()
+
+
+@pytest.mark.parametrize('sorted_index', [False, True])
+def test_scatter_many_std(sorted_index, device):
+    # Large means with small deviations, a constant group and an empty group
+    index = torch.tensor([0, 0, 0, 0, 2, 2, 2, 1, 1, 3, 3, 3], device=device)
+    src = torch.tensor([1e4, 1e4 + 0.01, 1e4 - 0.005, 1e4, 7.5, 7.5, 7.5, -3e3, -3e3 + 0.004, 1., 2., 4.],
+                       device=device).unsqueeze(-1).requires_grad_()
+    pointers = None
+    if sorted_index:
+        index, order = index.sort(stable=True)
+        src = src.detach()[order].requires_grad_()
+        pointers = torch.cat((index.new_zeros(1), torch.bincount(index, minlength=5).cumsum(dim=0)))
+
+    std, = scatter_many(src, index, 5, ['std'], pointers=pointers)
+    expected = torch.stack([
+        src[index == i].double().std(dim=0, unbiased=False) if (index == i).any() else src.new_zeros(1).double()
+        for i in range(5)]).to(src.dtype)
+    torch.testing.assert_close(std, expected)
+    assert std[2].item() == 0 and std[4].item() == 0
+
+    std.sum().backward()
+    assert torch.isfinite(src.grad).all()
+
+
+@pytest.mark.parametrize('activation', [None, 'relu', 'sigmoid', torch.nn.functional.gelu])
+def test_broadcast(activation, device):
+    values = torch.rand(5, 3, device=device, requires_grad=True)
+    index = torch.tensor([0, 0, 2, 4, 4, 4], device=device)
+    other = torch.randn(6, 3, device=device, requires_grad=True)
+    weight = torch.rand(3, 2, device=device)
+    broadcast = Broadcast(values, index)
+
+    torch.testing.assert_close((broadcast @ weight).materialize(), values[index] @ weight)
+
+    out = broadcast.add_to(other, activation=activation)
+    expected = values[index] + other
+    if activation is not None:
+        expected = getattr(torch, activation)(expected) if isinstance(activation, str) else activation(expected)
+    torch.testing.assert_close(out, expected)
+
+    grad_out = torch.rand_like(out)
+    torch.testing.assert_close(torch.autograd.grad(out, (values, other), grad_out),
+                               torch.autograd.grad(expected, (values, other), grad_out))
+
+    # Inputs that do not match the output shape or type are not accumulated in place
+    torch.testing.assert_close(broadcast.add_to(other[:1].double()), values[index] + other[:1].double())
+
+    with pytest.raises(ValueError):
+        broadcast.add_to(other, activation='unknown')